@@ -0,0 +1,108 @@
+'''
+Local stand-in of the PVGIS API (seriescalc), for tests and runs without internet access:
+    python PVGIS_server.py [port] [cache_folder]
+    PVGIS_URL=http://localhost:8765/api/seriescalc python main.py
+The queries found in the PVGIS cache (see pre_processing/PV.py) are answered with the cached series. The others are
+answered with a synthetic clear-sky series of the location, so that the PV forecast can be computed without PVGIS.
+The clients cache the answers of this server apart from the ones of PVGIS (the url is part of the cache key).
+'''
+
+import calendar
+import http.server
+import os
+import sys
+import urllib.parse
+import numpy
+from pre_processing.PV import PVGIS_first_row, PVGIS_cache_folder, PVGIS_cache_entry, PVGIS_url
+
+
+def synthetic_series(query):
+    '''
+    Clear-sky irradiance on a horizontal plane and a sinusoidal air temperature for the location of the query
+    :param query: ``dict`` with the parameters of the query (lat, lon, startyear...)
+    :return: two numpy arrays, G [W/m2] and Ta [ºC], one value per hour of the year
+    '''
+    lat = numpy.radians(float(query.get('lat', 40)))
+    year = int(query.get('startyear', 2015))
+    hours = numpy.arange((366 if calendar.isleap(year) else 365) * 24)
+    day = hours // 24
+    declination = numpy.radians(23.45) * numpy.sin(2 * numpy.pi * (284 + day) / 365)
+    hour_angle = numpy.radians(15 * (hours % 24 + 0.5 - 12))
+    sin_elevation = numpy.sin(lat) * numpy.sin(declination) + numpy.cos(lat) * numpy.cos(declination) * numpy.cos(hour_angle)
+    G = numpy.maximum(0, 1000 * sin_elevation)
+    Ta = 15 - 10 * numpy.cos(2 * numpy.pi * (day - 15) / 365) - 4 * numpy.cos(2 * numpy.pi * (hours % 24 - 3) / 24)
+    return G, Ta
+
+
+def PVGIS_csv(query, G, Ta):
+    '''
+    Text of the csv in the PVGIS format: header lines, data rows (time, G(i), H_sun, T2m, WS10m, Int) and legend
+    :return: ``str``
+    '''
+    year = int(query.get('startyear', 2015))
+    header = ['Latitude (decimal degrees):,' + str(query.get('lat', '')),
+              'Longitude (decimal degrees):,' + str(query.get('lon', '')),
+              'Elevation (m):,0',
+              'Radiation database:,' + str(query.get('raddatabase', 'stand-in')),
+              'Slope:,' + str(query.get('angle', 0)),
+              'Azimuth:,' + str(query.get('aspect', 0)),
+              'Nominal power of the PV system (c-Si) (kWp):,1.0',
+              'System losses (%):,14.0']
+    header = header[:PVGIS_first_row - 1] + ['time,G(i),H_sun,T2m,WS10m,Int']
+    rows = []
+    for h in range(len(G)):
+        if numpy.isnan(G[h]):
+            break
+        day, hour = divmod(h, 24)
+        date = numpy.datetime64(str(year) + '-01-01') + numpy.timedelta64(int(day), 'D')
+        rows.append(str(date).replace('-', '') + ':' + str(hour).zfill(2) + '10,' + str(G[h]) + ',0.0,' + str(Ta[h]) + ',1.0,0.0')
+    legend = ['', 'G(i): Global irradiance on the inclined plane (plane of the array) (W/m2)', 'T2m: 2-m air temperature (degree Celsius)']
+    return '\r\n'.join(header + rows + legend) + '\r\n'
+
+
+class PVGISHandler(http.server.BaseHTTPRequestHandler):
+    cache_folder = PVGIS_cache_folder
+
+    def do_GET(self):
+        url = urllib.parse.urlparse(self.path)
+        query = {name: values[-1] for name, values in urllib.parse.parse_qs(url.query).items()}
+        if 'lat' not in query or 'lon' not in query:
+            self.send_error(400, 'lat and lon are required')
+            return
+        entry = PVGIS_cache_entry(query, self.cache_folder, PVGIS_url)  # series downloaded from PVGIS
+        if os.path.isfile(entry):
+            with numpy.load(entry) as data:
+                G, Ta = data['G'], data['Ta']
+            source = 'cache'
+        else:
+            G, Ta = synthetic_series(query)
+            source = 'synthetic'
+        content = PVGIS_csv(query, G, Ta).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/csv')
+        self.send_header('Content-Length', str(len(content)))
+        self.send_header('X-PVGIS-Source', source)
+        self.end_headers()
+        self.wfile.write(content)
+
+
+def serve(port=8765, cache_folder=PVGIS_cache_folder):
+    '''
+    Starts the stand-in server (until Ctrl+C)
+    :param port: port of the server (url: http://localhost:<port>/api/seriescalc)
+    :param cache_folder: folder of the PVGIS cache used to answer the queries
+    '''
+    PVGISHandler.cache_folder = cache_folder
+    server = http.server.ThreadingHTTPServer(('localhost', port), PVGISHandler)
+    print('PVGIS stand-in server: http://localhost:' + str(port) + '/api/seriescalc')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    server.server_close()
+
+
+if __name__ == '__main__':
+    arguments = sys.argv[1:]
+    serve(port=int(arguments[0]) if len(arguments) > 0 else 8765,
+          cache_folder=arguments[1] if len(arguments) > 1 else PVGIS_cache_folder)
@@ -0,0 +1,184 @@
+'''
+Batch runner: several clients or scenarios solved in parallel (one process per job)
+'''
+
+import concurrent.futures
+import importlib.util
+import json
+import os
+import sys
+import time
+import pandas
+import pyomo.environ as pyo
+from post_processing.Export import columnar_available
+
+
+# option of each solver that limits the number of threads
+solver_threads_option = {'gurobi': 'Threads', 'gurobi_direct': 'Threads', 'gurobi_persistent': 'Threads',
+                         'highs': 'threads', 'appsi_highs': 'threads', 'cplex': 'threads', 'cbc': 'threads',
+                         'scip': 'parallel/maxnthreads'}
+
+_worker = {'esios': None, 'threads': None, 'threadpool': None}  # data of each worker process, set by init_worker
+
+
+def read_manifest(manifest):
+    '''
+    Reads the list of jobs
+    :param manifest: ``list`` of ``dict`` or path of a JSON file with that list. Keys of each job:
+        - 'name': name of the job (used in the summary and in the results folder)
+        - 'data_dir': folder with the client files (default 'CSV/DATA/')
+        - 'overrides': ``dict`` with modifications of the inputs, see pre_process.apply_overrides (optional).
+          Time-steps can be given as 'days' (number of days from the beginning of the year)
+        - 'n_representative_days': number of representative days (optional, None: full horizon)
+        - 'solver': solver to use (default 'gurobi')
+        - 'solver_options': ``dict`` with the options of the solver (optional)
+        - 'results_dir': folder where the results are saved (default 'CSV/Results/<name>/'). None: results are not saved
+        - 'results_format': format of the time series results, see post_processing/Export.py (default parquet, or
+          csv if pyarrow is not installed)
+        - 'summary_format': format of the sizing and economic tables (default csv, Excel is not written in batch runs)
+    :return: ``list`` of ``dict`` with the jobs
+    '''
+    if isinstance(manifest, str):
+        with open(manifest, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    jobs = []
+    for n, job in enumerate(manifest):
+        job = dict(job)
+        job.setdefault('name', 'job' + str(n))
+        job.setdefault('data_dir', 'CSV/DATA/')
+        job.setdefault('overrides', {})
+        job.setdefault('n_representative_days', None)
+        job.setdefault('solver', 'gurobi')
+        job.setdefault('solver_options', {})
+        job.setdefault('results_dir', 'CSV/Results/' + str(job['name']) + '/')
+        job.setdefault('results_format', 'parquet' if columnar_available() else 'csv')
+        job.setdefault('summary_format', 'csv')
+        jobs.append(job)
+    names = [job['name'] for job in jobs]
+    if len(set(names)) != len(names):
+        print('Batch ERROR: the names of the jobs have to be different')
+        return None
+    return jobs
+
+
+def init_worker(esios, threads):
+    '''
+    Initialization of each worker process: ESIOS series shared by all the jobs and limit of threads.
+    The solver is limited with its option (solver_threads_option, see run_job). numpy is already imported when the
+    worker starts, so the threads of its BLAS library can only be limited with threadpoolctl (if it is installed);
+    the environment variables only reach the programs launched by the worker (e.g. solver executables)
+    :param esios: ``dict`` returned by pre_process.read_esios_data
+    :param threads: number of threads of each job
+    '''
+    _worker['esios'] = esios
+    _worker['threads'] = threads
+    for variable in ['OMP_NUM_THREADS', 'MKL_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'NUMEXPR_NUM_THREADS']:
+        os.environ[variable] = str(threads)  # programs launched by the worker
+    if importlib.util.find_spec('threadpoolctl') is not None:
+        import threadpoolctl
+        _worker['threadpool'] = threadpoolctl.threadpool_limits(limits=threads)  # active while the reference is kept
+
+
+def run_job(job):
+    '''
+    Pre-process, optimization and post-process of one job (executed in a worker process)
+    :param job: ``dict`` with the job (see read_manifest)
+    :return: ``dict`` with the summary of the job
+    '''
+    from pre_process import read_input_data, build_all_inputs
+    from optimization_model import optimization, solver_factory, solve_model, RunReportClass
+    from post_process import post_processing
+
+    summary = {'name': job['name'], 'data_dir': job['data_dir'], 'pid': os.getpid()}
+    report = RunReportClass()
+    begin = time.time()
+    try:
+        overrides = dict(job['overrides'])
+        if 'days' in overrides:
+            overrides['l_t'] = list(range(int(24 / overrides.get('inc_t', 1)) * int(overrides.pop('days'))))
+        data = read_input_data(job['data_dir'], esios=_worker['esios'])
+        AllInputs = build_all_inputs(job['data_dir'], overrides=overrides, data=data)
+        if job['n_representative_days'] is not None:
+            from pre_processing.Representative_days import aggregate_inputs
+            AllInputs = aggregate_inputs(AllInputs, job['n_representative_days'])
+        summary['pre-process time'] = time.time() - begin
+
+        begin_build = time.time()
+        instance = optimization(AllInputs)
+        report.build_time = time.time() - begin_build
+
+        solver_options = dict(job['solver_options'])
+        if _worker['threads'] is not None and job['solver'] in solver_threads_option:
+            solver_options.setdefault(solver_threads_option[job['solver']], _worker['threads'])
+        report = solve_model(instance, solver_factory(job['solver'], solver_options), report)
+        summary.update(report.table().to_dict())
+
+        if report.is_optimal():
+            summary['total_investment'] = pyo.value(instance.total_investment)
+            summary['total_annual_costs'] = pyo.value(instance.total_annual_costs)
+            summary['PV [kW]'] = sum(pyo.value(instance.PV_G[i_PV]) for i_PV in AllInputs.PV.id_list)
+            summary['BESS [kWh]'] = sum(pyo.value(instance.BESS_C[i_BESS]) for i_BESS in AllInputs.BESS.id_list)
+            if job['results_dir'] is not None:
+                begin_post = time.time()
+                os.makedirs(job['results_dir'], exist_ok=True)
+                post_processing(instance, job['results_dir'], AllInputs, job['results_format'], job['summary_format'])
+                summary['post-process time'] = time.time() - begin_post
+    except Exception as error:  # the error of a job does not stop the others
+        summary['status'] = 'error'
+        summary['message'] = type(error).__name__ + ': ' + str(error)
+    summary['total time'] = time.time() - begin
+    return summary
+
+
+def run_batch(manifest, max_workers=None, threads_per_job=1, esios_dir=None, summary_file='CSV/Results/Batch_summary.csv'):
+    '''
+    Solves all the jobs of the manifest in parallel.
+    The ESIOS series are read once and sent to each worker when it starts. Each job runs in its own process, so
+    there is no state shared between jobs, and each solver is limited to threads_per_job threads so that
+    max_workers * threads_per_job does not exceed the number of cores.
+    :param manifest: ``list`` of jobs or path of a JSON file (see read_manifest)
+    :param max_workers: number of jobs solved at the same time (default: cores / threads_per_job)
+    :param threads_per_job: threads of the solver of each job
+    :param esios_dir: folder with the ESIOS CSVs (default: data_dir of the first job)
+    :param summary_file: path of the CSV with the summary of all jobs (None: not saved)
+    :return: pandas DataFrame with the summary of all jobs, one row per job
+    '''
+    from pre_process import read_esios_data
+
+    jobs = read_manifest(manifest)
+    if not jobs:
+        return None
+    if max_workers is None:
+        max_workers = max(1, (os.cpu_count() or 1) // threads_per_job)
+    max_workers = min(max_workers, len(jobs))
+    if esios_dir is None:
+        esios_dir = jobs[0]['data_dir']
+    esios = read_esios_data(esios_dir)
+
+    summaries = {}
+    with concurrent.futures.ProcessPoolExecutor(max_workers=max_workers, initializer=init_worker,
+                                                initargs=(esios, threads_per_job)) as executor:
+        futures = {executor.submit(run_job, job): job['name'] for job in jobs}
+        for future in concurrent.futures.as_completed(futures):
+            name = futures[future]
+            try:
+                summaries[name] = future.result()
+            except Exception as error:  # e.g. the worker process has died
+                summaries[name] = {'name': name, 'status': 'error', 'message': type(error).__name__ + ': ' + str(error)}
+            print('Batch: ' + str(name) + ' ' + str(summaries[name].get('termination_condition', summaries[name].get('status'))))
+
+    table = pandas.DataFrame([summaries[job['name']] for job in jobs]).set_index('name')
+    if summary_file is not None:
+        os.makedirs(os.path.dirname(summary_file) or '.', exist_ok=True)
+        table.to_csv(summary_file)
+    return table
+
+
+if __name__ == '__main__':
+    # python batch.py manifest.json [max_workers] [threads_per_job]
+    arguments = sys.argv[1:]
+    table = run_batch(arguments[0],
+                      max_workers=int(arguments[1]) if len(arguments) > 1 else None,
+                      threads_per_job=int(arguments[2]) if len(arguments) > 2 else 1)
+    if table is not None:
+        print(table.to_string())
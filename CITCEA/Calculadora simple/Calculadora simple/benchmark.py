@@ -0,0 +1,251 @@
+'''
+Benchmarks of the pipeline:
+    - construction time of the optimization model: AbstractModel + create_instance vs ConcreteModel
+    - time and memory peak of each stage (pre-process, model build, solve, post-process) for synthetic cases of
+      any size (number of buses, loads, PV and BESS and length of the horizon)
+'''
+
+import copy
+import gc
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+import numpy
+import pandas
+from optimization_model import optimization
+
+
+def benchmark_construction(AllInputs, repeat=3):
+    '''
+    Measures the time to build the optimization model with both construction modes
+    :param AllInputs: data class which contains all inputs
+    :param repeat: number of times each model is built (the minimum time is kept)
+    :return: pandas DataFrame with the construction time [s] and the number of variables and constraints of each mode
+    '''
+    table = {}
+    for name, concrete in [('AbstractModel + create_instance', False), ('ConcreteModel', True)]:
+        times = []
+        for _ in range(repeat):
+            gc.collect()
+            begin = time.perf_counter()
+            instance = optimization(AllInputs, concrete=concrete)
+            times.append(time.perf_counter() - begin)
+            n_vars = instance.nvariables()
+            n_constr = instance.nconstraints()
+            del instance
+        table[name] = {'Time [s]': min(times), 'Variables': n_vars, 'Constraints': n_constr}
+    table = pandas.DataFrame(table).T
+    table['Speed-up'] = table['Time [s]'].iloc[0] / table['Time [s]']
+    return table
+
+
+def synthetic_data(data, n_bus=4, n_loads=4, n_PV=1, n_BESS=1, seed=0):
+    '''
+    Synthetic client of any size built from the data of a real one: the time series are the ones of the real client,
+    scaled and shifted randomly, and the components are distributed over the buses of a radial network
+    :param data: ``dict`` returned by pre_process.read_input_data
+    :param n_bus: number of buses (bus 0 is the slack, the lines form a chain 0-1-2-...)
+    :param n_loads: number of loads
+    :param n_PV: number of PV (models of the PV database used in turns)
+    :param n_BESS: number of BESS (complete models of the Battery database used in turns)
+    :param seed: seed of the random numbers
+    :return: ``dict`` with the same sheets as data, to be used in pre_process.build_all_inputs(data=...)
+    '''
+    random = numpy.random.default_rng(seed)
+    data = dict(data)
+    l_bus = list(range(n_bus))
+    other_buses = l_bus[1:] if n_bus > 1 else l_bus  # buses of the loads and generators
+
+    bus = data['Bus'].iloc[[0] * n_bus].reset_index(drop=True)
+    bus['Num'] = l_bus
+    bus['name'] = ['bus' + str(b) for b in l_bus]
+    bus['slack'] = [1] + [0] * (n_bus - 1)
+    data['Bus'] = bus
+
+    lines = data['Lines'].iloc[[0] * (n_bus - 1)].reset_index(drop=True)
+    lines['id'] = list(range(1, n_bus))
+    lines['name'] = ['line' + str(b) for b in range(1, n_bus)]
+    lines['from_bus'] = list(range(n_bus - 1))
+    lines['to_bus'] = list(range(1, n_bus))
+    data['Lines'] = lines
+
+    base_profile = data['Load TS'][data['Load']['id'][0]].to_numpy(dtype=float)
+    load_TS = pandas.DataFrame({'Time': data['Load TS']['Time']})
+    for id in range(1, n_loads + 1):
+        load_TS[id] = numpy.roll(base_profile, int(random.integers(0, 24))) * random.uniform(0.5, 1.5)
+    data['Load TS'] = load_TS
+    data['Load'] = pandas.DataFrame({'id': list(range(1, n_loads + 1)), 'name': ['load' + str(id) for id in range(1, n_loads + 1)],
+                                     'type': [float('nan')] * n_loads, 'Bus': [other_buses[n % len(other_buses)] for n in range(n_loads)],
+                                     'Installed_power': [1] * n_loads})
+
+    numeric = lambda table, columns: table[columns].apply(pandas.to_numeric, errors='coerce').notna().all(axis=1)
+    PV_models = list(data['PV database'].index[numeric(data['PV database'], ['Capital', 'Replacement', 'O&M', 'Lifetime', 'DNI rating'])])
+    PV_profile = data['PV TS'][data['PV']['id'][0]].to_numpy(dtype=float)
+    PV = data['PV'].iloc[[0] * n_PV].reset_index(drop=True)
+    PV['id'] = list(range(1, n_PV + 1))
+    PV['name'] = ['PV' + str(id) for id in range(1, n_PV + 1)]
+    PV['model'] = [PV_models[n % len(PV_models)] if PV_models else PV['model'][n] for n in range(n_PV)]
+    PV['Bus'] = [other_buses[n % len(other_buses)] for n in range(n_PV)]
+    PV['forecast'] = 0
+    data['PV'] = PV
+    PV_TS = pandas.DataFrame({'Time': data['PV TS']['Time']})
+    for id in range(1, n_PV + 1):
+        PV_TS[id] = PV_profile * random.uniform(0.8, 1.0)
+    data['PV TS'] = PV_TS
+
+    complete = ['Capacity (kWh)', 'Max charge (kW)', 'Max discharge (kW)', 'SOC min', 'SOC max', 'Charge eff.',
+                'Discharge eff.', 'Self-discharge rate (hourly)', 'Calendar aging (anual)', 'Degradation cost']
+    BESS_models = list(data['Battery database'].index[numeric(data['Battery database'], complete)])
+    BESS = data['BESS'].iloc[[0] * n_BESS].reset_index(drop=True)
+    BESS['id'] = list(range(1, n_BESS + 1))
+    BESS['name'] = ['BESS' + str(id) for id in range(1, n_BESS + 1)]
+    BESS['model'] = [BESS_models[n % len(BESS_models)] if BESS_models else BESS['model'][n] for n in range(n_BESS)]
+    BESS['Bus'] = [other_buses[n % len(other_buses)] for n in range(n_BESS)]
+    data['BESS'] = BESS
+
+    grid = data['Grid'].copy()
+    grid['Bus'] = [b if b in l_bus else 0 for b in grid['Bus']]
+    data['Grid'] = grid
+    return data
+
+
+def run_stage(table, name, function, trace_memory=True):
+    '''
+    Runs a stage of the pipeline and stores its time and memory in the table
+    :param table: ``dict`` {stage: {column: value}} where the results are stored
+    :param name: name of the stage
+    :param function: function without arguments that runs the stage
+    :param trace_memory: if True, the memory allocated by python during the stage is traced (tracemalloc), which
+        makes the stage slower
+    :return: what function returns
+    '''
+    gc.collect()
+    if trace_memory:
+        tracemalloc.start()
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+    begin = time.perf_counter()
+    result = function()
+    row = {'Time [s]': time.perf_counter() - begin}
+    if trace_memory:
+        current, peak = tracemalloc.get_traced_memory()
+        row['Memory peak [MB]'] = (peak - before) / 1e6
+        row['Memory retained [MB]'] = (current - before) / 1e6
+    table[name] = row
+    return result
+
+
+def benchmark_pipeline(data_dir='CSV/DATA/', days=7, inc_t=1, n_bus=4, n_loads=4, n_PV=1, n_BESS=1,
+                       solver='appsi_highs', trace_memory=True, cold=True, seed=0):
+    '''
+    Time and memory peak of each stage of the pipeline for a synthetic case (see synthetic_data)
+    :param data_dir: folder of the client used as base of the synthetic case
+    :param days: length of the horizon [days]
+    :param inc_t: time-step magnitude [h]
+    :param n_bus, n_loads, n_PV, n_BESS: size of the synthetic case
+    :param solver: solver used in the solve stage (HiGHS by default)
+    :param trace_memory: if True, the memory peak of each stage is measured (slower, see run_stage)
+    :param cold: if True, the input files are read without the binary cache (Input_cache)
+    :param seed: seed of the random numbers of the synthetic case and of the EV profiles
+    :return: pandas DataFrame, one row per stage
+    '''
+    import pre_processing.Input_cache as Input_cache
+    from pre_process import read_input_data, build_all_inputs
+    from pre_processing.System import steps_calendar
+    from pre_processing.Grid import dict_periods
+    from optimization_model import solver_factory, solve_model, RunReportClass
+    from post_processing.get_Results import allResultsClass
+    from post_process import save_sizing, save_operation, save_economics, save_network
+    from post_processing.Export import columnar_available
+
+    table = {}
+    cache_enabled = Input_cache.cache_enabled
+    Input_cache.cache_enabled = not cold
+    try:
+        data = run_stage(table, 'Excel load', lambda: read_input_data(data_dir), trace_memory)
+    finally:
+        Input_cache.cache_enabled = cache_enabled
+    data = synthetic_data(data, n_bus, n_loads, n_PV, n_BESS, seed)
+    l_t = list(range(int(round(24 / inc_t)) * days))
+    overrides = {'l_t': l_t, 'inc_t': inc_t}
+    numpy.random.seed(seed)  # the EV charging profiles are random (pre_processing/EV.py), same case in every run
+    AllInputs = run_stage(table, 'build_all_inputs', lambda: build_all_inputs(data_dir, overrides=overrides, data=data), trace_memory)
+
+    name_days = steps_calendar(data['Time data'], len(l_t), inc_t)
+    run_stage(table, 'dict_periods', lambda: dict_periods(6, 'Peninsula', l_t, inc_t, name_days), trace_memory)
+    Load = copy.copy(AllInputs.Load)
+    run_stage(table, 'total_buses', lambda: Load.total_buses(AllInputs.Network.Buses.id_list, l_t), trace_memory)
+
+    run_stage(table, 'optimization() ConcreteModel', lambda: optimization(AllInputs, concrete=True), trace_memory)
+    instance = run_stage(table, 'optimization() AbstractModel + create_instance', lambda: optimization(AllInputs, concrete=False),
+                         trace_memory)
+
+    report = run_stage(table, 'solve ' + solver, lambda: solve_model(instance, solver_factory(solver), RunReportClass()), trace_memory)
+    if report.is_optimal():
+        allResults = run_stage(table, 'allResultsClass', lambda: allResultsClass(l_t, AllInputs, instance), trace_memory)
+        with tempfile.TemporaryDirectory() as folder:
+            folder = folder + os.sep
+            run_stage(table, 'Excel export', lambda: [save(allResults, AllInputs, folder) for save in
+                                                      [save_sizing, save_operation, save_economics, save_network]], trace_memory)
+            results_format = 'parquet' if columnar_available() else 'csv'
+            run_stage(table, results_format + ' export', lambda: [save_sizing(allResults, AllInputs, folder, 'csv'),
+                                                                  save_operation(allResults, AllInputs, folder, results_format),
+                                                                  save_economics(allResults, AllInputs, folder, 'csv'),
+                                                                  save_network(allResults, AllInputs, folder, results_format)], trace_memory)
+    else:
+        print('Benchmark WARNING: the case is ' + report.termination_condition + ', the post-process is not measured')
+    if trace_memory:
+        tracemalloc.stop()
+
+    table = pandas.DataFrame(table).T
+    table.index.name = 'stage'
+    table['Variables'] = instance.nvariables()
+    table['Constraints'] = instance.nconstraints()
+    return table
+
+
+def benchmark_scaling(cases, file='CSV/Results/Benchmark.csv', **kwargs):
+    '''
+    Runs benchmark_pipeline for several sizes, to see how each stage scales
+    :param cases: ``list`` of ``dict`` with the arguments of each case. E.g. [{'days': 7}, {'days': 28, 'n_bus': 10}]
+    :param file: path of the CSV where the table is saved (None: not saved)
+    :param kwargs: arguments common to all the cases (see benchmark_pipeline)
+    :return: pandas DataFrame with one row per case and stage
+    '''
+    tables = {}
+    for case in cases:
+        arguments = dict(kwargs)
+        arguments.update(case)
+        name = ', '.join(key + '=' + str(value) for key, value in case.items())
+        print('Benchmark: ' + name)
+        tables[name] = benchmark_pipeline(**arguments)
+    table = pandas.concat(tables, names=['case'])
+    if file is not None:
+        os.makedirs(os.path.dirname(file) or '.', exist_ok=True)
+        table.to_csv(file)
+    return table
+
+
+if __name__ == '__main__':
+    # python benchmark.py [days]  --> construction time, optimization horizon of the benchmark (whole year by default)
+    # python benchmark.py pipeline [days] [n_bus] [n_loads] [n_PV] [n_BESS]  --> time and memory of each stage
+    # python benchmark.py scaling  --> stages of several synthetic cases, saved in CSV/Results/Benchmark.csv
+    pandas.set_option('display.width', 200)
+    pandas.set_option('display.max_columns', None)
+    arguments = sys.argv[1:]
+    if arguments and arguments[0] == 'pipeline':
+        sizes = [int(a) for a in arguments[1:]]
+        names = ['days', 'n_bus', 'n_loads', 'n_PV', 'n_BESS']
+        print(benchmark_pipeline(**dict(zip(names, sizes))))
+    elif arguments and arguments[0] == 'scaling':
+        print(benchmark_scaling([{'days': 7}, {'days': 28}, {'days': 7, 'n_bus': 20, 'n_loads': 40},
+                                 {'days': 7, 'n_PV': 10, 'n_BESS': 10}]))
+    else:
+        from pre_process import build_all_inputs
+        overrides = {}
+        if arguments:
+            overrides['l_t'] = list(range(24 * int(arguments[0])))
+        AllInputs = build_all_inputs('CSV/DATA/', overrides=overrides)
+        print(benchmark_construction(AllInputs))
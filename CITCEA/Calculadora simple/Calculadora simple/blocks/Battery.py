@@ -5,8 +5,10 @@ It includes performance characteristics and costs calculation. The number of bat
 
 import pyomo.environ as pyo
 import math
+from profiling import stage
 
 
+@stage()
 def Battery_block(model, l_BESS, l_t, AllInputs, emergency):
     """
     BESS system.
@@ -86,15 +88,25 @@ def Battery_block(model, l_BESS, l_t, AllInputs, emergency):
     # model.BESS_n_replacement = pyo.Param(model.i_BESS, initialize=BESS_n_r)  # number of times the battery has to be replaced during the project lifetime
     model.BESS_c_incentives = pyo.Param(model.i_BESS, initialize=AllInputs.BESS.capex_incentives,
                                         within=pyo.NonNegativeReals)  # economic incentives on the Battery capex [€/kWh]
-    model.BESS_fix_k = pyo.Param(model.i_BESS, initialize=AllInputs.BESS.fix_u, within=pyo.Any)  # number of batteries (to add) if it is fixed
+    model.BESS_fix_k = pyo.Param(model.i_BESS, initialize=AllInputs.BESS.fix_u, within=pyo.Any, mutable=AllInputs.System.mutable)  # number of batteries (to add) if it is fixed
     model.BESS_c_degradation = pyo.Param(model.i_BESS, initialize=AllInputs.BESS.degradation_cost, within=pyo.NonNegativeReals)  # cost of cycle aging [€/kWh carged and discharged]
+    aggregation = AllInputs.System.aggregation
+    if aggregation is not None and emergency == False:  # representative days
+        model.BESS_SOC_max_day = pyo.Param(model.i_BESS, model.day, initialize=aggregation.SOCmax_day,
+                                           within=pyo.NonNegativeReals)  # maximum state of charge [pu] at each day of the horizon including calendar aging
 
 
     ##### Model Variables #####
 
     model.BESS_P_char = pyo.Var(model.i_BESS, model.t, within=pyo.NonNegativeReals)  # Battery charging power [kW]
     model.BESS_P_disch = pyo.Var(model.i_BESS, model.t, within=pyo.NonNegativeReals)  # Battery discharging power [kW]
-    model.BESS_SOC = pyo.Var(model.i_BESS, model.t, within=pyo.NonNegativeReals)  # state of charge of the battery [kW]
+    if aggregation is not None and emergency == False:  # representative days
+        model.BESS_SOC = pyo.Var(model.i_BESS, model.t, within=pyo.Reals)  # state of charge of the battery relative to the start of the representative day [kWh]
+        model.BESS_SOC_inter = pyo.Var(model.i_BESS, model.day, within=pyo.NonNegativeReals)  # state of charge of the battery at the start of each day of the horizon [kWh]
+        model.BESS_SOC_intra_max = pyo.Var(model.i_BESS, model.rep_day, within=pyo.NonNegativeReals)  # maximum relative state of charge in each representative day [kWh]
+        model.BESS_SOC_intra_min = pyo.Var(model.i_BESS, model.rep_day, within=pyo.NonPositiveReals)  # minimum relative state of charge in each representative day [kWh]
+    else:
+        model.BESS_SOC = pyo.Var(model.i_BESS, model.t, within=pyo.NonNegativeReals)  # state of charge of the battery [kW]
     model.BESS_Pn_char = pyo.Var(model.i_BESS, within=pyo.NonNegativeReals)  # maximum battery charging power [kW]
     model.BESS_Pn_disch = pyo.Var(model.i_BESS, within=pyo.NonNegativeReals)  # maximum battery discharging power [kW]
     model.BESS_C = pyo.Var(model.i_BESS, within=pyo.NonNegativeReals)  # energy storage capacity of the battery [kWh]
@@ -151,7 +163,8 @@ def Battery_block(model, l_BESS, l_t, AllInputs, emergency):
         :return: expression of the constraint for every t and i_BESS
         """
         return m.BESS_SOC_min[i_BESS] * (m.BESS_C[i_BESS] + m.BESS_C_bat0[i_BESS]) <= m.BESS_SOC[i_BESS, t]
-    model.Constr_BESS_SOC_min = pyo.Constraint(model.i_BESS, model.t, rule=Constraint_BESS_SOC_min)
+    if aggregation is None or emergency == True:
+        model.Constr_BESS_SOC_min = pyo.Constraint(model.i_BESS, model.t, rule=Constraint_BESS_SOC_min)
 
     def Constraint_BESS_SOC_max(m, i_BESS, t):  # SOC en kWh
         """
@@ -162,7 +175,8 @@ def Battery_block(model, l_BESS, l_t, AllInputs, emergency):
         :return: expression of the constraint for every t and i_BESS
         """
         return m.BESS_SOC[i_BESS, t] <= m.BESS_SOC_max[i_BESS, t] * (m.BESS_C[i_BESS] + m.BESS_C_bat0[i_BESS])
-    model.Constr_BESS_SOC_max = pyo.Constraint(model.i_BESS, model.t, rule=Constraint_BESS_SOC_max)
+    if aggregation is None or emergency == True:
+        model.Constr_BESS_SOC_max = pyo.Constraint(model.i_BESS, model.t, rule=Constraint_BESS_SOC_max)
 
     def Constraint_BESS_P_char(m, i_BESS, t):
         """
@@ -195,18 +209,87 @@ def Battery_block(model, l_BESS, l_t, AllInputs, emergency):
         :param t: time-step index
         :return: expression of the constraint for every t and i_BESS
         """
-        if t > 0:
+        if t != l_t[0]:
             # t --> t+1
             return m.BESS_SOC[i_BESS, t] == m.BESS_SOC[i_BESS, t - 1] * (1 - m.BESS_tau[i_BESS]) + \
                 (m.BESS_P_char[i_BESS, t] * m.BESS_ef_char[i_BESS] - m.BESS_P_disch[i_BESS, t] / m.BESS_ef_disch[i_BESS]) * m.inc_t
         else:  # SOC[0]=SOC[fin]
-            if emergency==False:
+            if emergency==False and not AllInputs.BESS.SOC_start:
                 return m.BESS_SOC[i_BESS, l_t[0]] == m.BESS_SOC[i_BESS, l_t[-1]] * (1 - m.BESS_tau[i_BESS]) + \
                     (m.BESS_P_char[i_BESS, l_t[0]] * m.BESS_ef_char[i_BESS] - m.BESS_P_disch[i_BESS, l_t[0]] / m.BESS_ef_disch[i_BESS]) * m.inc_t
+            elif emergency==False:  # state of charge at the end of the previous time window (rolling horizon)
+                return m.BESS_SOC[i_BESS, l_t[0]] == AllInputs.BESS.SOC_start[i_BESS] * (1 - m.BESS_tau[i_BESS]) + \
+                    (m.BESS_P_char[i_BESS, l_t[0]] * m.BESS_ef_char[i_BESS] - m.BESS_P_disch[i_BESS, l_t[0]] / m.BESS_ef_disch[i_BESS]) * m.inc_t
             else:  # state of charge at the start of an islanded period for the islandable analysis [pu]
                 return m.BESS_SOC[i_BESS, l_t[0]] == m.BESS_SOC_ini[i_BESS] * (m.BESS_C[i_BESS] + m.BESS_C_bat0[i_BESS]) * (1 - m.BESS_tau[i_BESS]) + \
                     (m.BESS_P_char[i_BESS, l_t[0]] * m.BESS_ef_char[i_BESS] - m.BESS_P_disch[i_BESS, l_t[0]] / m.BESS_ef_disch[i_BESS]) * m.inc_t
-    model.Constr_BESS_SOC = pyo.Constraint(model.i_BESS, model.t, rule=Constraint_BESS_SOC)
+    if aggregation is None or emergency == True:
+        model.Constr_BESS_SOC = pyo.Constraint(model.i_BESS, model.t, rule=Constraint_BESS_SOC)
+
+    ##### Representative days: intra-day and inter-day state of charge #####
+
+    def Constraint_BESS_SOC_intra(m, i_BESS, t):
+        """
+        Constraint: BESS state of charge evolution inside a representative day, relative to the state of charge at the start of the day
+        :param m: Pyomo optimization model
+        :param i_BESS: BESS model or subsystem index
+        :param t: time-step index
+        :return: expression of the constraint for every t and i_BESS
+        """
+        if t == aggregation.first_t[t // aggregation.steps_day]:
+            return m.BESS_SOC[i_BESS, t] == \
+                (m.BESS_P_char[i_BESS, t] * m.BESS_ef_char[i_BESS] - m.BESS_P_disch[i_BESS, t] / m.BESS_ef_disch[i_BESS]) * m.inc_t
+        else:
+            return m.BESS_SOC[i_BESS, t] == m.BESS_SOC[i_BESS, t - 1] * (1 - m.BESS_tau[i_BESS]) + \
+                (m.BESS_P_char[i_BESS, t] * m.BESS_ef_char[i_BESS] - m.BESS_P_disch[i_BESS, t] / m.BESS_ef_disch[i_BESS]) * m.inc_t
+
+    def Constraint_BESS_SOC_intra_max(m, i_BESS, t):
+        return m.BESS_SOC[i_BESS, t] <= m.BESS_SOC_intra_max[i_BESS, t // aggregation.steps_day]
+
+    def Constraint_BESS_SOC_intra_min(m, i_BESS, t):
+        return m.BESS_SOC_intra_min[i_BESS, t // aggregation.steps_day] <= m.BESS_SOC[i_BESS, t]
+
+    def Constraint_BESS_SOC_inter(m, i_BESS, day):
+        """
+        Constraint: state of charge at the start of the next day is the one at the start of the day plus the variation
+        of its representative day. It is supposed that the SOC at the start and at the end of the year is the same (cyclic operation).
+        :param m: Pyomo optimization model
+        :param i_BESS: BESS model or subsystem index
+        :param day: day of the horizon
+        :return: expression of the constraint for every day and i_BESS
+        """
+        rep_day = aggregation.day_map[day]
+        return m.BESS_SOC_inter[i_BESS, m.day.nextw(day)] == m.BESS_SOC_inter[i_BESS, day] * (1 - m.BESS_tau[i_BESS]) ** aggregation.steps_day \
+            + m.BESS_SOC[i_BESS, aggregation.last_t[rep_day]]
+
+    def Constraint_BESS_SOC_inter_max(m, i_BESS, day):
+        """
+        Constraint: state of charge upper limit at every time-step of every day of the horizon
+        :param m: Pyomo optimization model
+        :param i_BESS: BESS model or subsystem index
+        :param day: day of the horizon
+        :return: expression of the constraint for every day and i_BESS
+        """
+        return m.BESS_SOC_inter[i_BESS, day] + m.BESS_SOC_intra_max[i_BESS, aggregation.day_map[day]] <= m.BESS_SOC_max_day[i_BESS, day] * (m.BESS_C[i_BESS] + m.BESS_C_bat0[i_BESS])
+
+    def Constraint_BESS_SOC_inter_min(m, i_BESS, day):
+        """
+        Constraint: state of charge lower limit at every time-step of every day of the horizon (considering the self-discharge of the whole day)
+        :param m: Pyomo optimization model
+        :param i_BESS: BESS model or subsystem index
+        :param day: day of the horizon
+        :return: expression of the constraint for every day and i_BESS
+        """
+        return m.BESS_SOC_min[i_BESS] * (m.BESS_C[i_BESS] + m.BESS_C_bat0[i_BESS]) <= \
+            m.BESS_SOC_inter[i_BESS, day] * (1 - m.BESS_tau[i_BESS]) ** aggregation.steps_day + m.BESS_SOC_intra_min[i_BESS, aggregation.day_map[day]]
+
+    if aggregation is not None and emergency == False:
+        model.Constr_BESS_SOC_intra = pyo.Constraint(model.i_BESS, model.t, rule=Constraint_BESS_SOC_intra)
+        model.Constr_BESS_SOC_intra_max = pyo.Constraint(model.i_BESS, model.t, rule=Constraint_BESS_SOC_intra_max)
+        model.Constr_BESS_SOC_intra_min = pyo.Constraint(model.i_BESS, model.t, rule=Constraint_BESS_SOC_intra_min)
+        model.Constr_BESS_SOC_inter = pyo.Constraint(model.i_BESS, model.day, rule=Constraint_BESS_SOC_inter)
+        model.Constr_BESS_SOC_inter_max = pyo.Constraint(model.i_BESS, model.day, rule=Constraint_BESS_SOC_inter_max)
+        model.Constr_BESS_SOC_inter_min = pyo.Constraint(model.i_BESS, model.day, rule=Constraint_BESS_SOC_inter_min)
 
     def Calculo_BESS_C_capex(m, i_BESS):
         """
@@ -276,11 +359,11 @@ def Battery_block(model, l_BESS, l_t, AllInputs, emergency):
     model.Constr_BESS_fix_k = pyo.Constraint(model.i_BESS, rule=Constraint_BESS_fix_k)
 
     def Constraint_throughput(m, i_BESS):
-        return sum(m.BESS_P_disch[i_BESS, t] for t in l_t) * m.inc_t / m.BESS_ef_disch[i_BESS] <= (m.BESS_k0[i_BESS] + m.BESS_k[i_BESS]) * m.BESS_E[i_BESS] / m.BESS_L[i_BESS]
+        return sum(m.BESS_P_disch[i_BESS, t] * m.weight_t[t] for t in l_t) * m.inc_t / m.BESS_ef_disch[i_BESS] <= (m.BESS_k0[i_BESS] + m.BESS_k[i_BESS]) * m.BESS_E[i_BESS] / m.BESS_L[i_BESS]
     model.Constr_Bat10 = pyo.Constraint(model.i_BESS, rule=Constraint_throughput)
 
     def Constraint_BESS_degradation_cost(m, i_BESS):  # it works also as minor term to avoid BESS charging and discharging simultaneously
-        return m.BESS_C_degradation[i_BESS] == sum(m.BESS_P_char[i_BESS, t]+m.BESS_P_disch[i_BESS, t] for i_BESS in l_BESS for t in l_t) * m.inc_t * m.BESS_c_degradation[i_BESS]
+        return m.BESS_C_degradation[i_BESS] == sum((m.BESS_P_char[i_BESS, t]+m.BESS_P_disch[i_BESS, t]) * m.weight_t[t] for i_BESS in l_BESS for t in l_t) * m.inc_t * m.BESS_c_degradation[i_BESS]
     model.Constr_BESS_degradation_cost = pyo.Constraint(model.i_BESS, rule=Constraint_BESS_degradation_cost)
 
     # model.char_disch_estricta = pyo.Var(model.i_BESS, model.t, within=pyo.Binary)  # 1: carga, 0: descarga
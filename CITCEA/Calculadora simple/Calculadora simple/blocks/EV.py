@@ -1,6 +1,8 @@
 import pyomo.environ as pyo
 import math
+from profiling import stage
 
+@stage()
 def EV_block(model, l_t, l_Mev, l_bus, AllInputs):
     '''
     EV system.
@@ -95,6 +97,8 @@ def EV_block(model, l_t, l_Mev, l_bus, AllInputs):
         :param t: time-step index
         :return: expression of the constraint for every t
         '''
+        if not l_Mev:  # no EV load in the time-steps of the model (e.g. a rolling-horizon window, see restrict_inputs)
+            return pyo.Constraint.Skip
         return sum(m.EV_P[Mev, t] for Mev in l_Mev) <= m.EV_P_station
 
     def Constraint_is_baseline_Mev1(m, Mev, t):
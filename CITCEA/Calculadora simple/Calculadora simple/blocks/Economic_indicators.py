@@ -1,6 +1,8 @@
 import pyomo.environ as pyo
 import math
+from profiling import stage
 
+@stage()
 def Economic_indicators_block(block, l_t, l_PV, l_BESS, l_Mev, AllInputs):
     '''
     Economic indicators
@@ -56,6 +58,10 @@ def Economic_indicators_block(block, l_t, l_PV, l_BESS, l_Mev, AllInputs):
     ##### Model Parameters #####
 
     block.annual_cost_reference = pyo.Param(initialize=AllInputs.System.annual_cost_reference)
+    if AllInputs.System.aggregation is None:
+        weight_Mev = {Mev: 1 for Mev in l_Mev}
+    else:  # representative days: each EV load represents as many days as its representative day
+        weight_Mev = AllInputs.System.aggregation.weight_Mev
 
 
     ##### Model Variables #####
@@ -79,7 +85,7 @@ def Economic_indicators_block(block, l_t, l_PV, l_BESS, l_Mev, AllInputs):
         :param m: Pyomo optimization model
         :return: expression of the constraint
         '''
-        return m.total_flexibility_cost == sum(m.EV_flexibility_cost[Mev] for Mev in l_Mev)
+        return m.total_flexibility_cost == sum(m.EV_flexibility_cost[Mev] * weight_Mev.get(Mev, 1) for Mev in l_Mev)
     block.Constr_Calc25 = pyo.Constraint(rule=Constraint_total_flexibility_cost)
 
     def Constraint_total_investment(m):
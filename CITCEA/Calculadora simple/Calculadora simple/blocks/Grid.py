@@ -1,6 +1,8 @@
 import pyomo.environ as pyo
 import math
+from profiling import stage
 
+@stage()
 def Grid_block(model, l_t, l_N, l_month, l_PV, AllInputs):
     '''
     Grid connection.
@@ -51,9 +53,9 @@ def Grid_block(model, l_t, l_N, l_month, l_PV, AllInputs):
 
     if AllInputs.Grid.conected1_islanded0 == 1:  # if grid connected
         model.Grid_c_buy = pyo.Param(model.i_Grid, model.t, initialize=AllInputs.Grid.Cost_P_buy_grid,
-                                     within=pyo.NonNegativeReals)  # price of the energy bought to the grid at each time-step [€/kWh]
+                                     within=pyo.NonNegativeReals, mutable=AllInputs.System.mutable)  # price of the energy bought to the grid at each time-step [€/kWh]
         model.Grid_c_sell = pyo.Param(model.i_Grid, model.t, initialize=AllInputs.Grid.Cost_P_sell_grid,
-                                      within=pyo.NonNegativeReals)  # price of the energy sold to the grid at each time-step [€/kWh]
+                                      within=pyo.NonNegativeReals, mutable=AllInputs.System.mutable)  # price of the energy sold to the grid at each time-step [€/kWh]
         model.Grid_K_inj = pyo.Param(model.i_Grid, initialize=AllInputs.Grid.injection,
                                      within=pyo.NonNegativeReals)  # binary that indicates the client willingness to inject power to the grid. 1: yes under some conditions, 0: never
         model.Grid_P_lim_inj = pyo.Param(model.i_Grid, initialize=AllInputs.Grid.Plim_injection,
@@ -344,6 +346,31 @@ def Grid_block(model, l_t, l_N, l_month, l_PV, AllInputs):
         else:
             return pyo.Constraint.Skip
 
+    def Constraint_Grid_P_excessmax_ini(m, i_Grid, N, month):
+        """
+        Constraint: the maximum power excess of a month can not be lower than the one already registered in previous time windows (rolling horizon)
+        :param m: Pyomo optimization model
+        :param N: tariff period
+        :param month: month index
+        :return: expression of the constraint for every N and month
+        """
+        if (i_Grid, N, month) in AllInputs.Grid.P_excessmax_ini:
+            return m.Grid_P_excessmax[i_Grid, N, month] >= AllInputs.Grid.P_excessmax_ini[i_Grid, N, month]
+        else:
+            return pyo.Constraint.Skip
+
+    def Constraint_Grid_P_hired_ini(m, i_Grid, N):
+        """
+        Constraint: the hired power can not be lower than the one already required in previous time windows (rolling horizon)
+        :param m: Pyomo optimization model
+        :param N: tariff period
+        :return: expression of the constraint for every N
+        """
+        if (i_Grid, N) in AllInputs.Grid.P_hired_ini:
+            return m.Grid_P_hired_N[i_Grid, N] >= AllInputs.Grid.P_hired_ini[i_Grid, N]
+        else:
+            return pyo.Constraint.Skip
+
     if AllInputs.Grid.conected1_islanded0 == 1:
         model.Constr_Grid_P_hired_t = pyo.Constraint(model.i_Grid, model.t, rule=Constraint_Grid_P_hired_t)
         model.Constr_Grid_P_buy_max = pyo.Constraint(model.i_Grid, model.t, rule=Constraint_Grid_P_buy_max)
@@ -368,6 +395,10 @@ def Grid_block(model, l_t, l_N, l_month, l_PV, AllInputs):
         model.Constr_Grid_hard_Plim_sell = pyo.Constraint(model.i_Grid, model.t, rule=Constraint_Grid_hard_Plim_sell)
 
         model.Constr_Grid_fix_P_hired_N = pyo.Constraint(model.i_Grid, model.N, rule=Constraint_Grid_fix_P_hired_N)
+        if AllInputs.Grid.P_excessmax_ini:
+            model.Constr_Grid_P_excessmax_ini = pyo.Constraint(model.i_Grid, model.N, model.month, rule=Constraint_Grid_P_excessmax_ini)
+        if AllInputs.Grid.P_hired_ini:
+            model.Constr_Grid_P_hired_ini = pyo.Constraint(model.i_Grid, model.N, rule=Constraint_Grid_P_hired_ini)
 
     def Constraint_Grid_C_buy(m, i_Grid):
         '''
@@ -375,7 +406,7 @@ def Grid_block(model, l_t, l_N, l_month, l_PV, AllInputs):
         :param m: Pyomo optimization model
         :return: expression of the constraint
         '''
-        return m.Grid_C_buy[i_Grid] == sum(m.Grid_c_buy[i_Grid, t] * (m.Grid_P_buy[i_Grid, t] + m.Grid_P_excess[i_Grid, t]) * m.inc_t for t in l_t)
+        return m.Grid_C_buy[i_Grid] == Grid_buy_cost(m, i_Grid, l_t)
 
     def Constraint_Grid_R_sell(m, i_Grid):
         '''
@@ -383,7 +414,7 @@ def Grid_block(model, l_t, l_N, l_month, l_PV, AllInputs):
         :param m: Pyomo optimization model
         :return: expression of the constraint
         '''
-        return m.Grid_R_sell[i_Grid] == sum(m.Grid_c_sell[i_Grid, t] * m.Grid_P_sell[i_Grid, t] * m.inc_t for t in l_t)
+        return m.Grid_R_sell[i_Grid] == Grid_sell_revenue(m, i_Grid, l_t)
 
     def Constraint_Grid_C_power(m, i_Grid):
         '''
@@ -404,9 +435,7 @@ def Grid_block(model, l_t, l_N, l_month, l_PV, AllInputs):
                 sum(m.Grid_P_excessmax[i_Grid, N, mes] * m.days_month[mes] for mes in l_month) for N in
                 AllInputs.Grid.l_N)  # coste anual de la penalización por exceso de potencia, para meters tipo 4 y 5
         else:  # AllInputs.Grid.meter_type==1,2,3
-            return m.Grid_C_penalisation[i_Grid] == m.Grid_cost_Pexcess123[i_Grid] * sum(
-                m.Grid_coefKp[i_Grid, N] * ((m.inc_t * 4 / 3 + 2 / 3) * sum(m.Grid_K_P[i_Grid, N, t] * m.Grid_P_excess[i_Grid, t] for t in l_t)) for N
-                in AllInputs.Grid.l_N)  # coste anual de la penalizacion por exceso de potencia, para meters tipo 1, 2 y 3
+            return m.Grid_C_penalisation[i_Grid] == Grid_excess_penalisation(m, i_Grid, l_t, AllInputs.Grid.l_N)  # coste anual de la penalizacion por exceso de potencia, para meters tipo 1, 2 y 3
 
     def Constraint_Grid_C_emission(m, i_Grid):
         '''
@@ -414,7 +443,7 @@ def Grid_block(model, l_t, l_N, l_month, l_PV, AllInputs):
         :param m: Pyomo optimization model
         :return: expression of the constraint
         '''
-        return m.Grid_C_emission[i_Grid] == m.c_emission * sum(m.Grid_emission_factor[i_Grid, t] * (m.Grid_P_buy[i_Grid, t] + m.Grid_P_excess[i_Grid, t]) * m.inc_t for t in l_t)
+        return m.Grid_C_emission[i_Grid] == Grid_emission_cost(m, i_Grid, l_t)
 
     if AllInputs.Grid.conected1_islanded0 == 1:  # si hay conexion a la red
         model.Constr_Grid_C_buy = pyo.Constraint(model.i_Grid, rule=Constraint_Grid_C_buy)
@@ -423,3 +452,45 @@ def Grid_block(model, l_t, l_N, l_month, l_PV, AllInputs):
         model.Constr_Grid_C_penalisation = pyo.Constraint(model.i_Grid, rule=Constraint_Grid_C_penalisation)
         model.Constr_Grid_C_emission = pyo.Constraint(model.i_Grid, rule=Constraint_Grid_C_emission)
 
+
+####################   cost expressions   ####################
+# they are also evaluated over part of the time-steps of a solved model (see rolling_horizon.py)
+
+def Grid_buy_cost(m, i_Grid, l_t):
+    '''
+    :param m: Pyomo optimization model
+    :param l_t: ``list`` with the time-steps to consider
+    :return: expression of the cost of the energy bought to the grid (bought and exceed powers) [€]
+    '''
+    return sum(m.Grid_c_buy[i_Grid, t] * (m.Grid_P_buy[i_Grid, t] + m.Grid_P_excess[i_Grid, t]) * m.inc_t * m.weight_t[t] for t in l_t)
+
+
+def Grid_sell_revenue(m, i_Grid, l_t):
+    '''
+    :param m: Pyomo optimization model
+    :param l_t: ``list`` with the time-steps to consider
+    :return: expression of the revenue of the energy sold to the grid [€]
+    '''
+    return sum(m.Grid_c_sell[i_Grid, t] * m.Grid_P_sell[i_Grid, t] * m.inc_t * m.weight_t[t] for t in l_t)
+
+
+def Grid_emission_cost(m, i_Grid, l_t):
+    '''
+    :param m: Pyomo optimization model
+    :param l_t: ``list`` with the time-steps to consider
+    :return: expression of the cost of the CO2 emissions of the energy bought from the grid [€]
+    '''
+    return m.c_emission * sum(m.Grid_emission_factor[i_Grid, t] * (m.Grid_P_buy[i_Grid, t] + m.Grid_P_excess[i_Grid, t]) * m.inc_t * m.weight_t[t] for t in l_t)
+
+
+def Grid_excess_penalisation(m, i_Grid, l_t, l_N):
+    '''
+    Penalisation by power excess of the meters type 1, 2 and 3 (the one of the meters type 4 and 5 depends on the monthly
+    maximum excess, Grid_P_excessmax)
+    :param m: Pyomo optimization model
+    :param l_t: ``list`` with the time-steps to consider
+    :param l_N: ``list`` with the tariff periods
+    :return: expression of the penalisation [€]
+    '''
+    return m.Grid_cost_Pexcess123[i_Grid] * sum(
+        m.Grid_coefKp[i_Grid, N] * ((m.inc_t * 4 / 3 + 2 / 3) * sum(m.Grid_K_P[i_Grid, N, t] * m.Grid_P_excess[i_Grid, t] * m.weight_t[t] for t in l_t)) for N in l_N)
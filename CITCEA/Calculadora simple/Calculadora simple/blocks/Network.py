@@ -1,5 +1,6 @@
 import pyomo.environ as pyo
 import math
+from profiling import stage
 
 def ACPowerFlow_iplug(model, l_t, l_bus, AllInputs):  # data, init_data):
 
@@ -95,31 +96,101 @@ def ACPowerFlow_iplug(model, l_t, l_bus, AllInputs):  # data, init_data):
     # block.Constr_max_S_line = pyo.Constraint(model.i_bus, model.i_bus, model.t, rule=max_S_line)
 
 
-def ACPowerFlow(model, l_t, l_bus, AllInputs):  # data, init_data):
-
-    ##### Model of the system network ##### -->
+def AC_branches(model, l_bus, AllInputs):
+    '''
+    Sets and parameters of the AC power flow formulations. They are defined only over the pairs of connected buses
+    (and the diagonal c[i_bus, i_bus, t] = V**2), not over all the bus x bus pairs
+    :param model: pyomo model
+    :param l_bus: ``list`` containing all buses id
+    :param AllInputs: data class which contains all inputs
+    :return: dictionary {bus: [buses connected to the bus]}
+    '''
+    Lines = AllInputs.Network.Lines
+    edges = Lines.edges()
+    branches = Lines.branches()
 
     ## Sets ##
+    model.i_edge = pyo.Set(dimen=2, initialize=edges)  # pairs of connected buses (one orientation)
+    model.i_branch = pyo.Set(dimen=2, initialize=branches)  # pairs of connected buses (both directions)
+    model.i_c = pyo.Set(dimen=2, initialize=[(bus, bus) for bus in l_bus] + edges)  # index of c: diagonal and pairs of connected buses
 
     ## Parameters ##
-    # model.bus_type = pyo.Param(model.i_bus, initialize=AllInputs.Network.Buses.type, within=pyo.Any)  # string that indicates the bus type (AC or DC)
-    model.G_bus = pyo.Param(model.i_bus, model.i_bus, initialize=AllInputs.Network.Lines.G_bus, within=pyo.Reals)  # real part of the y_bus matrix [pu]
-    model.B_bus = pyo.Param(model.i_bus, model.i_bus, initialize=AllInputs.Network.Lines.B_bus, within=pyo.Reals)  # imaginary part of the y_bus matrix [pu]
+    model.G_bus = pyo.Param(model.i_branch, initialize={branch: Lines.G_bus[branch] for branch in branches}, within=pyo.Reals)  # real part of the y_bus matrix [pu]
+    model.B_bus = pyo.Param(model.i_branch, initialize={branch: Lines.B_bus[branch] for branch in branches}, within=pyo.Reals)  # imaginary part of the y_bus matrix [pu]
+    model.i_max = pyo.Param(model.i_branch, initialize={branch: Lines.i_max[branch] for branch in branches}, within=pyo.NonNegativeReals)  # maximum current flowing through the line [pu]
     model.Vmin = pyo.Param(model.i_bus, initialize=AllInputs.Network.Buses.Vmin, within=pyo.NonNegativeReals)  # minimum voltage of the bus [pu]
     model.Vmax = pyo.Param(model.i_bus, initialize=AllInputs.Network.Buses.Vmax, within=pyo.NonNegativeReals)  # maximum voltage of the bus [pu]
 
+    neighbours = {bus: [] for bus in l_bus}
+    for bus1, bus2 in branches:
+        neighbours[bus1].append(bus2)
+    return neighbours
+
+
+def c_pair(m, i_bus1, i_bus2, t):
+    '''
+    c[i_bus1, i_bus2, t] of a pair of connected buses. c is symmetric, only one orientation is a variable
+    '''
+    if (i_bus1, i_bus2) in m.i_c:
+        return m.c[i_bus1, i_bus2, t]
+    return m.c[i_bus2, i_bus1, t]
+
+
+def s_pair(m, i_bus1, i_bus2, t):
+    '''
+    s[i_bus1, i_bus2, t] of a pair of connected buses. s is antisymmetric, only one orientation is a variable
+    '''
+    if (i_bus1, i_bus2) in m.i_edge:
+        return m.s[i_bus1, i_bus2, t]
+    return -m.s[i_bus2, i_bus1, t]
+
+
+def c_bounds(m, i_bus1, i_bus2, t):
+    if i_bus1 == i_bus2:
+        return (0, None)  # c[i_bus, i_bus, t] = V**2
+    return (None, None)
+
+
+def AC_line_flows(model, neighbours):
+    '''
+    Power flows through the branches as a function of c and s, and power injected to each bus
+    :param model: pyomo model
+    :param neighbours: dictionary {bus: [buses connected to the bus]}
+    '''
     ## Variables ##
-    model.Vreal = pyo.Var(model.i_bus, model.t, within=pyo.Reals, bounds=(-2, 2), initialize={(bus, t): 0 for bus in l_bus for t in l_t})  # real part of the voltagee phasor [pu]
-    model.Vimag = pyo.Var(model.i_bus, model.t, within=pyo.Reals, bounds=(-2, 2), initialize={(bus, t): 0 for bus in l_bus for t in l_t})  # imaginary part of the voltagee phasor [pu]
-    #
-    model.c = pyo.Var(model.i_bus, model.i_bus, model.t, within=pyo.Reals,
-                      initialize={(bus1, bus2, t): 0 for bus1 in l_bus for bus2 in l_bus for t in l_t})  # c[bus1, bus2, t] = m.Vreal[bus1, t] * m.Vreal[bus2, t] + m.Vimag[bus1, t] * m.Vimag[bus2, t]
-    model.s = pyo.Var(model.i_bus, model.i_bus, model.t, within=pyo.Reals,
-                      initialize={(bus1, bus2, t): 0 for bus1 in l_bus for bus2 in l_bus for t in l_t})  # s[bus1, bus2, t] = m.Vimag[bus1, t] * m.Vreal[bus2, t] - m.Vreal[bus1, t] * m.Vimag[bus2, t]
-    #
-    model.Pline = pyo.Var(model.i_bus, model.i_bus, model.t, within=pyo.Reals, initialize={(bus1, bus2, t): 0 for bus1 in l_bus for bus2 in l_bus for t in l_t})  # active power flowing between two buses at each time [pu]
-    model.Qline = pyo.Var(model.i_bus, model.i_bus, model.t, within=pyo.Reals, initialize={(bus1, bus2, t): 0 for bus1 in l_bus for bus2 in l_bus for t in l_t})  # reactive power flowing between two buses at each time [pu]
+    model.Pline = pyo.Var(model.i_branch, model.t, within=pyo.Reals, initialize=0)  # active power flowing from bus1 to bus2 at each time [pu]
+    model.Qline = pyo.Var(model.i_branch, model.t, within=pyo.Reals, initialize=0)  # reactive power flowing from bus1 to bus2 at each time [pu]
+
+    ## Constraints ##
+    def Constraint_AC_PF_Pinj(m, i_bus, t):
+        return m.Pinj[i_bus,t] == sum(m.Pline[i_bus, bus_aux, t] for bus_aux in neighbours[i_bus])
+    model.Constr_AC_PF_Pinj = pyo.Constraint(model.i_bus, model.t, rule=Constraint_AC_PF_Pinj)
+    def Constraint_AC_PF_Qinj(m, i_bus, t):
+        return m.Qinj[i_bus,t] == sum(m.Qline[i_bus, bus_aux, t] for bus_aux in neighbours[i_bus])
+    model.Constr_AC_PF_Qinj = pyo.Constraint(model.i_bus, model.t, rule=Constraint_AC_PF_Qinj)
+
+    def AC_PowerFlow_Pline(m, i_bus1, i_bus2, t):
+        return m.Pline[i_bus1, i_bus2, t] == m.G_bus[i_bus1, i_bus2] * (c_pair(m, i_bus1, i_bus2, t) - m.c[i_bus1, i_bus1, t]) + m.B_bus[i_bus1, i_bus2] * s_pair(m, i_bus1, i_bus2, t)
+    model.Constr_AC_PowerFlow_Pline = pyo.Constraint(model.i_branch, model.t, rule=AC_PowerFlow_Pline)
+    def AC_PowerFlow_Qline(m, i_bus1, i_bus2, t):
+        return m.Qline[i_bus1, i_bus2, t] == m.G_bus[i_bus1, i_bus2] * s_pair(m, i_bus1, i_bus2, t) - m.B_bus[i_bus1, i_bus2] * (c_pair(m, i_bus1, i_bus2, t) - m.c[i_bus1, i_bus1, t])
+    model.Constr_AC_PowerFlow_Qline = pyo.Constraint(model.i_branch, model.t, rule=AC_PowerFlow_Qline)
+
+
+def ACPowerFlow(model, l_t, l_bus, AllInputs):  # data, init_data):
+
+    ##### Model of the system network ##### -->
 
+    ## Sets ##
+    ## Parameters ##
+    neighbours = AC_branches(model, l_bus, AllInputs)
+
+    ## Variables ##
+    model.Vreal = pyo.Var(model.i_bus, model.t, within=pyo.Reals, bounds=(-2, 2), initialize=0)  # real part of the voltagee phasor [pu]
+    model.Vimag = pyo.Var(model.i_bus, model.t, within=pyo.Reals, bounds=(-2, 2), initialize=0)  # imaginary part of the voltagee phasor [pu]
+    #
+    model.c = pyo.Var(model.i_c, model.t, within=pyo.Reals, bounds=c_bounds, initialize=0)  # c[bus1, bus2, t] = m.Vreal[bus1, t] * m.Vreal[bus2, t] + m.Vimag[bus1, t] * m.Vimag[bus2, t]
+    model.s = pyo.Var(model.i_edge, model.t, within=pyo.Reals, initialize=0)  # s[bus1, bus2, t] = m.Vimag[bus1, t] * m.Vreal[bus2, t] - m.Vreal[bus1, t] * m.Vimag[bus2, t]
 
 
     ## Constraints ##
@@ -136,35 +207,14 @@ def ACPowerFlow(model, l_t, l_bus, AllInputs):  # data, init_data):
             return pyo.Constraint.Skip
     model.Constr_Vimag_slack = pyo.Constraint(model.i_bus, model.t, rule=Vimag_slack)
 
-    def Constraint_AC_PF_Pinj(m, i_bus, t):
-        return m.Pinj[i_bus,t] == sum(m.Pline[i_bus, bus_aux, t] for bus_aux in l_bus)
-    model.Constr_AC_PF_Pinj = pyo.Constraint(model.i_bus, model.t, rule=Constraint_AC_PF_Pinj)
-    def Constraint_AC_PF_Qinj(m, i_bus, t):
-        return m.Qinj[i_bus,t] == sum(m.Qline[i_bus, bus_aux, t] for bus_aux in l_bus)
-    model.Constr_AC_PF_Qinj = pyo.Constraint(model.i_bus, model.t, rule=Constraint_AC_PF_Qinj)
-
     # AC Power Flow
-    # def AC_PowerFlow_Pline(m, i_bus1, i_bus2, t):
-    #     return m.Pline[i_bus1, i_bus2, t] == m.G_bus[i_bus1, i_bus2] * (m.Vreal[i_bus1, t] * m.Vreal[i_bus2, t] + m.Vimag[i_bus1, t] * m.Vimag[i_bus2, t])\
-    #         + m.B_bus[i_bus1, i_bus2] * (m.Vimag[i_bus1, t] * m.Vreal[i_bus2, t] - m.Vreal[i_bus1, t] * m.Vimag[i_bus2, t])
-    # model.Constr_AC_PowerFlow_Pline = pyo.Constraint(model.i_bus, model.i_bus, model.t, rule=AC_PowerFlow_Pline)
-    # def AC_PowerFlow_Qline(m, i_bus1, i_bus2, t):
-    #     return m.Qline[i_bus1, i_bus2, t] == m.G_bus[i_bus1, i_bus2] * (m.Vimag[i_bus1, t] * m.Vreal[i_bus2, t] - m.Vreal[i_bus1, t] * m.Vimag[i_bus2, t])\
-    #         - m.B_bus[i_bus1, i_bus2] * (m.Vreal[i_bus1, t] * m.Vreal[i_bus2, t] + m.Vimag[i_bus1, t] * m.Vimag[i_bus2, t])
-    # model.Constr_AC_PowerFlow_Qline = pyo.Constraint(model.i_bus, model.i_bus, model.t, rule=AC_PowerFlow_Qline)
-
-    def AC_PowerFlow_Pline(m, i_bus1, i_bus2, t):
-        return m.Pline[i_bus1, i_bus2, t] == m.G_bus[i_bus1, i_bus2] * (m.c[i_bus1, i_bus2, t]-m.c[i_bus1, i_bus1, t]) + m.B_bus[i_bus1, i_bus2] * m.s[i_bus1, i_bus2, t]
-    model.Constr_AC_PowerFlow_Pline = pyo.Constraint(model.i_bus, model.i_bus, model.t, rule=AC_PowerFlow_Pline)
-    def AC_PowerFlow_Qline(m, i_bus1, i_bus2, t):
-        return m.Qline[i_bus1, i_bus2, t] == m.G_bus[i_bus1, i_bus2] * m.s[i_bus1, i_bus2, t]- m.B_bus[i_bus1, i_bus2] * (m.c[i_bus1, i_bus2, t]-m.c[i_bus1, i_bus1, t])
-    model.Constr_AC_PowerFlow_Qline = pyo.Constraint(model.i_bus, model.i_bus, model.t, rule=AC_PowerFlow_Qline)
+    AC_line_flows(model, neighbours)
     def AC_PowerFlow_c_def(m, i_bus1, i_bus2, t):
         return m.c[i_bus1, i_bus2, t] == m.Vreal[i_bus1, t] * m.Vreal[i_bus2, t] + m.Vimag[i_bus1, t] * m.Vimag[i_bus2, t]
-    model.Constr_AC_PowerFlow_c_def = pyo.Constraint(model.i_bus, model.i_bus, model.t, rule=AC_PowerFlow_c_def)
+    model.Constr_AC_PowerFlow_c_def = pyo.Constraint(model.i_c, model.t, rule=AC_PowerFlow_c_def)
     def AC_PowerFlow_s_def(m, i_bus1, i_bus2, t):
         return m.s[i_bus1, i_bus2, t] == m.Vreal[i_bus2, t] * m.Vimag[i_bus1, t] - m.Vreal[i_bus1, t] * m.Vimag[i_bus2, t]
-    model.Constr_AC_PowerFlow_s_def = pyo.Constraint(model.i_bus, model.i_bus, model.t, rule=AC_PowerFlow_s_def)
+    model.Constr_AC_PowerFlow_s_def = pyo.Constraint(model.i_edge, model.t, rule=AC_PowerFlow_s_def)
 
     '''
     + V upper and lower limits
@@ -183,76 +233,49 @@ def ACPowerFlow(model, l_t, l_bus, AllInputs):  # data, init_data):
     Iik = (Vi-Vk)/Zik - Vi*yik/2
     Sik = Vi * Iik_conj --> mod(Sik) = mod(Vi) * mod(Iik) --> Sik**2 = Vi**2 * Iik**2 --> Pik**2 + Qik**2 = cii * Iik**2
     '''
-    model.i_max = pyo.Param(model.i_bus, model.i_bus, initialize=AllInputs.Network.Lines.i_max, within=pyo.NonNegativeReals)  # maximum current flowing through the line [pu]
-    model.i_line_squared = pyo.Var(model.i_bus, model.i_bus, model.t, within=pyo.Reals, initialize={(bus1, bus2, t): 0 for bus1 in l_bus for bus2 in l_bus for t in l_t})  # current between two buses at each time [pu]
+    model.i_line_squared = pyo.Var(model.i_branch, model.t, within=pyo.Reals, initialize=0)  # current between two buses at each time [pu]
     def AC_PowerFlow_i_line_squared(m, i_bus1, i_bus2, t):
         return m.Pline[i_bus1, i_bus2, t]**2 + m.Qline[i_bus1, i_bus2, t]**2 == m.c[i_bus1, i_bus1, t] * m.i_line_squared[i_bus1, i_bus2, t]
-    model.Constr_AC_PowerFlow_i_line_squared = pyo.Constraint(model.i_bus, model.i_bus, model.t, rule=AC_PowerFlow_i_line_squared)
+    model.Constr_AC_PowerFlow_i_line_squared = pyo.Constraint(model.i_branch, model.t, rule=AC_PowerFlow_i_line_squared)
     def AC_PowerFlow_max_i_line(m, i_bus1, i_bus2, t):
-        if m.G_bus[i_bus1, i_bus2] != 0 and i_bus1 != i_bus2:
-            return m.i_line_squared[i_bus1, i_bus2, t] <= m.i_max[i_bus1, i_bus2]**2
-        else:
-            return pyo.Constraint.Skip
-    # model.Constr_AC_PowerFlow_max_i_line = pyo.Constraint(model.i_bus, model.i_bus, model.t, rule=AC_PowerFlow_max_i_line)
+        return m.i_line_squared[i_bus1, i_bus2, t] <= m.i_max[i_bus1, i_bus2]**2
+    # model.Constr_AC_PowerFlow_max_i_line = pyo.Constraint(model.i_branch, model.t, rule=AC_PowerFlow_max_i_line)
 
 
 
-def SOCPACPowerFlow(model, l_t, l_bus, AllInputs):  # data, init_data):
+def SOCPACPowerFlow(model, l_t, l_bus, AllInputs, cone=True):  # data, init_data):
+    '''
+    SOCP relaxation of the AC power flow
+    :param cone: True: c[i,j]**2 + s[i,j]**2 <= c[i,i] * c[j,j] (rotated second order cone, convex);
+        False: c[i,j]**2 + s[i,j]**2 == c[i,i] * c[j,j] (non-convex, NonConvex=2 in gurobi)
+    '''
 
     ##### Model of the system network ##### -->
 
     ## Sets ##
-
     ## Parameters ##
-    # model.bus_type = pyo.Param(model.i_bus, initialize=AllInputs.Network.Buses.type, within=pyo.Any)  # string that indicates the bus type (AC or DC)
-    model.G_bus = pyo.Param(model.i_bus, model.i_bus, initialize=AllInputs.Network.Lines.G_bus, within=pyo.Reals)  # real part of the y_bus matrix [pu]
-    model.B_bus = pyo.Param(model.i_bus, model.i_bus, initialize=AllInputs.Network.Lines.B_bus, within=pyo.Reals)  # imaginary part of the y_bus matrix [pu]
-    model.Vmin = pyo.Param(model.i_bus, initialize=AllInputs.Network.Buses.Vmin, within=pyo.NonNegativeReals)  # minimum voltage of the bus [pu]
-    model.Vmax = pyo.Param(model.i_bus, initialize=AllInputs.Network.Buses.Vmax, within=pyo.NonNegativeReals)  # maximum voltage of the bus [pu]
+    neighbours = AC_branches(model, l_bus, AllInputs)
 
     ## Variables ##
-    model.c = pyo.Var(model.i_bus, model.i_bus, model.t, within=pyo.Reals,
-                      initialize={(bus1, bus2, t): 0 for bus1 in l_bus for bus2 in l_bus for t in l_t})  # c[bus1, bus2, t] = m.Vreal[bus1, t] * m.Vreal[bus2, t] + m.Vimag[bus1, t] * m.Vimag[bus2, t]
-    model.s = pyo.Var(model.i_bus, model.i_bus, model.t, within=pyo.Reals,
-                      initialize={(bus1, bus2, t): 0 for bus1 in l_bus for bus2 in l_bus for t in l_t})  # s[bus1, bus2, t] = m.Vimag[bus1, t] * m.Vreal[bus2, t] - m.Vreal[bus1, t] * m.Vimag[bus2, t]
-    #
-    model.Pline = pyo.Var(model.i_bus, model.i_bus, model.t, within=pyo.Reals, initialize={(bus1, bus2, t): 0 for bus1 in l_bus for bus2 in l_bus for t in l_t})  # active power flowing between two buses at each time [pu]
-    model.Qline = pyo.Var(model.i_bus, model.i_bus, model.t, within=pyo.Reals, initialize={(bus1, bus2, t): 0 for bus1 in l_bus for bus2 in l_bus for t in l_t})  # reactive power flowing between two buses at each time [pu]
-
+    model.c = pyo.Var(model.i_c, model.t, within=pyo.Reals, bounds=c_bounds, initialize=0)  # c[bus1, bus2, t] = m.Vreal[bus1, t] * m.Vreal[bus2, t] + m.Vimag[bus1, t] * m.Vimag[bus2, t]
+    model.s = pyo.Var(model.i_edge, model.t, within=pyo.Reals, initialize=0)  # s[bus1, bus2, t] = m.Vimag[bus1, t] * m.Vreal[bus2, t] - m.Vreal[bus1, t] * m.Vimag[bus2, t]
 
 
     ## Constraints ##
-    def Constraint_AC_PF_Pinj(m, i_bus, t):
-        return m.Pinj[i_bus,t] == sum(m.Pline[i_bus, bus_aux, t] for bus_aux in l_bus)
-    model.Constr_AC_PF_Pinj = pyo.Constraint(model.i_bus, model.t, rule=Constraint_AC_PF_Pinj)
-    def Constraint_AC_PF_Qinj(m, i_bus, t):
-        return m.Qinj[i_bus,t] == sum(m.Qline[i_bus, bus_aux, t] for bus_aux in l_bus)
-    model.Constr_AC_PF_Qinj = pyo.Constraint(model.i_bus, model.t, rule=Constraint_AC_PF_Qinj)
-
     # SOCP AC Power Flow
-    def SOCP_AC_PowerFlow_Pline(m, i_bus1, i_bus2, t):
-        # return m.Pline[i_bus1, i_bus2, t] == m.G_bus[i_bus1, i_bus2] * m.c[i_bus1, i_bus2, t] + m.B_bus[i_bus1, i_bus2] * m.s[i_bus1, i_bus2, t]
-        return m.Pline[i_bus1, i_bus2, t] == m.G_bus[i_bus1, i_bus2] * (m.c[i_bus1, i_bus2, t]-m.c[i_bus1, i_bus1, t]) + m.B_bus[i_bus1, i_bus2] * m.s[i_bus1, i_bus2, t]
-    model.Constr_SOCP_AC_PowerFlow_Pline = pyo.Constraint(model.i_bus, model.i_bus, model.t, rule=SOCP_AC_PowerFlow_Pline)
-    def SOCP_AC_PowerFlow_Qline(m, i_bus1, i_bus2, t):
-        # return m.Qline[i_bus1, i_bus2, t] == m.G_bus[i_bus1, i_bus2] * m.s[i_bus1, i_bus2, t]- m.B_bus[i_bus1, i_bus2] * m.c[i_bus1, i_bus2, t]
-        return m.Qline[i_bus1, i_bus2, t] == m.G_bus[i_bus1, i_bus2] * m.s[i_bus1, i_bus2, t] - m.B_bus[i_bus1, i_bus2] * (m.c[i_bus1, i_bus2, t]-m.c[i_bus1, i_bus1, t])
-    model.Constr_SOCP_AC_PowerFlow_Qline = pyo.Constraint(model.i_bus, model.i_bus, model.t, rule=SOCP_AC_PowerFlow_Qline)
-    def SOCP_AC_PowerFlow_c(m, i_bus1, i_bus2, t):
-        return m.c[i_bus1, i_bus2, t] == m.c[i_bus2, i_bus1, t]
-    model.Constr_SOCP_AC_PowerFlow_c = pyo.Constraint(model.i_bus, model.i_bus, model.t, rule=SOCP_AC_PowerFlow_c)
-    def SOCP_AC_PowerFlow_s(m, i_bus1, i_bus2, t):
-        return m.s[i_bus1, i_bus2, t] == - m.s[i_bus2, i_bus1, t]
-    model.Constr_SOCP_AC_PowerFlow_s = pyo.Constraint(model.i_bus, model.i_bus, model.t, rule=SOCP_AC_PowerFlow_s)
+    AC_line_flows(model, neighbours)
+    # c[i_bus2, i_bus1, t] = c[i_bus1, i_bus2, t] and s[i_bus2, i_bus1, t] = - s[i_bus1, i_bus2, t] (see c_pair and s_pair)
     def SOCP_AC_PowerFlow_cs(m, i_bus1, i_bus2, t):
+        if cone:  # rotated cone
+            return m.c[i_bus1, i_bus2, t] ** 2 + m.s[i_bus1, i_bus2, t] ** 2 <= m.c[i_bus1, i_bus1, t] * m.c[i_bus2, i_bus2, t]
         return m.c[i_bus1, i_bus2, t] ** 2 + m.s[i_bus1, i_bus2, t] ** 2 == m.c[i_bus1, i_bus1, t] * m.c[i_bus2, i_bus2, t]
-    model.Constr_SOCP_AC_PowerFlow_cs = pyo.Constraint(model.i_bus, model.i_bus, model.t, rule=SOCP_AC_PowerFlow_cs)
+    model.Constr_SOCP_AC_PowerFlow_cs = pyo.Constraint(model.i_edge, model.t, rule=SOCP_AC_PowerFlow_cs)
 
     def c_slack(m, i_bus, t):
         if m.bus_is_slack[i_bus] == 1:  # the bus is a slack
             return m.c[i_bus, i_bus, t] == 1
-        else:  # the bus is not a slack
-            return m.c[i_bus, i_bus, t] >= 0  # V**2
+        else:  # the bus is not a slack: c[i_bus, i_bus, t] >= 0 (V**2) is the lower bound of c
+            return pyo.Constraint.Skip
     model.Constr_c_slack = pyo.Constraint(model.i_bus, model.t, rule=c_slack)
 
     # Exact AC Power Flow
@@ -270,34 +293,34 @@ def SOCPACPowerFlow(model, l_t, l_bus, AllInputs):  # data, init_data):
     # i limit
     ''' Iik = (Vi-Vk)/Zik - Vi*yik/2
     Sik = Vi * Iik_conj --> mod(Sik) = mod(Vi) * mod(Iik) --> Sik**2 = Vi**2 * Iik**2 --> Pik**2 + Qik**2 = cii * Iik**2'''
-    model.i_max = pyo.Param(model.i_bus, model.i_bus, initialize=AllInputs.Network.Lines.i_max, within=pyo.NonNegativeReals)  # maximum current flowing through the line [pu]
-    # model.i_line_squared = pyo.Var(model.i_bus, model.i_bus, model.t, within=pyo.Reals, initialize={(bus1, bus2, t): 0 for bus1 in l_bus for bus2 in l_bus for t in l_t})  # current between two buses at each time [pu]
+    # model.i_line_squared = pyo.Var(model.i_branch, model.t, within=pyo.Reals, initialize=0)  # current between two buses at each time [pu]
     def SOCP_AC_PowerFlow_i_line_squared(m, i_bus1, i_bus2, t):
-        return m.Pline[i_bus1, i_bus2, t]**2 + m.Qline[i_bus1, i_bus2, t]**2 == m.c[i_bus1, i_bus1, t] * m.i_line_squared[i_bus1, i_bus2, t]
-    # model.Constr_SOCP_AC_PowerFlow_i_line_squared = pyo.Constraint(model.i_bus, model.i_bus, model.t, rule=SOCP_AC_PowerFlow_i_line_squared)
+        return m.Pline[i_bus1, i_bus2, t]**2 + m.Qline[i_bus1, i_bus2, t]**2 <= m.c[i_bus1, i_bus1, t] * m.i_line_squared[i_bus1, i_bus2, t]
+    # model.Constr_SOCP_AC_PowerFlow_i_line_squared = pyo.Constraint(model.i_branch, model.t, rule=SOCP_AC_PowerFlow_i_line_squared)
     def SOCP_AC_PowerFlow_max_i_line(m, i_bus1, i_bus2, t):
-        if m.G_bus[i_bus1, i_bus2] != 0 and i_bus1 != i_bus2:
-            return m.i_line_squared[i_bus1, i_bus2, t] <= m.i_max[i_bus1, i_bus2]**2
-        else:
-            return pyo.Constraint.Skip
-    # model.Constr_SOCP_AC_PowerFlow_max_i_line = pyo.Constraint(model.i_bus, model.i_bus, model.t, rule=SOCP_AC_PowerFlow_max_i_line)
+        return m.i_line_squared[i_bus1, i_bus2, t] <= m.i_max[i_bus1, i_bus2]**2
+    # model.Constr_SOCP_AC_PowerFlow_max_i_line = pyo.Constraint(model.i_branch, model.t, rule=SOCP_AC_PowerFlow_max_i_line)
 
 
 def DCPowerFlow(model, l_t, l_bus, AllInputs):  # data, init_data):
 
     ##### Model of the system network ##### -->
 
+    Lines = AllInputs.Network.Lines
+    lines_from, lines_to = Lines.lines_of_bus(l_bus)  # lines that start and end at each bus
+
     ## Sets ##
+    model.i_line = pyo.Set(initialize=Lines.id_list)  # lines of the network (from_bus --> to_bus)
 
     ## Parameters ##
     # model.bus_type = pyo.Param(model.i_bus, initialize=AllInputs.Network.Buses.type, within=pyo.Any)  # string that indicates the bus type (AC or DC)
-    model.B_bus = pyo.Param(model.i_bus, model.i_bus, initialize=AllInputs.Network.Lines.B_bus, within=pyo.Reals)  # imaginary part of the y_bus matrix [pu]
-    model.Pmax = pyo.Param(model.i_bus, model.i_bus, within=pyo.Reals, initialize=AllInputs.Network.Lines.Pmax)  # maximum power flow through each line [pu]
+    model.B_line = pyo.Param(model.i_line, initialize=Lines.B_line, within=pyo.Reals)  # susceptance of each line [pu]
+    model.Pmax_line = pyo.Param(model.i_line, within=pyo.Reals, initialize=Lines.Pmax_line)  # maximum power flow through each line [pu]
 
 
     ## Variables ##
-    model.thetaV = pyo.Var(model.i_bus, model.t, within=pyo.Reals, bounds=(-2 * math.pi, 2 * math.pi), initialize={(bus, t): 0 for bus in l_bus for t in l_t})  # voltage angle of each bus at each time [rad]
-    model.Pline = pyo.Var(model.i_bus, model.i_bus, model.t, within=pyo.Reals, initialize={(bus1, bus2, t): 0 for bus1 in l_bus for bus2 in l_bus for t in l_t})  # power flowing between two buses at each time [pu]
+    model.thetaV = pyo.Var(model.i_bus, model.t, within=pyo.Reals, bounds=(-2 * math.pi, 2 * math.pi), initialize=0)  # voltage angle of each bus at each time [rad]
+    model.Pline = pyo.Var(model.i_line, model.t, within=pyo.Reals, initialize=0)  # power flowing through each line at each time, positive from from_bus to to_bus [pu]
 
 
     ## Constraints ##
@@ -310,24 +333,25 @@ def DCPowerFlow(model, l_t, l_bus, AllInputs):  # data, init_data):
     model.Constr_thetaV_slack = pyo.Constraint(model.i_bus, model.t, rule=thetaV_slack)
 
     def Constraint_DC_PF_Pinj(m, i_bus, t):
-        return m.Pinj[i_bus,t] == sum(m.Pline[i_bus, bus_aux, t] for bus_aux in l_bus)  #sum(m.B_bus[i_bus, bus_aux] * (m.thetaV[i_bus, t] - m.thetaV[bus_aux, t]) for bus_aux in l_bus)
+        return m.Pinj[i_bus,t] == sum(m.Pline[line, t] for line in lines_from[i_bus]) - sum(m.Pline[line, t] for line in lines_to[i_bus])
     model.Constr_DC_PF_Pinj = pyo.Constraint(model.i_bus, model.t, rule=Constraint_DC_PF_Pinj)
-    def Constraint_DC_PF_Pline(m, i_bus1, i_bus2, t):
-        return m.Pline[i_bus1, i_bus2, t] == m.B_bus[i_bus1, i_bus2] * (m.thetaV[i_bus1, t] - m.thetaV[i_bus2, t])
-    model.Constr_DC_PF_Pline = pyo.Constraint(model.i_bus, model.i_bus, model.t, rule=Constraint_DC_PF_Pline)
+    def Constraint_DC_PF_Pline(m, line, t):
+        return m.Pline[line, t] == m.B_line[line] * (m.thetaV[Lines.from_bus[line], t] - m.thetaV[Lines.to_bus[line], t])
+    model.Constr_DC_PF_Pline = pyo.Constraint(model.i_line, model.t, rule=Constraint_DC_PF_Pline)
 
-    def Constraint_Pmax_line1(m, i_bus1, i_bus2, t):
-        return m.Pline[i_bus1, i_bus2, t] <= m.Pmax[i_bus1, i_bus2]
-    model.Constr_Pmax_line1 = pyo.Constraint(model.i_bus, model.i_bus, model.t, rule=Constraint_Pmax_line1)
-    def Constraint_Pmax_line2(m, i_bus1, i_bus2, t):
-        return -m.Pline[i_bus1, i_bus2, t] <= m.Pmax[i_bus1, i_bus2]
-    model.Constr_Pmax_line2 = pyo.Constraint(model.i_bus, model.i_bus, model.t, rule=Constraint_Pmax_line2)
+    def Constraint_Pmax_line1(m, line, t):
+        return m.Pline[line, t] <= m.Pmax_line[line]
+    model.Constr_Pmax_line1 = pyo.Constraint(model.i_line, model.t, rule=Constraint_Pmax_line1)
+    def Constraint_Pmax_line2(m, line, t):
+        return -m.Pline[line, t] <= m.Pmax_line[line]
+    model.Constr_Pmax_line2 = pyo.Constraint(model.i_line, model.t, rule=Constraint_Pmax_line2)
 
 
+@stage()
 def PowerFlow(model, l_t, l_bus, AllInputs):
 
     ##### Model of the system network ##### --> [pu]
-    PF_type = AllInputs.Network.PF_type  # economic_dispatch / DC-OPF
+    PF_type = AllInputs.Network.PF_type  # economic_dispatch / DC-OPF / AC-OPF
 
     ## Sets ##
 
@@ -352,7 +376,10 @@ def PowerFlow(model, l_t, l_bus, AllInputs):
             return sum(m.Qinj[i_bus, t] for i_bus in l_bus) == 0
         model.Constr_DC_PF_Q = pyo.Constraint(model.t, rule=Constraint_DC_PF_Q)
     elif PF_type == 'AC-OPF':
-        SOCPACPowerFlow(model, l_t, l_bus, AllInputs)
+        if AllInputs.Network.AC_formulation == 'exact':
+            ACPowerFlow(model, l_t, l_bus, AllInputs)
+        else:  # SOCP relaxation
+            SOCPACPowerFlow(model, l_t, l_bus, AllInputs, cone=AllInputs.Network.AC_formulation != 'SOCP_equality')
     else:  # PF_type == 'economic_dispatch'
         def Constraint_PF_economic_dispatch_P(m, t):
             return sum(m.Pinj[i_bus, t] for i_bus in l_bus) == 0
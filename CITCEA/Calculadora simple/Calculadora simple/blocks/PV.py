@@ -5,8 +5,10 @@ It includes performance characteristics and costs calculation. PV size can be op
 
 import pyomo.environ as pyo
 import math
+from profiling import stage
 
 
+@stage()
 def PV_block(model, l_PV, l_t, AllInputs):
     """
     PV system.
@@ -77,7 +79,7 @@ def PV_block(model, l_PV, l_t, AllInputs):
     # model.PV_n_replacement = pyo.Param(model.i_PV, initialize=PV_n_r)  # number of times the PV system has to be replaced during the project lifetime
     model.PV_c_incentives = pyo.Param(model.i_PV, initialize=AllInputs.PV.capex_incentives,
                                       within=pyo.NonNegativeReals)  # economic incentives on the PV CAPEX [€/kW]
-    model.PV_fix_G = pyo.Param(model.i_PV, initialize=AllInputs.PV.fix_kW, within=pyo.Any)  # PV installed capacity (to add) if it is fixed [kW]
+    model.PV_fix_G = pyo.Param(model.i_PV, initialize=AllInputs.PV.fix_kW, within=pyo.Any, mutable=AllInputs.System.mutable)  # PV installed capacity (to add) if it is fixed [kW]
     model.PV_pos_bus = pyo.Param(model.i_PV, model.i_bus, initialize=AllInputs.PV.pos_bus, within=pyo.Binary)  # binary that indicates the bus to which the PV is connected --> [id_load,id_bus]=1
 
     ##### Model Variables #####
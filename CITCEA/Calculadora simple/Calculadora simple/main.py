@@ -31,11 +31,22 @@ if __name__ == '__main__':
 
     # 1. Import data:7 generals of the problem, the components (PV, Bat, Genset), and the customer
     print('Processing the inputs ... ', end='')
-    from pre_process import AllInputs
+    from pre_process import build_all_inputs
+    folder_data = 'CSV/DATA/'
+    AllInputs = build_all_inputs(folder_data, save_flexibility=True)
+
+    # number of representative days to aggregate the year (None: the full year is optimized)
+    n_representative_days = None
+    if n_representative_days is not None:
+        from pre_processing.Representative_days import aggregate_inputs
+        AllInputs = aggregate_inputs(AllInputs, n_representative_days)
 
     # if no economic constraints wants to be considered, add here "new_constraints = []",
     # otherwise economic constraints will be based on excel inputs
     print('OK')
+    if AllInputs.System.aggregation is not None:
+        print('Aggregation error of the representative days:')
+        print(AllInputs.System.aggregation.error)
     end = time.time()
     print('Time: ', format((end - begin) / 60, '.2f'), 'min')
     print()
@@ -45,39 +56,40 @@ if __name__ == '__main__':
 
     # Directory where results will be saved:
     folder_results = 'CSV/Results/'
+    # Format of the time series results (operation, network): excel, parquet, feather or csv. The sizing and economic
+    # tables are saved in excel (or csv: summary_format = 'csv')
+    results_format = 'excel'
+    summary_format = 'excel'
     if os.path.exists(folder_results) == False:
         os.mkdir(folder_results)
 
     print('Running optimization ... ', end='')
 
     # 2. Create the model
+    report = RunReportClass()
+    begin_build = time.time()
     instance = optimization(AllInputs)
+    report.build_time = time.time() - begin_build
     # with open('model', 'w') as f:
     #     instance.pprint(f)
 
     # 3. Solve the model
-    opt = pyo.SolverFactory(solver)
-    if solver == 'gurobi':
-        opt.options['NonConvex'] = 2  # to solve Quadratic equality constraints
-    results = opt.solve(instance)  # ,tee=True)
-    # results.write()  # Access to the results
-    if solver == 'gurobi':
-        termination_condition = str(results['Solver']).split('\n')[4].split(': ')[1]
-    elif solver == 'highs':
-        termination_condition = str(results['Solver']).split('\n')[3].split(': ')[1]
-    elif solver == 'scip':
-        termination_condition = str(results['Solver']).split('\n')[3].split(': ')[1]
+    opt = solver_factory(solver)
+    report = solve_model(instance, opt, report)  # ,tee=True)
+    if report.is_optimal():
+        print('OK')
     else:
-        termination_condition = ''
-    if termination_condition == 'optimal':
+        print('Optimization ERROR: ' + report.termination_condition)
+    print(report.table().to_string())
+    report.table().to_csv(folder_results + 'Run_report.csv', header=False)
+
+    # 4. Post-process and results saving (only if the optimal solution has been found)
+    if report.is_optimal():
+        print('Saving results ... ', end='')
+        allResults, n_cycles = post_processing(instance, folder_results, AllInputs, results_format, summary_format)
         print('OK')
-    elif termination_condition == 'infeasible':
-        print('Optimization ERROR: '+termination_condition)
-
-    # 4. Post-process and results saving
-    print('Saving results ... ', end='')
-    allResults, n_cycles = post_processing(instance, folder_results, AllInputs)
-    print('OK')
+    else:
+        print('Results are not saved')
 
     end = time.time()
     print('Time: ', format((end-begin)/60, '.2f'), 'min')
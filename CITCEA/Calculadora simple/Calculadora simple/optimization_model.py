@@ -1,13 +1,38 @@
 import pyomo.environ as pyo
+from pyomo.common.gc_manager import PauseGC
+from pyomo.opt.results.container import UndefinedData
 import math
+import time
+import pandas
+from profiling import stage, profile_stage
 
 
-def optimization(AllInputs):
+@stage()
+def optimization(AllInputs, concrete=True):
     '''
     This function creates the optimization model
     :param AllInputs: data class which contains all inputs
+    :param concrete: if True, the model is built directly as a ``ConcreteModel`` (each component is constructed when
+        it is declared). If False, an ``AbstractModel`` is declared and then ``create_instance()`` is called
     :return: pyomo instance with the model
     '''
+    if concrete:
+        with PauseGC():  # as in create_instance, the garbage collector is paused while the components are constructed
+            return build_model(pyo.ConcreteModel(), AllInputs)
+    else:
+        model = build_model(pyo.AbstractModel(), AllInputs)
+        with profile_stage('create_instance'):
+            return model.create_instance()
+
+
+@stage()
+def build_model(model, AllInputs):
+    '''
+    Declares all the sets, parameters, variables, constraints and the objective of the optimization model
+    :param model: pyomo ``ConcreteModel()`` or ``AbstractModel()``
+    :param AllInputs: data class which contains all inputs
+    :return: the same model with all the components
+    '''
 
     l_t = AllInputs.System.l_t
     l_month = AllInputs.System.l_month
@@ -17,9 +42,6 @@ def optimization(AllInputs):
     l_Mev = AllInputs.EV.smart.l_Mev
     l_bus = AllInputs.Network.Buses.id_list
 
-    # model initialization
-    model = pyo.AbstractModel()
-
 
     ##### Model Sets #####
     model.t = pyo.Set(initialize=l_t)  # time steps to consider in the optimization (time horizon=365 days)
@@ -33,26 +55,46 @@ def optimization(AllInputs):
     model.i_Grid = pyo.Set(initialize=l_Grid)  #models/elements of Grid
     #
     model.i_bus = pyo.Set(initialize=l_bus)
+    #
+    if AllInputs.System.aggregation is not None:  # representative days
+        model.day = pyo.Set(initialize=AllInputs.System.aggregation.l_days, ordered=True)  # all days of the horizon
+        model.rep_day = pyo.Set(initialize=AllInputs.System.aggregation.l_rep_days)  # representative days
 
 
     ##### Model Parameters #####
 
     model.inc_t = pyo.Param(initialize=AllInputs.System.inc_t, within=pyo.NonNegativeReals)  # time-step magnitude [h]
+    model.weight_t = pyo.Param(model.t, initialize=AllInputs.System.weight_t, within=pyo.NonNegativeReals)  # number of days represented by each time-step (1 without representative days)
     model.Dc = pyo.Param(model.i_bus, model.t, within=pyo.NonNegativeReals, initialize=AllInputs.Load.Pd_total_inclEV)  # critical or fixed load [kW] from annual profiles provided
-    model.discount_rate = pyo.Param(initialize=AllInputs.System.discount_rate_optimization, within=pyo.Reals)  # [pu]
+    mutable = AllInputs.System.mutable  # parameters that can be modified without rebuilding the model (sweep.py)
+    model.discount_rate = pyo.Param(initialize=AllInputs.System.discount_rate_optimization, within=pyo.Reals, mutable=mutable)  # [pu]
     model.c_emission = pyo.Param(initialize=AllInputs.System.emissions_cost,
                                  within=pyo.NonNegativeReals)  # price of the general emissions [€/kgCO2]
     model.noSupply_c = pyo.Param(initialize=AllInputs.System.noSupply_cost,
                                  within=pyo.NonNegativeReals)  # price of the energy not supplied in island mode [€/kWh]
     #
-    model.min_ren = pyo.Param(initialize=AllInputs.System.min_renew, within=pyo.NonNegativeReals)  # minimum renewable energy contribution annualy [pu=%/100]
+    model.min_ren = pyo.Param(initialize=AllInputs.System.min_renew, within=pyo.NonNegativeReals, mutable=mutable)  # minimum renewable energy contribution annualy [pu=%/100]
     model.L_prj = pyo.Param(initialize=AllInputs.System.lifetime, within=pyo.NonNegativeReals)  # lifetime of the project [years]
-    model.max_emissions = pyo.Param(initialize=AllInputs.System.max_emissions)
+    limited = emissions_limited(AllInputs.System.max_emissions)
+    model.max_emissions = pyo.Param(initialize=AllInputs.System.max_emissions if limited or not mutable else 0,
+                                    mutable=mutable)  # maximum emissions [kgCO2/year]. Mutable: finite value, the constraint is deactivated if there is no limit
     model.Grid_renewable_factor = pyo.Param(model.i_Grid, model.t, initialize=AllInputs.Grid.renewable_factor,
                                             within=pyo.NonNegativeReals)  # renewable factor of the energy from the grid ar each time-step [pu]
 
 
+    ##### Model Variables #####
+
+    model.D_bus = pyo.Var(model.i_bus, model.t, within=pyo.NonNegativeReals)  # total load [kW]
+    model.D = pyo.Var(model.t, within=pyo.NonNegativeReals)  # total load [kW]
+    model.other = pyo.Var(within=pyo.Reals)  # minor term for the objective function
+    #
+    model.noSupply_P = pyo.Var(model.i_bus, model.t,
+                               within=pyo.NonNegativeReals)  # the energy not supplied in island mode [kW]
+    model.noSupply_C = pyo.Var(within=pyo.NonNegativeReals)  # cost of the energy not supplied in island mode [€]
+
+
     ##### Model Blocks #####
+    # (with a ConcreteModel, the variables used by the blocks have to be declared before)
 
     from blocks.PV import PV_block
     PV_block(model, l_PV, l_t, AllInputs)  # Outputs: PV_P
@@ -73,17 +115,6 @@ def optimization(AllInputs):
     Economic_indicators_block(model, l_t, l_PV, l_BESS, l_Mev, AllInputs)
 
 
-    ##### Model Variables #####
-
-    model.D_bus = pyo.Var(model.i_bus, model.t, within=pyo.NonNegativeReals)  # total load [kW]
-    model.D = pyo.Var(model.t, within=pyo.NonNegativeReals)  # total load [kW]
-    model.other = pyo.Var(within=pyo.Reals)  # minor term for the objective function
-    #
-    model.noSupply_P = pyo.Var(model.i_bus, model.t,
-                               within=pyo.NonNegativeReals)  # the energy not supplied in island mode [kW]
-    model.noSupply_C = pyo.Var(within=pyo.NonNegativeReals)  # cost of the energy not supplied in island mode [€]
-
-
     ##### Model Constraints #####
 
     def Constraint_all_electric_loads_bus(m, i_bus, t):
@@ -139,7 +170,7 @@ def optimization(AllInputs):
         :param m: Pyomo optimization model
         :return: expression of the constraint
         '''
-        return m.noSupply_C == m.noSupply_c * sum(m.noSupply_P[i_bus, t] * m.inc_t for t in l_t for i_bus in l_bus)
+        return m.noSupply_C == m.noSupply_c * sum(m.noSupply_P[i_bus, t] * m.inc_t * m.weight_t[t] for t in l_t for i_bus in l_bus)
     model.Constr_islanded_C = pyo.Constraint(rule=Constraint_islanded_C)
 
     ##### Model Constraint if grid-connected or islanded #####
@@ -168,10 +199,10 @@ def optimization(AllInputs):
         if not l_PV:
             return pyo.Constraint.Skip
         else:
-            return (sum(m.PV_P[i_PV, t] for i_PV in l_PV for t in l_t)
-                    + sum(m.Grid_renewable_factor[i_Grid, t] * (m.Grid_P_buy[i_Grid, t] + m.Grid_P_excess[i_Grid, t]) for t in l_t for i_Grid in l_Grid)) \
+            return (sum(m.PV_P[i_PV, t] * m.weight_t[t] for i_PV in l_PV for t in l_t)
+                    + sum(m.Grid_renewable_factor[i_Grid, t] * (m.Grid_P_buy[i_Grid, t] + m.Grid_P_excess[i_Grid, t]) * m.weight_t[t] for t in l_t for i_Grid in l_Grid)) \
                 * m.inc_t >= m.min_ren \
-                * sum(m.D[t] for t in l_t) * m.inc_t
+                * sum(m.D[t] * m.weight_t[t] for t in l_t) * m.inc_t
     model.Constr_min_renewables = pyo.Constraint(rule=Constraint_min_renewables)
 
     def Constraint_emissions_reduction(m):
@@ -183,11 +214,13 @@ def optimization(AllInputs):
         :param m:
         :return:
         '''
-        if m.max_emissions<0:
+        if not limited and not mutable:
             return pyo.Constraint.Skip
         else:
             return (sum(m.Grid_C_emission[i_Grid] for i_Grid in l_Grid)) / m.c_emission <= m.max_emissions
     model.Constr_emissions_reduction = pyo.Constraint(rule=Constraint_emissions_reduction)
+    if mutable and not limited:  # built anyway, so that a limit can be set later (sweep.set_parameter)
+        model.Constr_emissions_reduction.deactivate()
 
 
     ##### Objective function ####
@@ -206,12 +239,121 @@ def optimization(AllInputs):
 
 
 
-    # To solve:
-    instance = model.create_instance()
-    #opt = pyo.SolverFactory('gurobi')
-    #results=opt.solve(instance) #,tee=True)
+    return model
+
 
-    # Access to the results:
-    #results.write()
+####################   Solve   ####################
 
-    return instance
+
+class RunReportClass:
+    def __init__(self):
+        '''
+        Class that stores the information of a run: times, status of the solver and quality of the solution
+        '''
+        self.build_time = None  # time to build the model [s]
+        self.solve_time = None  # time of the solver call, including writing and reading files [s]
+        self.solver_time = None  # time reported by the solver [s]
+        self.status = None  # status of the solver: ok, warning, error, aborted, unknown
+        self.termination_condition = None  # optimal, infeasible, unbounded, infeasibleOrUnbounded, maxTimeLimit, ...
+        self.message = None  # termination message of the solver
+        self.solution = False  # True if a solution has been loaded into the instance
+        self.objective = None  # value of the objective function [€] (None if there is no solution)
+        self.lower_bound = None  # best bound of the objective function [€]
+        self.upper_bound = None  # best solution found [€]
+        self.gap = None  # relative MIP gap [pu]
+        self.nodes = None  # number of branch and bound nodes
+
+    def is_optimal(self):
+        return self.termination_condition == 'optimal'
+
+    def table(self):
+        '''
+        :return: pandas Series with all the information of the run
+        '''
+        return pandas.Series(self.__dict__, dtype=object)
+
+
+def emissions_limited(max_emissions):
+    '''
+    :param max_emissions: maximum emissions [kgCO2/year]. Negative or infinite: no limit
+    :return: True if the emissions constraint limits the emissions
+    '''
+    return 0 <= max_emissions < math.inf
+
+
+def result_value(container, *names):
+    '''
+    Value of a field of the solver results. Each solver interface fills different fields
+    :param container: part of the pyomo results (e.g. results.problem, results.solver)
+    :param names: names of the fields, the first one reported by the solver is returned
+    :return: the value, or None if the solver has not reported any of the fields
+    '''
+    for name in names:
+        try:
+            value = getattr(container, name)
+        except AttributeError:
+            continue
+        if value is not None and not isinstance(value, UndefinedData):
+            return value
+    return None
+
+
+def solver_factory(solver='gurobi', solver_options=None):
+    '''
+    Creates the solver
+    :param solver: solver to use: gurobi, highs, scip, ...
+    :param solver_options: ``dict`` with the options of the solver
+    :return: pyomo solver
+    '''
+    opt = pyo.SolverFactory(solver)
+    if solver == 'gurobi':
+        opt.options['NonConvex'] = 2  # to solve Quadratic equality constraints
+    if solver_options is not None:
+        for key, value in solver_options.items():
+            opt.options[key] = value
+    return opt
+
+
+@stage()
+def solve_model(instance, opt, report=None, tee=False):
+    '''
+    Solves the instance and checks the termination condition. The solution is loaded into the instance only if the
+    solver has found one (optimal or feasible when a limit is reached)
+    :param instance: pyomo instance with the model
+    :param opt: pyomo solver (see solver_factory)
+    :param report: RunReportClass to fill (e.g. with the build time already stored). If None, a new one is created
+    :param tee: if True, the log of the solver is shown
+    :return: RunReportClass
+    '''
+    if report is None:
+        report = RunReportClass()
+    begin = time.time()
+    try:
+        with profile_stage('solver', solver=getattr(opt, 'name', type(opt).__name__)):
+            results = opt.solve(instance, load_solutions=False, tee=tee)
+    except Exception as error:  # e.g. the solver is not available or it fails without returning results
+        report.solve_time = time.time() - begin
+        report.status = 'error'
+        report.termination_condition = 'error'
+        report.message = str(error)
+        return report
+    report.solve_time = time.time() - begin
+
+    report.status = str(results.solver.status)
+    report.termination_condition = str(results.solver.termination_condition)
+    report.message = result_value(results.solver, 'message', 'termination_message')
+    report.solver_time = result_value(results.solver, 'wallclock_time', 'time', 'user_time')
+    report.lower_bound = result_value(results.problem, 'lower_bound')
+    report.upper_bound = result_value(results.problem, 'upper_bound')
+    report.nodes = result_value(results.solver.statistics.branch_and_bound, 'number_of_bounded_subproblems')
+
+    no_solution = [pyo.TerminationCondition.infeasible, pyo.TerminationCondition.unbounded,
+                   pyo.TerminationCondition.infeasibleOrUnbounded, pyo.TerminationCondition.error]
+    if len(results.solution) > 0 and results.solver.termination_condition not in no_solution:
+        instance.solutions.load_from(results)
+        report.solution = True
+        report.objective = pyo.value(instance.goal)
+    if report.lower_bound is not None and report.upper_bound is not None and math.isfinite(report.lower_bound) \
+            and math.isfinite(report.upper_bound) and report.upper_bound != 0:
+        report.gap = abs(report.upper_bound - report.lower_bound) / abs(report.upper_bound)
+    return report
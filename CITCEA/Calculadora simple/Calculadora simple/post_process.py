@@ -4,17 +4,25 @@
 
 import pandas
 import math
+import numpy
 from post_processing.get_Results import *
 from post_processing.KPIs import *
 from post_processing.BESS_aging import *
+from post_processing.Export import *
+from profiling import stage, profile_stage
 
 
-def post_processing(instance, save_folder, AllInputs):
+@stage()
+def post_processing(instance, save_folder, AllInputs, results_format='excel', summary_format='excel'):
     '''
-    Analyse the optimization results and saves them in excel files, from the inputs and the solved model.
+    Analyse the optimization results and saves them in excel files (or parquet/feather/csv, see results_format), from
+    the inputs and the solved model.
     :param instance: pyomo solved Grid model (instance.EV)
     :param save_folder: string with the path in which the operation results file will be saved
     :param AllInputs: data class which contains all inputs
+    :param results_format: format of the tables with one row per time-step (operation and network):
+        excel, parquet, feather or csv (see post_processing/Export.py)
+    :param summary_format: format of the small tables (sizing and economics): excel or csv
     '''
 
     l_t = AllInputs.System.l_t
@@ -26,65 +34,56 @@ def post_processing(instance, save_folder, AllInputs):
     '''print('G value is:')
     print(instance.G.get_values())'''
 
+    results_format = check_results_format(results_format)
+    summary_format = check_results_format(summary_format, summary=True)
+    if results_format is None or summary_format is None:
+        return None, math.nan
+
     # Extract the results from the pyomo instance and stores them in a self-defined class
-    allResults = allResultsClass(l_t, AllInputs, instance)
+    with profile_stage('allResultsClass'):
+        allResults = allResultsClass(l_t, AllInputs, instance)
+    with profile_stage('energy_frame'):
+        energies = energy_frame(allResults, AllInputs)  # balance de potencias de cada time-step (operation y KPIs)
 
 
     ##### ##### ##### #####       Save results       ##### ##### ##### #####
 
     # Energy Results: sizing
-    save_sizing(allResults, AllInputs, save_folder)
+    save_sizing(allResults, AllInputs, save_folder, summary_format)
 
     # Energy Results: peration
-    save_operation(allResults, AllInputs, save_folder)
+    save_operation(allResults, AllInputs, save_folder, results_format, energies)
 
     # Economic Results
-    save_economics(allResults, AllInputs, save_folder)
+    save_economics(allResults, AllInputs, save_folder, summary_format, energies)
 
     # Network Results
-    save_network(allResults, AllInputs, save_folder)
+    save_network(allResults, AllInputs, save_folder, results_format)
 
 
     ##### ##### ##### #####       BESS degradation       ##### ##### ##### #####
     if len(AllInputs.BESS.id_list) != 0:
-        cycles = BESS_cycles(allResults, AllInputs)
-        n_peaks = count_peaks(cycles)
+        with profile_stage('BESS_cycles'):
+            cycles = BESS_cycles(allResults, AllInputs)
+            n_peaks = count_peaks(cycles)
+            table_cycles, table_depths = BESS_rainflow(allResults, AllInputs)  # for the warranty of the batteries
+        save_tables(save_folder, 'BESS_cycles', [('cycles', table_cycles, {'float_format': "%.2f"}),
+                                                 ('depth histogram', table_depths, {'float_format': "%.2f"})], summary_format)
     else:
         n_peaks = math.nan
 
     return allResults, n_peaks
 
 
-def dataframe_from_dict_loads(dict, columns, rows):
-    '''
-    Creates a DataFrame from a dictionary
-
-    This function is equivalent to:
-        df = dataframe_from_dict_CashFlow(dict, columns, rows)
-
-        df = df.transpose()
-    :param dict: initial dictionary with the structure {(index_column, index_row): value}
-    :param columns: ``list`` containing the columns indexes
-    :param rows: ``list`` containing the rows indexes
-    :return: DataFrame with the dictionary values
-    '''
-    dict_fin = {}
-    for col in columns:
-        lista = []
-        for i in rows:
-            lista.insert(i, dict[col, i])
-        dict_fin[col] = lista
-    tabla = pandas.DataFrame(dict_fin, index=rows)
-    return tabla
-
-
-def save_sizing(allResults, AllInputs, save_folder):
+@stage()
+def save_sizing(allResults, AllInputs, save_folder, results_format='excel'):
     '''
     Generates DataFrames with the sizing results of the system (by technology model, grid connection and flexibility request)
     and saves them in an Excel file in the given folder.
     :param allResults: data class which contains all results of the optimization
     :param AllInputs: data class which contains all inputs
     :param save_folder: string with the path in which the operation results file will be saved
+    :param results_format: excel or csv
     '''
     # PV
     l_PV = AllInputs.PV.id_list
@@ -134,81 +133,37 @@ def save_sizing(allResults, AllInputs, save_folder):
     table_P_hired = pandas.DataFrame(dict_Grid, index=l_Grid)
 
     # print
-    with pandas.ExcelWriter(save_folder+'Sizing.xlsx') as writer:
-        table_PV.to_excel(writer, sheet_name='PV', float_format="%.2f")
-        table_BESS.to_excel(writer, sheet_name='Battery', float_format="%.2f")
-        table_other.to_excel(writer, sheet_name='other', float_format="%.2f", header=False, index=False)
-        table_P_hired.to_excel(writer, sheet_name='P_hired', float_format="%.2f")
+    save_tables(save_folder, 'Sizing', [('PV', table_PV, {'float_format': "%.2f"}),
+                                        ('Battery', table_BESS, {'float_format': "%.2f"}),
+                                        ('other', table_other, {'float_format': "%.2f", 'header': False, 'index': False}),
+                                        ('P_hired', table_P_hired, {'float_format': "%.2f"})], results_format)
 
     return
 
 
-def list_from_dict(dict_i_t, i, l_t):
-    '''
-    Creates a list from a dictionary and the first index
-    :param dict_i_t: initial dictionary with the structure {(i, t): value for i in l_i for t in l_t}
-    :param i: first-item index of the dictionary key
-    :param l_t: ``list`` containing the indexes of the second-item of the dictionary key
-    :return: ``list`` containing the values of the dictionary for the specified index
-    '''
-    dict_t = {t: dict_i_t[i,t] for t in l_t}
-    l = list(dict_t.values())
-    return l
-
-
-def save_operation(allResults, AllInputs, save_folder):
+@stage()
+def save_operation(allResults, AllInputs, save_folder, results_format='excel', energies=None):
     '''
     Generates DataFrames with the operation of the system (by technology model, and by load)
     and saves them in an Excel file in the given folder.
     :param allResults: data class which contains all results of the optimization
     :param AllInputs: data class which contains all inputs
     :param save_folder: string with the path in which the operation results file will be saved
+    :param results_format: excel, parquet, feather or csv
+    :param energies: DataFrame returned by energy_frame (calculated if None)
     '''
     l_t = AllInputs.System.l_t
-
-    # Grid
     l_Grid = AllInputs.Grid.id_list
-    dict_Grid = {}
-    for i_Grid in l_Grid:
-        dict_Grid[AllInputs.Grid.name[i_Grid]+': P_hired [kW]'] = list_from_dict(allResults.Grid.P_hired_t, i_Grid, l_t)  # P_hired_t[t]
-        dict_Grid[AllInputs.Grid.name[i_Grid]+': P_buy [kW]'] = list_from_dict(allResults.Grid.P_buy, i_Grid, l_t)  # P_buy[t]
-        dict_Grid[AllInputs.Grid.name[i_Grid]+': P_sell [kW]'] = list_from_dict(allResults.Grid.P_sell, i_Grid, l_t)  # P_sell[t]
-        dict_Grid[AllInputs.Grid.name[i_Grid]+': P_excess [kW]'] = list_from_dict(allResults.Grid.P_excess, i_Grid, l_t)  # P_excess[t]
-
-    # PV
-    l_PV = AllInputs.PV.id_list
-    dict_PV = {}
-    for i_PV in l_PV:
-        dict_PV[AllInputs.PV.name[i_PV]+': P [kW]'] = list_from_dict(allResults.PV.P, i_PV, l_t)
+    if energies is None:
+        energies = energy_frame(allResults, AllInputs)
 
-    # BESS
-    l_BESS = AllInputs.BESS.id_list
-    dict_BESS = {}
-    for i_BESS in l_BESS:
-        dict_BESS[AllInputs.BESS.name[i_BESS]+': P_char [kW]'] = list_from_dict(allResults.BESS.P_char, i_BESS, l_t)
-        dict_BESS[AllInputs.BESS.name[i_BESS]+': P_disch [kW]'] = list_from_dict(allResults.BESS.P_disch, i_BESS, l_t)
-    for i_BESS in l_BESS:
-        dict_BESS[AllInputs.BESS.name[i_BESS]+': SOC [kWh]'] = list_from_dict(allResults.BESS.SOC, i_BESS, l_t)
-
-    # Islanded
-    l_bus = AllInputs.Network.Buses.id_list
-    dict_islanded = {}
-    for i_bus in l_bus:
-        if sum(allResults.noSupply_P[i_bus,t] for t in l_t)!=0:
-            dict_islanded['Load not supplied '+AllInputs.Network.Buses.name[i_bus]+' [kW]'] = list_from_dict(allResults.noSupply_P, i_bus, l_t)  # noSupply_P[t]
-
-    dict_all = {}
-    dict_all.update(dict_Grid)
-    dict_all.update(dict_PV)
-    dict_all.update(dict_BESS)
-    dict_all.update(dict_islanded)
-
-    table_all = pandas.DataFrame(dict_all, index=l_t)
+    # Grid, PV, BESS and load not supplied
+    table_all = allResults.table(AllInputs)
 
     l_Mev = AllInputs.EV.smart.l_Mev
 
     if AllInputs.EV.hay == 1 and AllInputs.EV.immediate0_smart1 == 1: # Flexibility: EV smart charging
-        table_EV = dataframe_from_dict_loads(allResults.EV.P, l_Mev, l_t)
+        table_EV = allResults.EV.table(l_Mev)
     dict_cL = {}
     #dict_cL['Critical load'] = list(AllInputs.System.critical_Load.values())
     if AllInputs.EV.hay == 1 and AllInputs.EV.immediate0_smart1 == 0:
@@ -217,25 +172,25 @@ def save_operation(allResults, AllInputs, save_folder):
 
     dict_renGrid = {}
     for i_Grid in l_Grid:
-        dict_Grid['Renewables from electrical grid' + AllInputs.Grid.name[i_Grid]] = \
-            {t: AllInputs.Grid.renewable_factor[i_Grid, t]*(allResults.Grid.P_buy[i_Grid, t] + allResults.Grid.P_excess[i_Grid, t]) for t in l_t}
-        dict_renGrid['Renewable factor electrical grid' + AllInputs.Grid.name[i_Grid]] = {t: AllInputs.Grid.renewable_factor[i_Grid, t] for t in l_t}
-        dict_renGrid['CO2 emission factor electrical grid' + AllInputs.Grid.name[i_Grid]] = {t: AllInputs.Grid.emissions[i_Grid, t] for t in l_t}
+        dict_renGrid['Renewable factor electrical grid' + AllInputs.Grid.name[i_Grid]] = AllInputs.Grid.renewable_factor.array(i_Grid, l_t)
+        dict_renGrid['CO2 emission factor electrical grid' + AllInputs.Grid.name[i_Grid]] = AllInputs.Grid.emissions.array(i_Grid, l_t)
     table_renGrid = pandas.DataFrame(dict_renGrid, index=l_t)
 
-    with pandas.ExcelWriter(save_folder+'Operation.xlsx') as writer:
-        table_all.to_excel(writer, sheet_name='General', float_format="%.2f")
-        if AllInputs.EV.hay == 1 and AllInputs.EV.immediate0_smart1 == 1:
-            # Flexibilidad: carga shiftable modular: EV smart charging
-            table_EV.to_excel(writer, sheet_name='EV smart charging', float_format="%.2f")
-        table_cL.to_excel(writer, sheet_name='critical load', float_format="%.2f")
-        if AllInputs.Grid.conected1_islanded0 == 1:
-            table_renGrid.to_excel(writer, sheet_name='renewables from grid', float_format="%.2f")
+    sheets = [('General', table_all, {'float_format': "%.2f"})]
+    if AllInputs.EV.hay == 1 and AllInputs.EV.immediate0_smart1 == 1:
+        # Flexibilidad: carga shiftable modular: EV smart charging
+        sheets.append(('EV smart charging', table_EV, {'float_format': "%.2f"}))
+    sheets.append(('critical load', table_cL, {'float_format': "%.2f"}))
+    if AllInputs.Grid.conected1_islanded0 == 1:
+        sheets.append(('renewables from grid', table_renGrid, {'float_format': "%.2f"}))
+    sheets.append(('energy balance', energies, {'float_format': "%.4f"}))  # self-consumption at each time-step
+    save_tables(save_folder, 'Operation', sheets, results_format)
 
     return
 
 
-def save_economics(allResults, AllInputs, save_folder):
+@stage()
+def save_economics(allResults, AllInputs, save_folder, results_format='excel', energies=None):
     '''
     Calculates the economic results,
     generates DataFrames with those results
@@ -243,6 +198,8 @@ def save_economics(allResults, AllInputs, save_folder):
     :param allResults: data class which contains all results of the optimization
     :param AllInputs: data class which contains all inputs
     :param save_folder: string with the path in which the operation results file will be saved
+    :param results_format: excel or csv
+    :param energies: DataFrame returned by energy_frame (calculated if None)
     '''
     l_t = AllInputs.System.l_t
     inc_t = AllInputs.System.inc_t
@@ -343,10 +300,15 @@ def save_economics(allResults, AllInputs, save_folder):
     operating_cost_assets = calc_operating_cost(allResults, AllInputs, l_Grid, 'assets')
     operating_cost_grid = calc_operating_cost(allResults, AllInputs, l_Grid, 'grid')
     operating_cost_total = calc_operating_cost(allResults, AllInputs, l_Grid, 'total')
-    total_E_served = calc_total_E_served(allResults, AllInputs, l_t, l_Grid, l_bus, inc_t)
-    self_consumption = calc_self_consumption(allResults, l_t, inc_t, l_PV, l_bus)
-    self_production = calc_self_production(allResults, l_t, inc_t, l_PV, l_bus)
-    renewable_fraction = calc_renewable_fraction(allResults, AllInputs, inc_t, total_E_served, l_t, l_PV, l_Grid)
+    if energies is None:
+        energies = energy_frame(allResults, AllInputs)
+    energy_KPI = energy_KPIs(energy_totals(energies))
+    total_E_served = energy_KPI['total electricity served [kWh]']
+    self_consumption = energy_KPI['Self-consumption [pu]']
+    self_production = energy_KPI['Self-production [pu]']
+    renewable_fraction = energy_KPI['Electrical renewable fraction [pu]']
+    if renewable_fraction > 1 + 1e-6:
+        print('KPIs WARNING: the electrical renewable fraction is higher than 100 % (' + str(renewable_fraction * 100) + ' %)')
     ROI_nominal = calc_ROI(CashFlowComparison, 'nominal', L_prj)  # do not calculate it in the reference case
     ROI_discounted = calc_ROI(CashFlowComparison, 'discounted', L_prj)  # do not calculate it in the reference case
     payback_nominal = calc_payback(CashFlowComparison, 'nominal', L_prj)
@@ -373,114 +335,81 @@ def save_economics(allResults, AllInputs, save_folder):
             ['LCOE nominal', LCOE_nominal, '€/kWh'],
             ['LCOE discounted', LCOE_discounted, '€/kWh]']]
     table_KPIs = pandas.DataFrame(KPIs, columns=['Variable', 'Value', 'Units'])
+    table_KPI_monthly = KPI_breakdown(energies, 'month', AllInputs)
+    table_KPI_hourly = KPI_breakdown(energies, 'hour')
 
     # Save in Excel
-    with pandas.ExcelWriter(save_folder+'Economic.xlsx') as writer:
-        table_equipment_cost.to_excel(writer, sheet_name='equipment', float_format="%.2f")
-        table_grid.to_excel(writer, sheet_name='grid', float_format="%.2f", header=False, index=False)
-        table_flex_cost.to_excel(writer, sheet_name='flexibility costs', float_format="%.2f")
-        table_summary.to_excel(writer, sheet_name='optimization indicators', float_format="%.2f", header=False, index=False)
-        CashFlow.to_excel(writer, sheet_name='CashFlow (€)', float_format="%.2f")
-        CashFlow_desglosado.to_excel(writer, sheet_name='CashFlow desglosado (€)', float_format="%.2f")
-        CashFlowComparison.to_excel(writer, sheet_name='CashFlow comparison (€)', float_format="%.2f")
-        table_KPIs.to_excel(writer, sheet_name='KPI', float_format="%.2f", header=False, index=False)
+    save_tables(save_folder, 'Economic', [('equipment', table_equipment_cost, {'float_format': "%.2f"}),
+                                          ('grid', table_grid, {'float_format': "%.2f", 'header': False, 'index': False}),
+                                          ('flexibility costs', table_flex_cost, {'float_format': "%.2f"}),
+                                          ('optimization indicators', table_summary, {'float_format': "%.2f", 'header': False, 'index': False}),
+                                          ('CashFlow (€)', CashFlow, {'float_format': "%.2f"}),
+                                          ('CashFlow desglosado (€)', CashFlow_desglosado, {'float_format': "%.2f"}),
+                                          ('CashFlow comparison (€)', CashFlowComparison, {'float_format': "%.2f"}),
+                                          ('KPI', table_KPIs, {'float_format': "%.2f", 'header': False, 'index': False}),
+                                          ('KPI monthly', table_KPI_monthly, {'float_format': "%.4f"}),
+                                          ('KPI hourly', table_KPI_hourly, {'float_format': "%.4f"})], results_format)
 
     return
 
 
-def save_network(allResults, AllInputs, save_folder):
+@stage()
+def save_network(allResults, AllInputs, save_folder, results_format='excel'):
+    '''
+    Generates DataFrames with the power flows of the network (injections at each bus and flows between buses)
+    and saves them in an Excel file in the given folder.
+    :param allResults: data class which contains all results of the optimization
+    :param AllInputs: data class which contains all inputs
+    :param save_folder: string with the path in which the network results file will be saved
+    :param results_format: excel, parquet, feather or csv
+    '''
     l_bus = AllInputs.Network.Buses.id_list
     l_t = AllInputs.System.l_t
     Sb = AllInputs.Network.Sb
 
 
-    def dataframe_from_dict(dict, columns, filas):
-        dict_fin = {}
-        for col in columns:
-            list = []
-            for i in filas:
-                list.insert(i,dict[col,i])
-            dict_fin[col] = list
-        table = pandas.DataFrame(dict_fin, index=filas)
-        return table
-
     if AllInputs.Network.PF_type == 'DC-OPF':
-        table_Pinj = dataframe_from_dict(allResults.Network.Pinj, l_bus, l_t)  # Pinj[i_bus, t]
+        table_Pinj = series_table(allResults.Network.Pinj, l_bus)  # Pinj[i_bus, t]
 
-        table_thetaV = dataframe_from_dict(allResults.Network.thetaV, l_bus, l_t)  # thetaV[i_bus, t]
+        table_thetaV = series_table(allResults.Network.thetaV, l_bus)  # thetaV[i_bus, t]
 
         # Pline[i_bus1, i_bus2, t]
-        dict_Pline = {}
-        for i_bus1 in l_bus:
-            for i_bus2 in l_bus:
-                if AllInputs.Network.Lines.G_bus[i_bus1, i_bus2] != 0 and i_bus1 != i_bus2:
-                    dict_linea = {t: allResults.Network.Pline[i_bus1, i_bus2, t] for t in l_t}
-                    name = str(i_bus1) + '-' + str(i_bus2)
-                    dict_Pline[name] = list(dict_linea.values())
-        table_Pline = pandas.DataFrame(dict_Pline, index=l_t)
+        pairs = [(i_bus1, i_bus2) for i_bus1 in l_bus for i_bus2 in l_bus
+                 if AllInputs.Network.Lines.G_bus[i_bus1, i_bus2] != 0 and i_bus1 != i_bus2]
+        table_Pline = series_table(allResults.Network.Pline, pairs)
 
         # Save in Excel
-        with pandas.ExcelWriter(save_folder + 'Network.xlsx') as writer:
-            table_Pinj.to_excel(writer, sheet_name='Pinj', float_format="%.6f")
-            table_thetaV.to_excel(writer, sheet_name='thetaV', float_format="%.6f")
-            table_Pline.to_excel(writer, sheet_name='Pline', float_format="%.6f")
+        save_tables(save_folder, 'Network', [('Pinj', table_Pinj, {'float_format': "%.6f"}),
+                                             ('thetaV', table_thetaV, {'float_format': "%.6f"}),
+                                             ('Pline', table_Pline, {'float_format': "%.6f"})], results_format)
 
 
     elif AllInputs.Network.PF_type == 'AC-OPF':
         ...
-        table_Pinj = dataframe_from_dict(allResults.Network.Pinj, l_bus, l_t)  # Pinj[i_bus, t]
+        table_Pinj = series_table(allResults.Network.Pinj, l_bus)  # Pinj[i_bus, t]
 
-        table_Qinj = dataframe_from_dict(allResults.Network.Qinj, l_bus, l_t)  # Qinj[i_bus, t]
+        table_Qinj = series_table(allResults.Network.Qinj, l_bus)  # Qinj[i_bus, t]
 
-        # Pline[i_bus1, i_bus2, t]
-        dict_Pline = {}
-        for i_bus1 in l_bus:
-            for i_bus2 in l_bus:
-                if AllInputs.Network.Lines.G_bus[i_bus1, i_bus2] != 0:
-                    dict_linea = {t: allResults.Network.Pline[i_bus1, i_bus2, t] for t in l_t}
-                    name = str(i_bus1) + '-' + str(i_bus2)
-                    dict_Pline[name] = list(dict_linea.values())
-        table_Pline = pandas.DataFrame(dict_Pline, index=l_t)
-
-        # Qline[i_bus1, i_bus2, t]
-        dict_Qline = {}
-        for i_bus1 in l_bus:
-            for i_bus2 in l_bus:
-                if AllInputs.Network.Lines.G_bus[i_bus1, i_bus2] != 0:
-                    dict_linea = {t: allResults.Network.Qline[i_bus1, i_bus2, t] for t in l_t}
-                    name = str(i_bus1) + '-' + str(i_bus2)
-                    dict_Qline[name] = list(dict_linea.values())
-        table_Qline = pandas.DataFrame(dict_Qline, index=l_t)
+        branches = AllInputs.Network.Lines.branches()
+        table_Pline = series_table(allResults.Network.Pline, branches)  # Pline[i_bus1, i_bus2, t]
+
+        table_Qline = series_table(allResults.Network.Qline, branches)  # Qline[i_bus1, i_bus2, t]
 
         # c[i_bus1, i_bus2, t]  --> c[i_bus, i_bus, t] = V[i_bus, t]**2
         # s[i_bus1, i_bus2, t]
-
-        dict_V = {}
-        for i_bus in l_bus:
-            dict_linea = {t: math.sqrt(max(allResults.Network.c[i_bus, i_bus, t], 0)) for t in l_t}
-            name = str(i_bus)
-            dict_V[name] = list(dict_linea.values())
-        table_V = pandas.DataFrame(dict_V, index=l_t)
+        table_V = numpy.sqrt(series_table(allResults.Network.c, [(i_bus, i_bus) for i_bus in l_bus]).clip(lower=0))
+        table_V.columns = [str(i_bus) for i_bus in l_bus]
 
         # i_line_squared[i_bus1, i_bus2, t]
-        dict_i_line = {}
-        for i_bus1 in l_bus:
-            for i_bus2 in l_bus:
-                if AllInputs.Network.Lines.G_bus[i_bus1, i_bus2] != 0 and i_bus1 != i_bus2:
-                    dict_linea = {t: math.sqrt(max(allResults.Network.i_line_squared[i_bus1, i_bus2, t], 0)) for t in
-                                  l_t}
-                    name = str(i_bus1) + '-' + str(i_bus2)
-                    dict_i_line[name] = list(dict_linea.values())
-        table_i_line = pandas.DataFrame(dict_i_line, index=l_t)
+        table_i_line = numpy.sqrt(series_table(allResults.Network.i_line_squared, branches).clip(lower=0))
 
         # Save in Excel
-        with pandas.ExcelWriter(save_folder + 'Network.xlsx') as writer:
-            table_Pinj.to_excel(writer, sheet_name='Pinj', float_format="%.6f")
-            table_Qinj.to_excel(writer, sheet_name='Qinj', float_format="%.6f")
-            table_Pline.to_excel(writer, sheet_name='Pline', float_format="%.6f")
-            table_Qline.to_excel(writer, sheet_name='Qline', float_format="%.6f")
-            table_V.to_excel(writer, sheet_name='V', float_format="%.6f")
-            table_i_line.to_excel(writer, sheet_name='i_line', float_format="%.6f")
+        save_tables(save_folder, 'Network', [('Pinj', table_Pinj, {'float_format': "%.6f"}),
+                                             ('Qinj', table_Qinj, {'float_format': "%.6f"}),
+                                             ('Pline', table_Pline, {'float_format': "%.6f"}),
+                                             ('Qline', table_Qline, {'float_format': "%.6f"}),
+                                             ('V', table_V, {'float_format': "%.6f"}),
+                                             ('i_line', table_i_line, {'float_format': "%.6f"})], results_format)
 
 
     else:  # PF_type == 'economic_dispatch'
@@ -1,43 +1,142 @@
-def BESS_cycles(allResults, AllInputs):
+import numpy
+import pandas
+from pre_processing.Time_series import TimeSeriesClass
+
+
+peak, valley = 1, -1  # labels of BESS_cycles: last step charging before discharging (pico) / the opposite (valle)
+depth_bins = numpy.linspace(0, 1, 11)  # edges of the depth histogram of the rainflow cycles [pu of the capacity]
 
+
+def BESS_states(allResults, AllInputs):
+    '''
+    State of each battery at each time-step: charging (1) or discharging (-1). When the battery is idle the previous
+    state is kept (hipothesis: the first state is charging)
+    :param allResults: data class which contains all results of the optimization
+    :param AllInputs: data class which contains all inputs
+    :return: numpy array (battery, time-step), batteries in the order of AllInputs.BESS.id_list
+    '''
     l_t = AllInputs.System.l_t
     l_BESS = AllInputs.BESS.id_list
+    P = numpy.array([allResults.BESS.P_char.array(i_BESS, l_t) - allResults.BESS.P_disch.array(i_BESS, l_t)
+                     for i_BESS in l_BESS]).reshape(len(l_BESS), len(l_t))
+    sign = numpy.sign(P)
+    # position of the last time-step with P != 0 (forward fill of the state)
+    last = numpy.maximum.accumulate(numpy.where(sign != 0, numpy.arange(len(l_t)), 0), axis=1)
+    state = numpy.take_along_axis(sign, last, axis=1)
+    state[state == 0] = 1  # idle since the beginning
+    return state
 
-    P = {(i_BESS, t): allResults.BESS.P_char[i_BESS, t] - allResults.BESS.P_disch[i_BESS, t] for i_BESS in l_BESS for t in l_t}
-    state = {}
-    for i_BESS in l_BESS:
-        for t in l_t:
-            if P[i_BESS, t] > 0:
-                state[i_BESS, t] = 'carga'
-            elif P[i_BESS, t] < 0:
-                state[i_BESS, t] = 'descarga'
-            else:
-                if t == l_t[0]:
-                    state[i_BESS, t] = 'carga'  # hipothesis: the first state is charging
-                else:
-                    state[i_BESS, t] = state[i_BESS, t-1]
-
-    cycle = {}
-    for i_BESS in l_BESS:
-        for t in l_t[:-1]:
-            if state[i_BESS, t] == 'carga' and state[i_BESS, t+1] == 'descarga':
-                cycle[i_BESS, t] = 'pico'
-            elif state[i_BESS, t] == 'descarga' and state[i_BESS, t+1] == 'carga':
-                cycle[i_BESS, t] = 'valle'
-            else:
-                cycle[i_BESS, t] = 0
-        if state[i_BESS, l_t[-1]] == 'carga' and state[i_BESS, l_t[0]] == 'descarga':
-            cycle[i_BESS, t] = 'pico'
-        elif state[i_BESS, l_t[-1]] == 'descarga' and state[i_BESS, l_t[0]] == 'carga':
-            cycle[i_BESS, t] = 'valle'
-        else:
-            cycle[i_BESS, t] = 0
 
-    return cycle
+def BESS_cycles(allResults, AllInputs):
+    '''
+    Peaks and valleys of the operation of each battery: change from charging to discharging (peak) or from
+    discharging to charging (valley). The operation is cyclic, the last time-step is compared with the first one
+    :param allResults: data class which contains all results of the optimization
+    :param AllInputs: data class which contains all inputs
+    :return: TimeSeriesClass cycle[i_BESS, t]: peak (1), valley (-1) or 0
+    '''
+    state = BESS_states(allResults, AllInputs)
+    following = numpy.roll(state, -1, axis=1)
+    cycle = numpy.where((state == 1) & (following == -1), peak, numpy.where((state == -1) & (following == 1), valley, 0))
+    return TimeSeriesClass.from_array(AllInputs.BESS.id_list, AllInputs.System.l_t, cycle)
 
 
 def count_peaks(cycles):
-    n_peaks = sum(1 for v in cycles.values() if v == 'pico')
-    n_valls = sum(1 for v in cycles.values() if v == 'valle')
-    return n_peaks
+    '''
+    :param cycles: TimeSeriesClass returned by BESS_cycles
+    :return: number of peaks of all the batteries
+    '''
+    return int((cycles.values == peak).sum())
+
 
+####################   Rainflow counting   ####################
+
+def reversals(series):
+    '''
+    Turning points of a series: first point, points where it changes from increasing to decreasing (or vice versa)
+    and last point. Repeated consecutive values are merged
+    :param series: array-like
+    :return: numpy array
+    '''
+    series = numpy.asarray(series, dtype=float)
+    if len(series) == 0:
+        return series
+    series = series[numpy.concatenate(([True], numpy.diff(series) != 0))]
+    if len(series) < 3:
+        return series
+    slope = numpy.sign(numpy.diff(series))
+    turning = slope[1:] != slope[:-1]
+    return numpy.concatenate((series[:1], series[1:-1][turning], series[-1:]))
+
+
+def rainflow(series, periodic=True):
+    '''
+    Rainflow counting of a series (three-point method, ASTM E1049-85). The cycles that are not closed at the end
+    (residue) are counted as half cycles
+    :param series: array-like, e.g. SOC of a battery [pu]
+    :param periodic: if True, the series is considered cyclic (the end is followed by the start, like the SOC of the
+        optimization): it is rotated to start and end at its maximum and all the cycles (also the residue) are counted
+        as full cycles
+    :return: two numpy arrays: range of each cycle and its count (1: full cycle, 0.5: half cycle)
+
+    >>> rainflow([0, 1, 0, 1, 0])
+    (array([1., 1.]), array([1., 1.]))
+    '''
+    points = reversals(series)
+    if periodic and len(points) > 1:
+        start = int(numpy.argmax(points))
+        points = reversals(numpy.concatenate((points[start:], points[:start], points[start:start + 1])))
+    ranges, counts = [], []
+    stack = []
+    for point in points.tolist():
+        stack.append(point)
+        while len(stack) >= 3:
+            X = abs(stack[-1] - stack[-2])
+            Y = abs(stack[-2] - stack[-3])
+            if X < Y:
+                break
+            ranges.append(Y)
+            if len(stack) == 3 and not periodic:  # the range contains the first point: half cycle
+                counts.append(0.5)
+                stack.pop(0)
+            else:
+                counts.append(1.0)
+                stack[-3:] = stack[-1:]
+    for point1, point2 in zip(stack[:-1], stack[1:]):  # residue
+        ranges.append(abs(point2 - point1))
+        counts.append(1.0 if periodic else 0.5)
+    return numpy.array(ranges), numpy.array(counts)
+
+
+def BESS_rainflow(allResults, AllInputs, bins=depth_bins, periodic=True):
+    '''
+    Rainflow analysis of the SOC of each battery: depth histogram of the cycles and equivalent full cycles.
+    With representative days the SOC is relative to the start of each day and the days are not consecutive, so the
+    cycles longer than one day are not seen
+    :param allResults: data class which contains all results of the optimization
+    :param AllInputs: data class which contains all inputs
+    :param bins: edges of the depth bins [pu of the capacity]
+    :param periodic: if True, the SOC is considered cyclic (see rainflow)
+    :return: DataFrame with the cycles of each battery (one row per battery), and DataFrame with the number of
+        cycles of each depth bin (one row per battery, one column per bin)
+    '''
+    l_t = AllInputs.System.l_t
+    table, histogram = {}, {}
+    for i_BESS in AllInputs.BESS.id_list:
+        name = AllInputs.BESS.name[i_BESS]
+        capacity = allResults.BESS.C[i_BESS] + AllInputs.BESS.existent_C[i_BESS]  # [kWh]
+        if capacity > 1e-6:  # not installed (up to the tolerance of the solver)
+            SOC = numpy.round(allResults.BESS.SOC.array(i_BESS, l_t) / capacity, 6)  # without the noise of the solver
+            depths, counts = rainflow(SOC, periodic)
+        else:
+            depths, counts = numpy.zeros(0), numpy.zeros(0)
+        histogram[name] = numpy.histogram(numpy.clip(depths, bins[0], bins[-1]), bins=bins, weights=counts)[0]
+        table[name] = {'Capacity [kWh]': capacity,
+                       'Equivalent full cycles': float((depths * counts).sum()),
+                       'Cycles (rainflow)': float(counts.sum()),
+                       'Maximum depth [%]': float(depths.max() * 100) if len(depths) else 0.0,
+                       'Mean depth [%]': float((depths * counts).sum() / counts.sum() * 100) if counts.sum() else 0.0}
+    columns = ['depth ' + format(bins[n] * 100, 'g') + '-' + format(bins[n + 1] * 100, 'g') + ' %' for n in range(len(bins) - 1)]
+    table = pandas.DataFrame.from_dict(table, orient='index')
+    histogram = pandas.DataFrame(histogram, index=columns).T
+    return table, histogram
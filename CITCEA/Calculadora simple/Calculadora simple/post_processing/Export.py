@@ -0,0 +1,82 @@
+import functools
+import re
+import pandas
+'''
+Comentarios:
+    - las tablas con una fila por time-step se pueden guardar en parquet / feather (necesitan pyarrow) o csv
+    - un fichero por hoja: <fichero>_<hoja>.<extensión>
+    - las tablas pequeñas (dimensionado, económico) se pueden seguir guardando en Excel
+'''
+
+
+####################   Format of the results files   ####################
+
+results_formats = {'excel': '.xlsx', 'parquet': '.parquet', 'feather': '.feather', 'csv': '.csv'}
+
+
+@functools.lru_cache(maxsize=None)
+def columnar_available():
+    '''
+    :return: True if parquet and feather files can be written (pyarrow can be imported, not only found: a pyarrow
+        built for another numpy version fails on import)
+    '''
+    try:
+        import pyarrow
+    except ImportError:
+        return False
+    return True
+
+
+def check_results_format(results_format, summary=False):
+    '''
+    Checks the format of the results files
+    :param results_format: excel, parquet, feather or csv
+    :param summary: True for the small tables (sizing, economics), which can only be saved in excel or csv because
+        their columns mix numbers and text
+    :return: format to use (csv if parquet or feather are not available), None if the format is not valid
+    '''
+    if results_format not in results_formats:
+        print('Results ERROR: the format ' + str(results_format) + ' is not valid. Options: ' + ', '.join(results_formats))
+        return None
+    if summary and results_format in ['parquet', 'feather']:
+        print('Results WARNING: the sizing and economic tables are saved as csv instead of ' + results_format)
+        return 'csv'
+    if results_format in ['parquet', 'feather'] and not columnar_available():
+        print('Results WARNING: pyarrow is not installed or can not be imported, the results are saved as csv instead of ' + results_format)
+        return 'csv'
+    return results_format
+
+
+def sheet_file(save_folder, file, sheet, results_format):
+    '''
+    :return: path of the file of one sheet when the results are not saved in Excel. E.g. CSV/Results/Operation_General.csv
+    '''
+    name = re.sub(r'\W+', '_', sheet).strip('_')
+    return save_folder + file + '_' + name + results_formats[results_format]
+
+
+def save_tables(save_folder, file, sheets, results_format='excel'):
+    '''
+    Saves a group of tables: the sheets of an Excel file, or one file per sheet in the other formats
+    :param save_folder: string with the path of the folder in which the file will be saved
+    :param file: name of the file without extension. E.g. 'Operation'
+    :param sheets: ``list`` of tuples (sheet name, DataFrame, ``dict`` with the options of to_excel such as
+        float_format, header or index). The options are also used in csv (to_csv)
+    :param results_format: excel, parquet, feather or csv
+    '''
+    if results_format == 'excel':
+        with pandas.ExcelWriter(save_folder + file + '.xlsx') as writer:
+            for sheet, table, options in sheets:
+                table.to_excel(writer, sheet_name=sheet, **options)
+        return
+
+    for sheet, table, options in sheets:
+        path = sheet_file(save_folder, file, sheet, results_format)
+        if results_format == 'csv':
+            table.to_csv(path, **options)
+            continue
+        table = table.rename(columns=str)  # parquet and feather only accept column names of type str
+        if results_format == 'parquet':
+            table.to_parquet(path, index=options.get('index', True))
+        else:  # feather: the index is saved as a column
+            table.reset_index(drop=not options.get('index', True)).rename(columns=str).to_feather(path)
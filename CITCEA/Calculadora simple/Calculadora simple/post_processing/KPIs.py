@@ -1,4 +1,11 @@
+import numpy
 import pandas
+'''
+Comentarios:
+    - los KPIs energéticos se calculan a partir del balance de potencias de cada time-step (energy_frame)
+    - se pueden calcular para el año, cada mes o cada hora del día (KPI_breakdown)
+    - el autoconsumo se calcula en cada time-step (self_supply), no con min(PV anual, carga anual)
+'''
 
 
 def calc_discount_rate(AllInputs):
@@ -327,66 +334,146 @@ def calc_operating_cost(allResults, AllInputs, l_Grid, type_):
         return operating_cost_total
 
 
-def calc_total_E_served(allResults, AllInputs, l_t, l_Grid, l_bus, inc_t):
+####################   Energy KPIs   ####################
+
+power_columns = ['PV [kW]', 'Load [kW]', 'Load not supplied [kW]', 'Grid buy [kW]', 'Grid sell [kW]',
+                 'Grid excess [kW]', 'Grid renewables [kW]', 'BESS charge [kW]', 'BESS discharge [kW]',
+                 'PV to load [kW]', 'PV to BESS [kW]', 'BESS (PV) to load [kW]', 'Renewables served [kW]']
+
+
+def self_supply(PV, served, BESS_char, BESS_disch, weight):
     '''
-    Calculates the total electric/thermal energy supplied annualy, considering the loads and the energy sold to the grid
-    :param allResults: data class which contains all results of the optimization
-    :param l_t: ``list`` containing all time-steps
-    :param inc_t: time-step magnitude [h]
-    :return: total electric energy supplied annualy [kWh]
+    Split of the PV generation at each time-step (vectorized):
+        - PV to load = min(PV_t, load served_t)
+        - PV to BESS = min(PV surplus_t, BESS charge_t)
+        - BESS (PV) to load = min(BESS discharge_t, load served_t - PV to load_t) * share of the energy charged in
+          the BESS that comes from the PV (over the whole horizon: the BESS is also charged from the grid)
+    :param PV: numpy array with the PV generation at each time-step [kW] (also used with PV + renewable energy from
+        the grid, for the renewable fraction)
+    :param served: numpy array with the load served (load - load not supplied) at each time-step [kW]
+    :param BESS_char: numpy array with the power charged in all the BESS at each time-step [kW]
+    :param BESS_disch: numpy array with the power discharged from all the BESS at each time-step [kW]
+    :param weight: numpy array with the hours represented by each time-step [h]
+    :return: three numpy arrays: PV to load, PV to BESS and BESS (PV) to load [kW]
     '''
-    # total electrical load served: loads + ventas - load not supplied
-    total_electrical_served = sum(allResults.D[t]*inc_t for t in l_t) \
-                              + sum(allResults.Grid.P_sell[i_Grid, t] * inc_t for t in l_t for i_Grid in l_Grid) \
-                              - sum(allResults.noSupply_P[i_bus, t] * inc_t for t in l_t for i_bus in l_bus)
-    total_served = total_electrical_served
-    return total_served
+    PV_load = numpy.minimum(PV, served)
+    PV_BESS = numpy.minimum(PV - PV_load, BESS_char).clip(min=0)  # clip: tolerance of the solver
+    E_char = (BESS_char * weight).sum()
+    PV_share = (PV_BESS * weight).sum() / E_char if E_char > 0 else 0
+    BESS_load = numpy.minimum(BESS_disch, served - PV_load).clip(min=0) * PV_share
+    return PV_load, PV_BESS, BESS_load
 
 
-def calc_self_consumption(allResults, l_t, inc_t, l_PV, l_bus):
+def series_total(series, l_t):
     '''
-    Calculates the self-consumption:  min(PV annual generation, annual load) / PV annual generation
-    :param allResults: data class which contains all results of the optimization
+    :param series: TimeSeriesClass with results, e.g. allResults.PV.P
     :param l_t: ``list`` containing all time-steps
-    :param inc_t: time-step magnitude [h]
-    :param l_PV: ``list`` containing all PV subsystems id
-    :return: self-consumption [pu]
+    :return: numpy array with the sum of all the elements at each time-step
     '''
-    if sum(allResults.PV.P[i_PV, t] * inc_t for i_PV in l_PV for t in l_t) == 0:
-        self_consumption = 0
-    else:
-        self_consumption = min(sum(allResults.PV.P[i_PV, t] * inc_t for i_PV in l_PV for t in l_t), sum((allResults.D[t]-sum(allResults.noSupply_P[i_bus, t] for i_bus in l_bus)) * inc_t for t in l_t)) \
-                           / sum(allResults.PV.P[i_PV, t] * inc_t for i_PV in l_PV for t in l_t)
-    return self_consumption
+    if not series.rows:
+        return numpy.zeros(len(l_t))
+    return series.values[:, [series.column(t) for t in l_t]].sum(axis=0)
 
 
-def calc_self_production(allResults, l_t, inc_t, l_PV, l_bus):
+def energy_frame(allResults, AllInputs):
     '''
-    Calculates the self-production: min(PV annual generation, annual load) / annual load
+    Power balance of the system at each time-step, from which all the energy KPIs are calculated
     :param allResults: data class which contains all results of the optimization
-    :param l_t: ``list`` containing all time-steps
-    :param inc_t: time-step magnitude [h]
-    :param l_PV: ``list`` containing all PV subsystems id
-    :return: self-production [pu]
+    :param AllInputs: data class which contains all inputs
+    :return: DataFrame, one row per time-step, with the columns of ``power_columns`` (sum of all the PV, buses, grid
+        connections and BESS, 'Grid renewables [kW]' of the last grid connection, and split of the PV generation, see self_supply), 'Energy factor [h]' (hours represented by the time-step: inc_t multiplied by the days
+        it represents with representative days), 'month' (key of System.dict_month) and 'hour' (of the day)
     '''
-    self_production = min(sum(allResults.PV.P[i_PV, t] * inc_t for i_PV in l_PV for t in l_t), sum((allResults.D[t]-sum(allResults.noSupply_P[i_bus, t] for i_bus in l_bus)) * inc_t for t in l_t)) \
-                      / sum(allResults.D[t]*inc_t for t in l_t)
-    return self_production
+    l_t = AllInputs.System.l_t
+    inc_t = AllInputs.System.inc_t
+    frame = pandas.DataFrame(index=l_t)
+    frame['PV [kW]'] = series_total(allResults.PV.P, l_t)
+    frame['Load [kW]'] = allResults.D.array((), l_t)
+    frame['Load not supplied [kW]'] = series_total(allResults.noSupply_P, l_t)
+    frame['Grid buy [kW]'] = series_total(allResults.Grid.P_buy, l_t)
+    frame['Grid sell [kW]'] = series_total(allResults.Grid.P_sell, l_t)
+    frame['Grid excess [kW]'] = series_total(allResults.Grid.P_excess, l_t)
+    grid_renewables = numpy.zeros(len(l_t))
+    if AllInputs.Grid.id_list:  # renewable energy from the grid: only the last grid connection is considered
+        i_Grid = AllInputs.Grid.id_list[-1]
+        grid_renewables = AllInputs.Grid.renewable_factor.array(i_Grid, l_t) \
+                          * (allResults.Grid.P_buy.array(i_Grid, l_t) + allResults.Grid.P_excess.array(i_Grid, l_t))
+    frame['Grid renewables [kW]'] = grid_renewables
+    frame['BESS charge [kW]'] = series_total(allResults.BESS.P_char, l_t)
+    frame['BESS discharge [kW]'] = series_total(allResults.BESS.P_disch, l_t)
+    weight = inc_t * numpy.array([AllInputs.System.weight_t[t] for t in l_t], dtype=float)
+    served = frame['Load [kW]'].to_numpy() - frame['Load not supplied [kW]'].to_numpy()
+    frame['PV to load [kW]'], frame['PV to BESS [kW]'], frame['BESS (PV) to load [kW]'] = \
+        self_supply(frame['PV [kW]'].to_numpy(), served, frame['BESS charge [kW]'].to_numpy(),
+                    frame['BESS discharge [kW]'].to_numpy(), weight)
+    # renewable energy served: PV and renewable energy from the grid that cover the loads served and the energy sold,
+    # directly or through the BESS (counted on discharge, with the renewable share of the energy charged)
+    renewables_direct, _, renewables_BESS = \
+        self_supply(frame['PV [kW]'].to_numpy() + grid_renewables, served + frame['Grid sell [kW]'].to_numpy(),
+                    frame['BESS charge [kW]'].to_numpy(), frame['BESS discharge [kW]'].to_numpy(), weight)
+    frame['Renewables served [kW]'] = renewables_direct + renewables_BESS
+    frame['Energy factor [h]'] = weight
+    month = {name: key for key, name in AllInputs.System.dict_month.items()}
+    frame['month'] = [month[name] for name in AllInputs.System.name_days['mes'].to_numpy()[numpy.asarray(l_t)]]
+    frame['hour'] = (numpy.asarray(l_t) * inc_t % 24).astype(int)
+    return frame
+
+
+def energy_totals(frame, by=None):
+    '''
+    Energies of the power balance
+    :param frame: DataFrame returned by energy_frame
+    :param by: None (whole horizon) or column used to group the time-steps ('month' or 'hour')
+    :return: pandas Series with the energy of each column of ``power_columns`` [kWh] (DataFrame with one row per group
+        if by is given)
+    '''
+    energy = frame[power_columns].mul(frame['Energy factor [h]'], axis=0)
+    energy.columns = [column.replace('[kW]', '[kWh]') for column in power_columns]
+    if by is None:
+        return energy.sum()
+    return energy.groupby(frame[by]).sum()
 
 
-def calc_renewable_fraction(allResults, AllInputs, inc_t, total_E_served, l_t, l_PV, l_Grid):
+def energy_KPIs(energy):
     '''
-    Calculates the electrical renewable fraction (not considering the grid): PV annual generation / total electricity supplied annualy
-    :param allResults: data class which contains all results of the optimization
-    :param total_E_served: total electric energy supplied annualy [kWh]
-    :param l_t: ``list`` containing all time-steps
-    :param l_PV: ``list`` containing all PV subsystems id
-    :return: renewable fraction [pu]
+    Energy KPIs from the energies of the power balance (the energies of each time-step, see self_supply):
+        - total electricity served = load + energy sold - load not supplied
+        - self-consumption = (PV to load + PV to BESS) / PV generation
+        - self-production = (PV to load + BESS (PV) to load) / load
+        - renewable fraction = renewables served / total electricity served
+    :param energy: pandas Series returned by energy_totals (or DataFrame, one row per group)
+    :return: same type as energy, with the KPIs [kWh, pu]. A ratio is 0 when its denominator is 0 (e.g. an hour
+        without load in KPI_breakdown)
+    '''
+    table = energy.to_frame().T if isinstance(energy, pandas.Series) else energy
+    PV = table['PV [kWh]'].to_numpy()
+    load = table['Load [kWh]'].to_numpy()
+    served = load - table['Load not supplied [kWh]'].to_numpy() + table['Grid sell [kWh]'].to_numpy()
+    PV_load = table['PV to load [kWh]'].to_numpy()
+    with numpy.errstate(divide='ignore', invalid='ignore'):
+        KPIs = pandas.DataFrame({
+            'total electricity served [kWh]': served,
+            'Self-consumption [pu]': numpy.where(PV == 0, 0, (PV_load + table['PV to BESS [kWh]'].to_numpy()) / PV),
+            'Self-production [pu]': numpy.where(load == 0, 0, (PV_load + table['BESS (PV) to load [kWh]'].to_numpy()) / load),
+            'Electrical renewable fraction [pu]': numpy.where(served == 0, 0, table['Renewables served [kWh]'].to_numpy() / served)},
+            index=table.index)
+    return KPIs.iloc[0] if isinstance(energy, pandas.Series) else KPIs
+
+
+def KPI_breakdown(frame, by, AllInputs=None):
     '''
-    grid_renewables = {t: AllInputs.Grid.renewable_factor[i_Grid, t]*(allResults.Grid.P_buy[i_Grid, t] + allResults.Grid.P_excess[i_Grid, t]) for t in l_t for i_Grid in l_Grid}
-    renewable_fraction = (sum(allResults.PV.P[i_PV, t]*inc_t for i_PV in l_PV for t in l_t)
-                          + sum(grid_renewables[t]*inc_t for t in l_t)) / total_E_served
-    return renewable_fraction
+    Energies and energy KPIs of each month or hour of the day
+    :param frame: DataFrame returned by energy_frame
+    :param by: 'month' or 'hour'. With representative days, each day is assigned to the month of the representative day
+    :param AllInputs: data class which contains all inputs, to name the months (optional)
+    :return: DataFrame, one row per month or hour, with the energies [kWh] and the KPIs [pu]
+    '''
+    energy = energy_totals(frame, by)
+    table = pandas.concat([energy, energy_KPIs(energy)], axis=1)
+    if by == 'month' and AllInputs is not None:
+        table.index = [AllInputs.System.dict_month[month] for month in table.index]
+    return table
+
 
 def calc_ROI(CashFlow_DataFrame, type_, L_prj):
     '''
@@ -1,13 +1,77 @@
+import itertools
+import math
+import numpy
+import pandas
+from pre_processing.Time_series import TimeSeriesClass
+'''
+Comentarios:
+    - las variables indexadas por tiempo se extraen a arrays (TimeSeriesClass), se siguen indexando [id, t]
+    - los resultados de cada componente se obtienen como DataFrame con los métodos table
+'''
+
+
+def var_series(var, l_t):
+    '''
+    Extracts a variable indexed by (id, ..., t), or only by t, as a time series
+    :param var: pyomo indexed variable of the solved instance
+    :param l_t: ``list`` containing all time-steps
+    :return: TimeSeriesClass with the values of the variable, series[id, t] (nan for the elements without value)
+    '''
+    values = var.get_values()  # {index: value} in the order in which the elements were built
+    keys = list(values)
+    subsets = list(var.index_set().subsets())
+    rows = [tuple(itertools.chain.from_iterable(k if type(k) is tuple else (k,) for k in key))
+            for key in itertools.product(*subsets[:-1])]
+    if keys and list(subsets[-1]) == list(l_t) and len(keys) == len(rows) * len(l_t) \
+            and index_tuple(keys[0]) == rows[0] + (l_t[0],) and index_tuple(keys[-1]) == rows[-1] + (l_t[-1],):
+        # dense variable indexed by [sets of the elements] x t: the values are already ordered by row and time-step
+        return TimeSeriesClass.from_array(rows, l_t, numpy.array(list(values.values()), dtype=float))
+    # otherwise (sparse variable, time-steps in another order) each value is placed in its row and column
+    series = TimeSeriesClass(l_t)
+    keys = [index_tuple(key) for key in keys]
+    row = {}
+    row_index = numpy.fromiter((row.setdefault(key[:-1], len(row)) for key in keys), dtype=int, count=len(keys))
+    col_index = numpy.fromiter((series.column(key[-1]) for key in keys), dtype=int, count=len(keys))
+    array = numpy.full((len(row), len(series.l_t)), math.nan)
+    array[row_index, col_index] = numpy.array(list(values.values()), dtype=float)
+    return TimeSeriesClass.from_array(list(row), l_t, array)
+
+
+def index_tuple(key):
+    '''
+    :return: index of a pyomo component as a tuple (the indexes of one set are not tuples)
+    '''
+    return key if type(key) is tuple else (key,)
+
+
+def zero_series(keys, l_t):
+    '''
+    :return: TimeSeriesClass with zeros for the elements that are not in the model
+    '''
+    return TimeSeriesClass.from_array(keys, l_t, numpy.zeros((len(keys), len(l_t))))
+
+
+def series_table(series, columns):
+    '''
+    :param series: TimeSeriesClass with results (e.g. Network.Pinj)
+    :param columns: ``list`` with the elements to include (e.g. buses or pairs of buses)
+    :return: DataFrame with one column per element, named by its id (pairs as '1-2'), one row per time-step
+    '''
+    return pandas.DataFrame({'-'.join(str(i) for i in column) if type(column) is tuple else column: series.array(column)
+                             for column in columns}, index=series.l_t)
+
+
 class PVResultsClass:
     '''
     Class that extracts and stores the PV results from the instance
     '''
-    def __init__(self, instance):  # instance=instance.PV
+    def __init__(self, instance, l_t):  # instance=instance.PV
         '''
         Class that extracts and stores the PV results from the instance
         :param instance: pyomo solved PV model (instance.PV)
+        :param l_t: ``list`` containing all time-steps
         '''
-        self.P = instance.PV_P.get_values() # AllResults.PV.P
+        self.P = var_series(instance.PV_P, l_t) # AllResults.PV.P
         self.G = instance.PV_G.get_values()
         #
         self.C_capex = instance.PV_C_capex.get_values()
@@ -16,6 +80,14 @@ class PVResultsClass:
         self.C_replacement1 = instance.PV_C_replacement1.get_values()
         self.C_replacement = instance.PV_C_replacement.get_values()
 
+    def table(self, AllInputs):
+        '''
+        :param AllInputs: data class which contains all inputs
+        :return: DataFrame with the operation of each PV, one row per time-step
+        '''
+        return pandas.DataFrame({AllInputs.PV.name[i_PV] + ': P [kW]': self.P.array(i_PV) for i_PV in AllInputs.PV.id_list},
+                                index=self.P.l_t)
+
 
 class BatteryResultsClass:
     '''
@@ -29,9 +101,9 @@ class BatteryResultsClass:
         :param l_BESS: ``list`` containing all BESS subsystems id
         '''
         if not l_BESS:
-            self.P_char = {t: 0 for t in l_t}
-            self.P_disch = {t: 0 for t in l_t}
-            self.SOC = {t: 0 for t in l_t}
+            self.P_char = TimeSeriesClass(l_t)
+            self.P_disch = TimeSeriesClass(l_t)
+            self.SOC = TimeSeriesClass(l_t)
             self.Pn_char = 0
             self.Pn_disch = 0
             self.C = 0
@@ -43,9 +115,9 @@ class BatteryResultsClass:
             self.C_replacement = 0
             self.C_degradation = 0
         else:
-            self.P_char = instance.BESS_P_char.get_values()
-            self.P_disch = instance.BESS_P_disch.get_values()
-            self.SOC = instance.BESS_SOC.get_values()
+            self.P_char = var_series(instance.BESS_P_char, l_t)
+            self.P_disch = var_series(instance.BESS_P_disch, l_t)
+            self.SOC = var_series(instance.BESS_SOC, l_t)
             self.Pn_char = instance.BESS_Pn_char.get_values()
             self.Pn_disch = instance.BESS_Pn_disch.get_values()
             self.C = instance.BESS_C.get_values()
@@ -57,6 +129,20 @@ class BatteryResultsClass:
             self.C_replacement = instance.BESS_C_replacement.get_values()
             self.C_degradation = instance.BESS_C_degradation.get_values()
 
+    def table(self, AllInputs):
+        '''
+        :param AllInputs: data class which contains all inputs
+        :return: DataFrame with the operation of each BESS (powers of all of them, then their SOC), one row per time-step
+        '''
+        l_BESS = AllInputs.BESS.id_list
+        columns = {}
+        for i_BESS in l_BESS:
+            columns[AllInputs.BESS.name[i_BESS] + ': P_char [kW]'] = self.P_char.array(i_BESS)
+            columns[AllInputs.BESS.name[i_BESS] + ': P_disch [kW]'] = self.P_disch.array(i_BESS)
+        for i_BESS in l_BESS:
+            columns[AllInputs.BESS.name[i_BESS] + ': SOC [kWh]'] = self.SOC.array(i_BESS)
+        return pandas.DataFrame(columns, index=self.SOC.l_t)
+
 
 class GridResultsClass:
     '''
@@ -69,13 +155,13 @@ class GridResultsClass:
         :param l_t: ``list`` containing all time-steps
         :param AllInputs: data class which contains all inputs
         '''
-        self.P_excess = instance.Grid_P_excess.get_values()
+        self.P_excess = var_series(instance.Grid_P_excess, l_t)
 
         if AllInputs.Grid.conected1_islanded0 == 1:
-            self.P_buy = instance.Grid_P_buy.get_values()
-            self.P_sell = instance.Grid_P_sell.get_values()
+            self.P_buy = var_series(instance.Grid_P_buy, l_t)
+            self.P_sell = var_series(instance.Grid_P_sell, l_t)
             self.P_hired_N = instance.Grid_P_hired_N.get_values()
-            self.P_hired_t = instance.Grid_P_hired_t.get_values()
+            self.P_hired_t = var_series(instance.Grid_P_hired_t, l_t)
             self.lambda_inj = instance.Grid_lambda_inj.get_values()
             self.P_excessmax = instance.Grid_P_excessmax.get_values()
             #
@@ -85,10 +171,10 @@ class GridResultsClass:
             self.C_penalisation = instance.Grid_C_penalisation.get_values()
             self.C_emission = instance.Grid_C_emission.get_values()
         else:
-            self.P_buy = {(0,t): 0 for t in l_t}
-            self.P_sell = {(0,t): 0 for t in l_t}
+            self.P_buy = zero_series([0], l_t)
+            self.P_sell = zero_series([0], l_t)
             self.P_hired_N = {(0,N): 0 for N in AllInputs.Grid.l_N}
-            self.P_hired_t = {(0,t): 0 for t in l_t}
+            self.P_hired_t = zero_series([0], l_t)
             self.lambda_inj = {0:0}
             self.P_excessmax = {0:0}
             #
@@ -98,6 +184,19 @@ class GridResultsClass:
             self.C_penalisation = {0:0}
             self.C_emission = {0:0}
 
+    def table(self, AllInputs):
+        '''
+        :param AllInputs: data class which contains all inputs
+        :return: DataFrame with the operation of each grid connection, one row per time-step
+        '''
+        columns = {}
+        for i_Grid in AllInputs.Grid.id_list:
+            columns[AllInputs.Grid.name[i_Grid]+': P_hired [kW]'] = self.P_hired_t.array(i_Grid)
+            columns[AllInputs.Grid.name[i_Grid]+': P_buy [kW]'] = self.P_buy.array(i_Grid)
+            columns[AllInputs.Grid.name[i_Grid]+': P_sell [kW]'] = self.P_sell.array(i_Grid)
+            columns[AllInputs.Grid.name[i_Grid]+': P_excess [kW]'] = self.P_excess.array(i_Grid)
+        return pandas.DataFrame(columns, index=self.P_excess.l_t)
+
 
 class EVResultsClass:
     '''
@@ -112,37 +211,45 @@ class EVResultsClass:
         '''
         l_Mev = AllInputs.EV.smart.l_Mev
         if AllInputs.EV.hay == 1 and AllInputs.EV.immediate0_smart1 == 1:
-            self.P = instance.EV_P.get_values()
+            self.P = var_series(instance.EV_P, l_t)
             self.flexibility_cost = instance.EV_flexibility_cost.get_values()
             self.is_baseline = instance.EV_is_baseline.get_values()
         else:
-            self.P = {(Mev, t): 0 for t in l_t for Mev in l_Mev}
+            self.P = zero_series(l_Mev, l_t)
             self.flexibility_cost = {Mev: 0 for Mev in l_Mev}
 
+    def table(self, l_Mev):
+        '''
+        :param l_Mev: ``list`` containing all EV smart charging modules
+        :return: DataFrame with the power of each module, one row per time-step
+        '''
+        return pandas.DataFrame({Mev: self.P.array(Mev) for Mev in l_Mev}, index=self.P.l_t)
+
 
 class NetworkResultsClass:
-    def __init__(self, PF_type, instance, l_t, l_bus):
-        self.Pinj = instance.Pinj.get_values()
-        self.Qinj = instance.Qinj.get_values()
+    def __init__(self, PF_type, instance, l_t, l_bus, Lines):
+        self.Pinj = var_series(instance.Pinj, l_t)
+        self.Qinj = var_series(instance.Qinj, l_t)
         #
-        self.Q_buy = instance.Q_buy.get_values()
+        self.Q_buy = var_series(instance.Q_buy, l_t)
         if PF_type == 'DC-OPF':
-            self.thetaV = instance.thetaV.get_values()
-            self.Pline = instance.Pline.get_values()
+            self.thetaV = var_series(instance.thetaV, l_t)
+            self.Pline_line = var_series(instance.Pline, l_t)  # Pline_line[line, t]
+            self.Pline = Lines.Pline_bus_pairs(self.Pline_line, l_t)  # Pline[i_bus1, i_bus2, t]
         elif PF_type == 'AC-OPF':
-            self.Pline = instance.Pline.get_values()
-            self.Qline = instance.Qline.get_values()
-            self.c = instance.c.get_values()
-            self.s = instance.s.get_values()
-            self.i_line_squared = {} #instance.i_line_squared.get_values()
-            for i_bus1 in l_bus:
-                for i_bus2 in l_bus:
-                    for t in l_t:
-                        self.i_line_squared[i_bus1, i_bus2, t] = (self.Pline[i_bus1, i_bus2, t]**2 + self.Qline[i_bus1, i_bus2, t]**2) / self.c[i_bus1, i_bus1, t]
+            self.Pline = var_series(instance.Pline, l_t)  # Pline[i_bus1, i_bus2, t], only connected buses
+            self.Qline = var_series(instance.Qline, l_t)  # Qline[i_bus1, i_bus2, t], only connected buses
+            self.c = var_series(instance.c, l_t)  # c[i_bus, i_bus, t] and c[i_bus1, i_bus2, t] of Lines.edges()
+            self.s = var_series(instance.s, l_t)  # s[i_bus1, i_bus2, t] of Lines.edges()
+            branches = Lines.branches()
+            self.i_line_squared = TimeSeriesClass.from_array(branches, l_t, [  # i_line_squared[i_bus1, i_bus2, t]
+                (self.Pline.array(branch)**2 + self.Qline.array(branch)**2) / self.c.array((branch[0], branch[0]))
+                for branch in branches])
         else:  # PF_type == 'economic_dispatch'
             ...
 
 
+
 class EconomicIndicatorsResultsClass:
     '''
     Class that extracts and stores the Economic indicators results from the instance
@@ -174,18 +281,33 @@ class allResultsClass:
         # sigue exactamente la misma nomenclatura que la optimización
 
         # General
-        self.D = instance.D.get_values()
+        self.D = var_series(instance.D, l_t)  # D[t]
 
         # Blocks
-        self.PV = PVResultsClass(instance)
+        self.PV = PVResultsClass(instance, l_t)
         self.BESS = BatteryResultsClass(instance, l_t, AllInputs.BESS.id_list)
         self.Grid = GridResultsClass(instance, l_t, AllInputs)
         self.EV = EVResultsClass(instance, l_t, AllInputs)
         self.Economic_indicators = EconomicIndicatorsResultsClass(instance)
 
         # Network
-        self.Network = NetworkResultsClass(AllInputs.Network.PF_type, instance, l_t, AllInputs.Network.Buses.id_list)
+        self.Network = NetworkResultsClass(AllInputs.Network.PF_type, instance, l_t, AllInputs.Network.Buses.id_list, AllInputs.Network.Lines)
 
         # Other
-        self.noSupply_P = instance.noSupply_P.get_values()
+        self.noSupply_P = var_series(instance.noSupply_P, l_t)
         self.noSupply_C = instance.noSupply_C.get_values()[None]
+
+    def table(self, AllInputs):
+        '''
+        Operation of the whole system: grid connections, PV, BESS and the load not supplied at each bus (only the buses
+        with load not supplied)
+        :param AllInputs: data class which contains all inputs
+        :return: DataFrame, one row per time-step
+        '''
+        columns = {}
+        for i_bus in AllInputs.Network.Buses.id_list:
+            noSupply_P = self.noSupply_P.array(i_bus)
+            if noSupply_P.sum() != 0:
+                columns['Load not supplied '+AllInputs.Network.Buses.name[i_bus]+' [kW]'] = noSupply_P
+        table_islanded = pandas.DataFrame(columns, index=self.D.l_t)
+        return pandas.concat([self.Grid.table(AllInputs), self.PV.table(AllInputs), self.BESS.table(AllInputs), table_islanded], axis=1)
@@ -1,217 +1,342 @@
 import pandas
+from profiling import stage
+from pre_processing.Input_cache import read_excel_cached, read_csv_cached  # binary cache of the parsed sheets (CSV/DATA/.cache/)
+from pre_processing.System import *
+from pre_processing.Network import *
+from pre_processing.Loads import *
+from pre_processing.PV import *
+from pre_processing.Battery import *
+from pre_processing.Economic_constraints import *
+from pre_processing.Grid import *
+from pre_processing.EV import *
+
+
+folder_data = 'CSV/DATA/'  # default folder with the input files
 
 
 ####################   Read input data from excel (get_inputs_form_excel)   ####################
 
-folder_data = 'CSV/DATA/'
-l_t = list(range(24*365))
-bisiesto = 0
-inc_t = 1  # time-step magnitude [h]
-#
-general_client = pandas.read_excel(folder_data+'client.xlsx', sheet_name='General', header=None, index_col=0)
-#
-name_days = pandas.read_excel(folder_data + 'Time_data.xlsx', sheet_name='data', header=0,
-                              usecols=['id', 'datetime', 'mes', 'dia', 'festivo'])  # import database with time names
-#
-load_data = pandas.read_excel(folder_data + 'client.xlsx', sheet_name='Load', header=1,
-                              index_col=None)  # si queremos llamar por id --> index_col=0
-load_P_TS = pandas.read_excel(folder_data + 'client.xlsx', sheet_name='Load TS', header=1, index_col=None)
-#
-PV_database = pandas.read_excel(folder_data+'client.xlsx', sheet_name='PV database', header=0, index_col=0)  # import PV database
-PV_client = pandas.read_excel(folder_data+'client.xlsx', sheet_name='PV', header=1, index_col=None)  # importa PV client data
-PV_TS = pandas.read_excel(folder_data + 'client.xlsx', sheet_name='PV TS', header=1, index_col=None)
-#
-BESS_database = pandas.read_excel(folder_data+'client.xlsx', sheet_name='Battery database', header=0, index_col=0)  # import battery database
-BESS_client = pandas.read_excel(folder_data+'client.xlsx', sheet_name='BESS', header=1, index_col=None)  # import BESS client data
-#
-economic_constraints_DataFrame = pandas.read_excel(folder_data+'client.xlsx', sheet_name='Economic Constraints', header=0, index_col=None)  # import economic constraints
-#
-client_EV = pandas.read_excel(folder_data+'client.xlsx', sheet_name='EV', header=None,
-                              index_col=0)  # import EV characteristics defined by the client
-#
-ev_df = pandas.read_excel(folder_data + 'EV_stations.xlsx')
-
-station_cols = [c for c in ev_df.columns if c.startswith('EV station')]
-assert len(station_cols) == 4, f"Expected 4 EV station columns, found {len(station_cols)}"
-T = len(l_t)  # 8760 hours
-ev_df = ev_df.iloc[:T].reset_index(drop=True)
-EV_profiles = {s: ev_df[s].to_numpy(dtype=float) for s in station_cols}
-
-# Editable
-Pmax_station = {s: 22.0 for s in station_cols}   # kW rated power per station
-eta_ch  = {s: 0.95 for s in station_cols}        # charging efficiency
-eta_dis = {s: 0.95 for s in station_cols}        # discharging efficiency
-
-EV_Stations = {
-    "id_list": station_cols,
-    "profile": EV_profiles,
-    "Pmax": Pmax_station,
-    "eta_ch": eta_ch,
-    "eta_dis": eta_dis,
-}
-#
-Grid_client = pandas.read_excel(folder_data + 'client.xlsx', sheet_name='Grid', header=1, index_col=None)  # import Grid client data
-hired_power_periods = pandas.read_excel(folder_data + 'client.xlsx', sheet_name='hired_power Periods', header=1, index_col=None)
-buy_price_periods = pandas.read_excel(folder_data + 'client.xlsx', sheet_name='buy_price Periods', header=1, index_col=None)
-sell_price_periods = pandas.read_excel(folder_data + 'client.xlsx', sheet_name='sell_price Periods', header=1, index_col=None)
-buy_price_TS = pandas.read_excel(folder_data + 'client.xlsx', sheet_name='buy_price TS', header=1, index_col=None)
-sell_price_TS = pandas.read_excel(folder_data + 'client.xlsx', sheet_name='sell_price TS', header=1, index_col=None)
-grid_emissions_TS = pandas.read_excel(folder_data + 'client.xlsx', sheet_name='Grid_emissions TS', header=1, index_col=None)  # emission factor [tCO2/MWh]
-grid_renewables_TS = pandas.read_excel(folder_data + 'client.xlsx', sheet_name='Grid_renewables TS', header=1, index_col=None)  # renewables share [pu]
-market_cost = pandas.read_csv(folder_data + 'export_PrecioMercadoSPOTDiario_buy.csv', delimiter=';',
-                              header=0, usecols=['datetime', 'value'])  # import market prices [€/MWh]
-market_income = pandas.read_csv(folder_data + 'export_PrecioMercadoSPOTDiario_sell.csv', delimiter=';',
-                              header=0, usecols=['datetime', 'value'])  # import market prices [€/MWh]
-BOE_cost_power = pandas.read_excel(folder_data + 'peajes.xlsx', sheet_name='Power Cost', header=0,
-                                   index_col=0)  # import hired power costs at each tariff period (BOE)
-BOE_cost_energy = pandas.read_excel(folder_data + 'peajes.xlsx', sheet_name='Energy Cost', header=0,
-                                    index_col=0)  # import energy access costs at each tariff period (BOE)
-BOE_penalisations = pandas.read_excel(folder_data + 'peajes.xlsx', sheet_name='Power Penalizations', header=0,
-                                      index_col=0)  # import costs and coefficients of excess power penalisation (BOE)
-# start_date = '01-01-2023'
-# end_date = '31-12-2023'
-# url_precio = 'https://www.esios.ree.es/es/analisis/600?vis=1&start_date=' + start_date + 'T00%3A00&end_date=' + end_date + 'T23%3A55&geoids=3&compare_start_date=22-07-2024T00%3A00&groupby=hour'  # €/MWh
-# url_emisiones = 'https://www.esios.ree.es/es/analisis/10355?vis=1&start_date=' + start_date + 'T00%3A00&end_date=' + end_date + 'T23%3A55&compare_start_date=30-06-2024T00%3A00&groupby=hour'  # tCO2/MW
-# url_demanda_nacional = 'https://www.esios.ree.es/es/analisis/1293?compare_indicators=&start_date=' + start_date + 'T00%3A00&geoids=&vis=1&end_date=' + end_date + 'T23%3A55&compare_start_date=22-07-2024T00%3A00&groupby=hour'  # MW
-# url_generacion_renovable = 'https://www.esios.ree.es/es/analisis/10351?vis=1&start_date=' + start_date + 'T00%3A00&end_date=' + end_date + 'T23%3A55&compare_start_date=22-07-2024T00%3A00&groupby=hour'  # MW
-national_grid_emissions_DataFrame = pandas.read_csv(folder_data + 'export_CO2AsociadoGeneracionTReal_2024-07-23_10_21.csv',
-                                                    delimiter=';',
-                                                    header=0,
-                                                    usecols=['datetime', 'value'])  # emission factor [tCO2/MWh=kgCO2/kWh]
-national_demand_DataFrame = pandas.read_csv(folder_data + 'export_DemandaReal_2024-07-23_10_30.csv', delimiter=';',
-                                            header=0, usecols=['datetime', 'value'])  # total demand [MWh]
-national_renewable_generation_DataFrame = pandas.read_csv(
-    folder_data + 'export_GeneracionTRealRenovable_2024-07-23_10_35.csv', delimiter=';',
-    header=0, usecols=['datetime', 'value'])  # total renewable generation [MWh]
-#
-import_buses = pandas.read_excel(folder_data + 'client.xlsx', sheet_name='Bus', header=1, index_col=None)
-import_lines = pandas.read_excel(folder_data + 'client.xlsx', sheet_name='Lines', header=1, index_col=None)
+def read_esios_data(folder_data):
+    '''
+    Reads the ESIOS CSVs (market prices and national emissions, demand and renewable generation), which are the same
+    for all the clients
+    :param folder_data: folder with the ESIOS files
+    :return: ``dict`` with a pandas DataFrame per file, keyed by a short name
+    '''
+    data = {}
+    data['market cost'] = read_csv_cached(folder_data + 'export_PrecioMercadoSPOTDiario_buy.csv', delimiter=';',
+                                          header=0, usecols=['datetime', 'value'])  # import market prices [€/MWh]
+    data['market income'] = read_csv_cached(folder_data + 'export_PrecioMercadoSPOTDiario_sell.csv', delimiter=';',
+                                            header=0, usecols=['datetime', 'value'])  # import market prices [€/MWh]
+    # start_date = '01-01-2023'
+    # end_date = '31-12-2023'
+    # url_precio = 'https://www.esios.ree.es/es/analisis/600?vis=1&start_date=' + start_date + 'T00%3A00&end_date=' + end_date + 'T23%3A55&geoids=3&compare_start_date=22-07-2024T00%3A00&groupby=hour'  # €/MWh
+    # url_emisiones = 'https://www.esios.ree.es/es/analisis/10355?vis=1&start_date=' + start_date + 'T00%3A00&end_date=' + end_date + 'T23%3A55&compare_start_date=30-06-2024T00%3A00&groupby=hour'  # tCO2/MW
+    # url_demanda_nacional = 'https://www.esios.ree.es/es/analisis/1293?compare_indicators=&start_date=' + start_date + 'T00%3A00&geoids=&vis=1&end_date=' + end_date + 'T23%3A55&compare_start_date=22-07-2024T00%3A00&groupby=hour'  # MW
+    # url_generacion_renovable = 'https://www.esios.ree.es/es/analisis/10351?vis=1&start_date=' + start_date + 'T00%3A00&end_date=' + end_date + 'T23%3A55&compare_start_date=22-07-2024T00%3A00&groupby=hour'  # MW
+    data['national emissions'] = read_csv_cached(folder_data + 'export_CO2AsociadoGeneracionTReal_2024-07-23_10_21.csv',
+                                                 delimiter=';',
+                                                 header=0,
+                                                 usecols=['datetime', 'value'])  # emission factor [tCO2/MWh=kgCO2/kWh]
+    data['national demand'] = read_csv_cached(folder_data + 'export_DemandaReal_2024-07-23_10_30.csv', delimiter=';',
+                                              header=0, usecols=['datetime', 'value'])  # total demand [MWh]
+    data['national renewable generation'] = read_csv_cached(
+        folder_data + 'export_GeneracionTRealRenovable_2024-07-23_10_35.csv', delimiter=';',
+        header=0, usecols=['datetime', 'value'])  # total renewable generation [MWh]
+    return data
+
+
+@stage()
+def read_input_data(folder_data, esios=None):
+    '''
+    Reads all the input files of a client (client.xlsx, Time_data.xlsx, EV_stations.xlsx, peajes.xlsx and ESIOS CSVs)
+    :param folder_data: folder with the input files
+    :param esios: ``dict`` returned by ``read_esios_data`` to reuse the ESIOS series already read (optional).
+        If None, they are read from folder_data
+    :return: ``dict`` with a pandas DataFrame per sheet/file, keyed by the sheet name (or a short name for the CSVs)
+    '''
+    data = {}
+    data['General'] = read_excel_cached(folder_data+'client.xlsx', sheet_name='General', header=None, index_col=0)
+    #
+    data['Time data'] = read_excel_cached(folder_data + 'Time_data.xlsx', sheet_name='data', header=0,
+                                          usecols=['id', 'datetime', 'mes', 'dia', 'festivo'])  # import database with time names
+    #
+    data['Load'] = read_excel_cached(folder_data + 'client.xlsx', sheet_name='Load', header=1,
+                                     index_col=None)  # si queremos llamar por id --> index_col=0
+    data['Load TS'] = read_excel_cached(folder_data + 'client.xlsx', sheet_name='Load TS', header=1, index_col=None)
+    #
+    data['PV database'] = read_excel_cached(folder_data+'client.xlsx', sheet_name='PV database', header=0, index_col=0)  # import PV database
+    data['PV'] = read_excel_cached(folder_data+'client.xlsx', sheet_name='PV', header=1, index_col=None)  # importa PV client data
+    data['PV TS'] = read_excel_cached(folder_data + 'client.xlsx', sheet_name='PV TS', header=1, index_col=None)
+    #
+    data['Battery database'] = read_excel_cached(folder_data+'client.xlsx', sheet_name='Battery database', header=0, index_col=0)  # import battery database
+    data['BESS'] = read_excel_cached(folder_data+'client.xlsx', sheet_name='BESS', header=1, index_col=None)  # import BESS client data
+    #
+    data['Economic Constraints'] = read_excel_cached(folder_data+'client.xlsx', sheet_name='Economic Constraints', header=0, index_col=None)  # import economic constraints
+    #
+    data['EV'] = read_excel_cached(folder_data+'client.xlsx', sheet_name='EV', header=None,
+                                   index_col=0)  # import EV characteristics defined by the client
+    #
+    data['EV stations'] = read_excel_cached(folder_data + 'EV_stations.xlsx')
+    #
+    data['Grid'] = read_excel_cached(folder_data + 'client.xlsx', sheet_name='Grid', header=1, index_col=None)  # import Grid client data
+    data['hired_power Periods'] = read_excel_cached(folder_data + 'client.xlsx', sheet_name='hired_power Periods', header=1, index_col=None)
+    data['buy_price Periods'] = read_excel_cached(folder_data + 'client.xlsx', sheet_name='buy_price Periods', header=1, index_col=None)
+    data['sell_price Periods'] = read_excel_cached(folder_data + 'client.xlsx', sheet_name='sell_price Periods', header=1, index_col=None)
+    data['buy_price TS'] = read_excel_cached(folder_data + 'client.xlsx', sheet_name='buy_price TS', header=1, index_col=None)
+    data['sell_price TS'] = read_excel_cached(folder_data + 'client.xlsx', sheet_name='sell_price TS', header=1, index_col=None)
+    data['Grid_emissions TS'] = read_excel_cached(folder_data + 'client.xlsx', sheet_name='Grid_emissions TS', header=1, index_col=None)  # emission factor [tCO2/MWh]
+    data['Grid_renewables TS'] = read_excel_cached(folder_data + 'client.xlsx', sheet_name='Grid_renewables TS', header=1, index_col=None)  # renewables share [pu]
+    data['Power Cost'] = read_excel_cached(folder_data + 'peajes.xlsx', sheet_name='Power Cost', header=0,
+                                           index_col=0)  # import hired power costs at each tariff period (BOE)
+    data['Energy Cost'] = read_excel_cached(folder_data + 'peajes.xlsx', sheet_name='Energy Cost', header=0,
+                                            index_col=0)  # import energy access costs at each tariff period (BOE)
+    data['Power Penalizations'] = read_excel_cached(folder_data + 'peajes.xlsx', sheet_name='Power Penalizations', header=0,
+                                                    index_col=0)  # import costs and coefficients of excess power penalisation (BOE)
+    data.update(esios if esios is not None else read_esios_data(folder_data))  # market prices and national series
+    #
+    data['Bus'] = read_excel_cached(folder_data + 'client.xlsx', sheet_name='Bus', header=1, index_col=None)
+    data['Lines'] = read_excel_cached(folder_data + 'client.xlsx', sheet_name='Lines', header=1, index_col=None)
+    return data
+
+
+def apply_overrides(data, overrides):
+    '''
+    Modifies the input data with the values given by the user, without touching the input files.
+    Each key of ``overrides`` is the name of a sheet of ``data`` and its value can be:
+        - a pandas DataFrame, which replaces the whole sheet
+        - a ``dict`` {(row, column): value} with the cells to modify (row and column as read by pandas).
+          For the 'General' and 'EV' sheets (a single column of values) it is enough with {row: value}
+    Keys that are not sheets ('l_t', 'inc_t', 'bisiesto') are ignored here, see ``build_all_inputs``.
+    :param data: ``dict`` returned by ``read_input_data``
+    :param overrides: ``dict`` with the modifications
+    :return: ``dict`` with the modified data (the DataFrames that are modified are copied)
+    '''
+    data = dict(data)
+    for sheet, value in overrides.items():
+        if sheet in ('l_t', 'inc_t', 'bisiesto'):
+            continue
+        if sheet not in data:
+            print('Override ERROR: the sheet ' + str(sheet) + ' does not exist')
+            continue
+        if isinstance(value, pandas.DataFrame):
+            data[sheet] = value
+        else:
+            df = data[sheet].copy()
+            for key, v in value.items():
+                if isinstance(key, tuple):
+                    row, column = key
+                else:
+                    row, column = key, 1
+                if row not in df.index or column not in df.columns:
+                    print('Override ERROR: the row ' + str(row) + ' or the column ' + str(column)
+                          + ' does not exist in the sheet ' + str(sheet))
+                    continue
+                df.loc[row, column] = v
+            data[sheet] = df
+    return data
+
 
 ####################   Pre-process   ####################
 
-# General system --> mejorable
-from pre_processing.System import *
-System = SystemClass()
-System.full(general_client, l_t, inc_t, name_days, general_client[1]['CO2 emissions cost'])
-cambio_moneda = general_client[1]['Cash change'] # €/$
+# sheets with a time series (one row per hour), they are adapted to the time-step if inc_t != 1
+time_series_sheets = ['Load TS', 'PV TS', 'EV stations', 'buy_price TS', 'sell_price TS', 'Grid_emissions TS',
+                      'Grid_renewables TS', 'market cost', 'market income', 'national emissions', 'national demand',
+                      'national renewable generation']
 
-# Network
-from pre_processing.Network import *
-Sb = 100 * 1000  # Sb = 100 MVA
-PF_type = general_client[1]['Electric network power flow']  # economic_dispatch / DC-OPF
-#
-Buses = BusClass()
-for i_bus in range(import_buses['Num'].size):  # i_bus is the row of the Excel
-    Buses.add(import_buses['Num'][i_bus], import_buses['name'][i_bus], import_buses['type'][i_bus],
-              import_buses['vn_kv'][i_bus], import_buses['slack'][i_bus],
-              import_buses['v_pu_min'][i_bus], import_buses['v_pu_max'][i_bus])
-#
-Lines = LinesClass(Buses.id_list) # LinesClass(Buses.id)
-for i_line in range(import_lines['id'].size):  # i_line is the row of the Excel
-    to_bus = import_lines['to_bus'][i_line]
-    Vb = Buses.Vn[to_bus]
-    Zb = (Vb*10**3)**2 / (Sb*10**3)
-    Ib = (Sb*10**3) / (Vb*10**3)
-    Lines.add(import_lines['id'][i_line], import_lines['name'][i_line], import_lines['from_bus'][i_line],
-              import_lines['to_bus'][i_line],
-              import_lines['P_max (kW)'][i_line], import_lines['I_max (A)'][i_line],
-              import_lines['R (Ω)'][i_line], import_lines['X (Ω)'][i_line], import_lines['B (S)'][i_line],
-              Zb, Sb, Ib)
-Lines.global_system(Buses.id_list)
-#
-Network = NetworkClass(PF_type, Sb, Buses, Lines)
-
-# Demand
-from pre_processing.Loads import *
-Loads = DemandClass()
-for i_load in range(load_data['id'].size):  # i_load is the row of the Excel
-    id = load_data['id'][i_load]
-    Loads.add(id, load_data['name'][i_load], load_data['type'][i_load], load_data['Bus'][i_load], Buses.id_list,
-              System.l_t, load_data['Installed_power'][i_load], load_P_TS[id])
-Loads.total_buses(Buses.id_list, System.l_t)
-
-# PV
-from pre_processing.PV import *
-surface = general_client[1]['PV available surface']
-PV = PVClass(surface)
-for i_PV in range(PV_client['id'].size):
-    id = PV_client['id'][i_PV]
-    forecast_type = PV_client['forecast'][i_PV]
-    PVGIS_data = PV_client.drop(['id','name','model','Bus','sizing','existent','fix','incentives','forecast'],axis=1).loc[i_PV]
-    PV.add(id, PV_client['name'][i_PV], PV_client['Bus'][i_PV], Buses.id_list,
-           PV_client['model'][i_PV], PV_client['sizing'][i_PV],
-           PV_client['existent'][i_PV], PV_client['fix'][i_PV], PV_client['incentives'][i_PV], forecast_type,
-           PVGIS_data, bisiesto, PV_TS[id], PV_database, cambio_moneda, l_t)
-
-# BESS
-from pre_processing.Battery import *
-BESS = BatteryClass()
-for i_BESS in range(BESS_client['id'].size):
-    id = BESS_client['id'][i_BESS]
-    BESS.add(id, BESS_client['name'][i_BESS], BESS_client['Bus'][i_BESS], Buses.id_list,
-             BESS_client['model'][i_BESS], BESS_client['sizing'][i_BESS],
-             BESS_client['existent'][i_BESS], BESS_client['fix'][i_BESS], BESS_client['incentives'][i_BESS],
-             BESS_database, cambio_moneda, l_t, System.inc_t)
-
-# Economic constraints --> mejorable (ahora está igual que antes)
-from pre_processing.Economic_constraints import *
-economic_constraints = economic_constraints_list(economic_constraints_DataFrame)
+@stage('pre_process')
+def build_all_inputs(data_dir=folder_data, overrides=None, data=None, save_flexibility=False):
+    '''
+    Builds all the inputs of the optimization from the files of a client.
+    It has no side effects (except the cache of the input files), so it can be called several times in the same
+    interpreter, for several clients, or from a worker process.
+    :param data_dir: folder with the input files
+    :param overrides: ``dict`` with modifications of the inputs (see ``apply_overrides``),
+        plus the optional keys 'l_t' (``list`` of time-steps), 'inc_t' (time-step magnitude [h]) and 'bisiesto' (leap year).
+        With inc_t != 1 the hourly inputs are repeated (inc_t < 1) or averaged (inc_t > 1) to the time-step
+    :param data: ``dict`` returned by ``read_input_data`` to reuse the data already read (optional)
+    :param save_flexibility: if True, the EV flexibility inputs are saved in data_dir + 'Flexibilidad_pre-process/'
+    :return: AllInputsClass
+    '''
+    if overrides is None:
+        overrides = {}
+    if data is None:
+        data = read_input_data(data_dir)
+    if overrides:
+        data = apply_overrides(data, overrides)
 
-# Grid --> muy mejorable (está igual que antes) (solo puede tener 1 punto de conexión) (falta traducir)
-from pre_processing.Grid import *
-if Grid_client['id'].size == 0:
-    conected1_islanded0 = 0
-else:
-    conected1_islanded0 = 1
-Grid = GridClass(conected1_islanded0)
-for i_Grid in range(Grid_client['id'].size):
-    id = Grid_client['id'][i_Grid]
-    Grid.add(id, Grid_client['name'][i_Grid], Grid_client['Bus'][i_Grid], Buses.id_list,
-              Grid_client['Territory'][i_Grid], Grid_client['Tariff'][i_Grid], Grid_client['Meter type'][i_Grid],
-              Grid_client['Inyection to the grid'][i_Grid], Grid_client['PV power limit to inject'][i_Grid],
-              BOE_penalisations, BOE_cost_power,
-              l_t, System.inc_t, name_days,
-              hired_power_periods[id], Grid_client['Hard power limit'][i_Grid], Grid_client['Fix hired power'][i_Grid],
-              Grid_client['Buy energy price type'][i_Grid],
-              Grid_client['Fix buy energy price'][i_Grid], Grid_client['Buy energy price fee'][i_Grid],
-              buy_price_periods[id], buy_price_TS[id],
-              Grid_client['Sell energy price type'][i_Grid],
-              Grid_client['Fix sell energy price'][i_Grid], Grid_client['Sell energy price fee'][i_Grid],
-              sell_price_periods[id], sell_price_TS[id],
-              market_cost, market_income, BOE_cost_energy,
-              Grid_client['Emissions/renewables share source type'][i_Grid], grid_emissions_TS[id], grid_renewables_TS[id],
-              national_grid_emissions_DataFrame, national_renewable_generation_DataFrame, national_demand_DataFrame)
-
-# EV --> muy mejorable (está igual que antes)
-from pre_processing.EV import *
-EV = EVClass(client_EV.loc['EV (1: yes, 0: no)'][1], l_t)
-total_EV_immediate_load = {t: 0 for t in System.l_t}
-for i_load in Loads.id_list:
-    if Loads.type[i_load] == 'EV':
-        for t in System.l_t:
-            total_EV_immediate_load[t] = total_EV_immediate_load[t] + Loads.Pd[i_load,t]
-EV.add(l_t, inc_t, client_EV, total_EV_immediate_load, name_days, Buses.id_list)
-# save inputs of flexibility in excels
-directory_Flexibility = folder_data + 'Flexibilidad_pre-process/'
-save_EV_inputs(directory_Flexibility, EV.smart, l_t)
+    bisiesto = overrides.get('bisiesto', 0)
+    inc_t = overrides.get('inc_t', 1)  # time-step magnitude [h] (e.g. 0.25 for 15 minutes)
+    n_steps_year = int(round(len(data['Time data']) / inc_t))  # time-steps in the whole year
+    l_t = overrides.get('l_t', list(range(n_steps_year)))
+
+    # time series of the inputs are hourly, they are adapted to the time-step
+    if inc_t != 1:
+        data = dict(data)
+        for sheet in time_series_sheets:
+            data[sheet] = hourly_to_steps(data[sheet], inc_t, n_steps_year)
+
+    general_client = data['General']
+    name_days = steps_calendar(data['Time data'], max(n_steps_year, l_t[-1] + 1), inc_t)  # one row per time-step
+
+    # EV stations
+    ev_df = data['EV stations']
+    station_cols = [c for c in ev_df.columns if c.startswith('EV station')]
+    assert len(station_cols) == 4, f"Expected 4 EV station columns, found {len(station_cols)}"
+    T = len(l_t)  # 8760 hours
+    ev_df = ev_df.iloc[:T].reset_index(drop=True)
+    EV_profiles = {s: ev_df[s].to_numpy(dtype=float) for s in station_cols}
+
+    # Editable
+    Pmax_station = {s: 22.0 for s in station_cols}   # kW rated power per station
+    eta_ch  = {s: 0.95 for s in station_cols}        # charging efficiency
+    eta_dis = {s: 0.95 for s in station_cols}        # discharging efficiency
+
+    EV_Stations = {
+        "id_list": station_cols,
+        "profile": EV_profiles,
+        "Pmax": Pmax_station,
+        "eta_ch": eta_ch,
+        "eta_dis": eta_dis,
+    }
+
+    # General system --> mejorable
+    System = SystemClass()
+    System.full(general_client, l_t, inc_t, name_days, general_client[1]['CO2 emissions cost'])
+    cambio_moneda = general_client[1]['Cash change'] # €/$
+
+    # Network
+    import_buses = data['Bus']
+    import_lines = data['Lines']
+    Sb = 100 * 1000  # Sb = 100 MVA
+    PF_type = general_client[1]['Electric network power flow']  # economic_dispatch / DC-OPF / AC-OPF
+    AC_formulation = 'SOCP'  # SOCP (rotated cone relaxation) / SOCP_equality / exact
+    if 'AC power flow formulation' in general_client.index and isinstance(general_client[1]['AC power flow formulation'], str):
+        AC_formulation = general_client[1]['AC power flow formulation']
+    #
+    Buses = BusClass()
+    for i_bus in range(import_buses['Num'].size):  # i_bus is the row of the Excel
+        Buses.add(import_buses['Num'][i_bus], import_buses['name'][i_bus], import_buses['type'][i_bus],
+                  import_buses['vn_kv'][i_bus], import_buses['slack'][i_bus],
+                  import_buses['v_pu_min'][i_bus], import_buses['v_pu_max'][i_bus])
+    #
+    Lines = LinesClass(Buses.id_list) # LinesClass(Buses.id)
+    for i_line in range(import_lines['id'].size):  # i_line is the row of the Excel
+        to_bus = import_lines['to_bus'][i_line]
+        Vb = Buses.Vn[to_bus]
+        Zb = (Vb*10**3)**2 / (Sb*10**3)
+        Ib = (Sb*10**3) / (Vb*10**3)
+        Lines.add(import_lines['id'][i_line], import_lines['name'][i_line], import_lines['from_bus'][i_line],
+                  import_lines['to_bus'][i_line],
+                  import_lines['P_max (kW)'][i_line], import_lines['I_max (A)'][i_line],
+                  import_lines['R (Ω)'][i_line], import_lines['X (Ω)'][i_line], import_lines['B (S)'][i_line],
+                  Zb, Sb, Ib)
+    Lines.global_system(Buses.id_list)
+    #
+    Network = NetworkClass(PF_type, Sb, Buses, Lines, AC_formulation)
+
+    # Demand
+    load_data = data['Load']
+    load_P_TS = data['Load TS']
+    Loads = DemandClass()
+    for i_load in range(load_data['id'].size):  # i_load is the row of the Excel
+        id = load_data['id'][i_load]
+        Loads.add(id, load_data['name'][i_load], load_data['type'][i_load], load_data['Bus'][i_load], Buses.id_list,
+                  System.l_t, load_data['Installed_power'][i_load], load_P_TS[id])
+    Loads.total_buses(Buses.id_list, System.l_t)
+
+    # PV
+    PV_client = data['PV']
+    PV_TS = data['PV TS']
+    surface = general_client[1]['PV available surface']
+    PV = PVClass(surface)
+    PV_client_columns = ['id','name','model','Bus','sizing','existent','fix','incentives','forecast']
+    queries = [client_PVGIS_query(PV_client.drop(PV_client_columns, axis=1).loc[i_PV], bisiesto)
+               for i_PV in range(PV_client['id'].size) if PV_client['forecast'][i_PV] == 1]
+    if queries:  # all the PVGIS series are downloaded at the same time and saved in the cache, PV.add reads them from there
+        PVGIS_fetch_all(queries, PVGIS_cache_dir(data_dir))
+    for i_PV in range(PV_client['id'].size):
+        id = PV_client['id'][i_PV]
+        forecast_type = PV_client['forecast'][i_PV]
+        PVGIS_data = PV_client.drop(PV_client_columns, axis=1).loc[i_PV]
+        PV.add(id, PV_client['name'][i_PV], PV_client['Bus'][i_PV], Buses.id_list,
+               PV_client['model'][i_PV], PV_client['sizing'][i_PV],
+               PV_client['existent'][i_PV], PV_client['fix'][i_PV], PV_client['incentives'][i_PV], forecast_type,
+               PVGIS_data, bisiesto, PV_TS[id], data['PV database'], cambio_moneda, l_t, inc_t, data_dir)
 
+    # BESS
+    BESS_client = data['BESS']
+    BESS = BatteryClass()
+    for i_BESS in range(BESS_client['id'].size):
+        id = BESS_client['id'][i_BESS]
+        BESS.add(id, BESS_client['name'][i_BESS], BESS_client['Bus'][i_BESS], Buses.id_list,
+                 BESS_client['model'][i_BESS], BESS_client['sizing'][i_BESS],
+                 BESS_client['existent'][i_BESS], BESS_client['fix'][i_BESS], BESS_client['incentives'][i_BESS],
+                 data['Battery database'], cambio_moneda, l_t, System.inc_t)
 
+    # Economic constraints --> mejorable (ahora está igual que antes)
+    economic_constraints = economic_constraints_list(data['Economic Constraints'])
 
+    # Grid --> muy mejorable (está igual que antes) (solo puede tener 1 punto de conexión) (falta traducir)
+    Grid_client = data['Grid']
+    if Grid_client['id'].size == 0:
+        conected1_islanded0 = 0
+    else:
+        conected1_islanded0 = 1
+    Grid = GridClass(conected1_islanded0)
+    for i_Grid in range(Grid_client['id'].size):
+        id = Grid_client['id'][i_Grid]
+        Grid.add(id, Grid_client['name'][i_Grid], Grid_client['Bus'][i_Grid], Buses.id_list,
+                 Grid_client['Territory'][i_Grid], Grid_client['Tariff'][i_Grid], Grid_client['Meter type'][i_Grid],
+                 Grid_client['Inyection to the grid'][i_Grid], Grid_client['PV power limit to inject'][i_Grid],
+                 data['Power Penalizations'], data['Power Cost'],
+                 l_t, System.inc_t, name_days,
+                 data['hired_power Periods'][id], Grid_client['Hard power limit'][i_Grid], Grid_client['Fix hired power'][i_Grid],
+                 Grid_client['Buy energy price type'][i_Grid],
+                 Grid_client['Fix buy energy price'][i_Grid], Grid_client['Buy energy price fee'][i_Grid],
+                 data['buy_price Periods'][id], data['buy_price TS'][id],
+                 Grid_client['Sell energy price type'][i_Grid],
+                 Grid_client['Fix sell energy price'][i_Grid], Grid_client['Sell energy price fee'][i_Grid],
+                 data['sell_price Periods'][id], data['sell_price TS'][id],
+                 data['market cost'], data['market income'], data['Energy Cost'],
+                 Grid_client['Emissions/renewables share source type'][i_Grid], data['Grid_emissions TS'][id], data['Grid_renewables TS'][id],
+                 data['national emissions'], data['national renewable generation'], data['national demand'])
 
-from pre_processing.System import AllInputsClass
+    # EV --> muy mejorable (está igual que antes)
+    client_EV = data['EV']
+    EV = EVClass(client_EV.loc['EV (1: yes, 0: no)'][1], l_t)
+    total_EV_immediate_load = dict(zip(System.l_t, Loads.Pd_EV_total.values.sum(axis=0).tolist()))
+    EV.add(l_t, inc_t, client_EV, total_EV_immediate_load, name_days, Buses.id_list)
+    # save inputs of flexibility in excels
+    if save_flexibility:
+        directory_Flexibility = data_dir + 'Flexibilidad_pre-process/'
+        save_EV_inputs(directory_Flexibility, EV.smart, l_t)
 
-AllInputs = AllInputsClass(System, Loads, PV, BESS, Grid,
-                           EV, economic_constraints,
-                           Network, EV_Stations)
+    AllInputs = AllInputsClass(System, Loads, PV, BESS, Grid,
+                               EV, economic_constraints,
+                               Network, EV_Stations)
+    return AllInputs
 
-print("\n--- Checking AllInputs data ---")
-print("EV station IDs:", AllInputs.EV_Stations["id_list"])
-print("First 5 values for EV station 1:", AllInputs.EV_Stations["profile"]["EV station 1 [kWh]"][:5])
-print("Pmax for station 1:", AllInputs.EV_Stations["Pmax"]["EV station 1 [kWh]"])
-print("--------------------------------\n")
 
+def __getattr__(name):
+    '''
+    Keeps working ``from pre_process import AllInputs``: the inputs of the default folder are built (only once)
+    the first time they are requested, instead of at import time
+    '''
+    if name == 'AllInputs':
+        AllInputs = build_all_inputs(folder_data, save_flexibility=True)
+        print("\n--- Checking AllInputs data ---")
+        print("EV station IDs:", AllInputs.EV_Stations["id_list"])
+        print("First 5 values for EV station 1:", AllInputs.EV_Stations["profile"]["EV station 1 [kWh]"][:5])
+        print("Pmax for station 1:", AllInputs.EV_Stations["Pmax"]["EV station 1 [kWh]"])
+        print("--------------------------------\n")
+        globals()['AllInputs'] = AllInputs
+        return AllInputs
+    raise AttributeError("module 'pre_process' has no attribute " + repr(name))
 
 
 ####################   ...   ####################
 
 
+if __name__ == '__main__':
+    AllInputs = build_all_inputs(folder_data, save_flexibility=True)
@@ -1,10 +1,15 @@
+import numpy
 import pandas
+from pre_processing.Time_series import TimeSeriesClass
 '''
 Comentarios:
     - podemos introducir tantos modelos de BESS como queramos
     - podemos hacer sizing y/o existente para un mismo modelo
     - alternativamente a realizar el sizing se puede fijar el numero de BESS a añadir. Si esto no se fija, debe de ser nan --> math.isnan(BESS.fix_u[id]) = True
     - si no se introduce ningun modelo, no se considera
+    - el envejecimiento por calendario es lineal por defecto. Opcionalmente, la base de datos puede tener las filas
+      'Calendar aging model' (linear, sqrt o power) y 'Calendar aging exponent' (solo para power)
+    - la 'Calendar aging (anual)' de la base de datos es la pérdida del primer año
 '''
 
 
@@ -45,7 +50,9 @@ class BatteryClass:
         self.dischEff = {}  # Discharging efficiency [pu]
         self.throughput = {}  # throughput of 1 battery [kWh]
         self.calendar_aging_anual = {}  # annual degradation due to calendar aging [% of the storage capacity]
-        self.SOCmax_hourly = {}  # maximum SOC at each time-step considering calendar aging [pu]
+        self.calendar_aging_model = {}  # shape of the calendar fade: linear, sqrt or power (see calendar_fade_models)
+        self.calendar_aging_exponent = {}  # exponent of the power calendar fade (fade ~ years**exponent)
+        self.SOCmax_hourly = TimeSeriesClass()  # maximum SOC at each time-step considering calendar aging [pu]
         # self.roundtripEff = component_DataFrame.loc['Roudtrip eff.']  # roundtrip efficiency [%]
         #
         self.existent_C = {}  # storage capacity [kWh] of the battery already in the system
@@ -53,6 +60,7 @@ class BatteryClass:
         self.existent_Pn_disch = {}  # maximum discharging power [kW] of the battery already in the system
         #
         self.SOCini = {}  # state of charge at the start of an islanded period for the islandable analysis
+        self.SOC_start = {}  # state of charge before the first time-step [kWh] (rolling horizon). If empty: cyclic operation
 
     def add(self, id, name, bus, l_bus, model, sizing, existent, fix, incentives, database_DataFrame, cash_exchange, l_t, inc_t):
         '''
@@ -107,8 +115,11 @@ class BatteryClass:
         self.dischEff[id] = component_DataFrame.loc['Discharge eff.']/100  # Discharging efficiency [pu]
         self.throughput[id] = component_DataFrame.loc['Throughput']  # throughput of 1 battery [kWh]
         self.calendar_aging_anual[id] = component_DataFrame.loc['Calendar aging (anual)']/100  # annual degradation due to calendar aging [% of the storage capacity]
-        SOCmax_hourly = SOCmax_aging(self.SOCmax[id], self.calendar_aging_anual[id], l_t, inc_t)
-        self.SOCmax_hourly.update({(id, t): SOCmax_hourly[t] for t in l_t})
+        aging_model = component_DataFrame.get('Calendar aging model', 'linear')
+        self.calendar_aging_model[id] = aging_model if isinstance(aging_model, str) else 'linear'  # shape of the calendar fade
+        self.calendar_aging_exponent[id] = component_DataFrame.get('Calendar aging exponent', float('nan'))  # exponent of the power calendar fade
+        self.SOCmax_hourly.add(id, SOCmax_aging(self.SOCmax[id], self.calendar_aging_anual[id], l_t, inc_t,
+                                                self.calendar_aging_model[id], self.calendar_aging_exponent[id]), l_t)
         #
         self.existent_C[id] = self.existent_u[id]*self.capacity_kWh[id]  # storage capacity [kWh] of the battery already in the system
         self.existent_Pn_char[id] = self.existent_u[id]*self.maxCharge_kW[id]  # maximum charging power [kW] of the battery already in the system
@@ -125,12 +136,44 @@ class BatteryClass:
         self.id_list = []  # list with all PV system numbers
 
 
-def SOCmax_aging(SOCmax, calendar_aging_anual, l_t, inc_t):
-    hourly_aging = calendar_aging_anual/100 /365 /24 * inc_t
-    SOCmax_hourly = {}
-    for t in l_t:
-        if t== l_t[0]:
-            SOCmax_hourly[t] = SOCmax
-        else:
-            SOCmax_hourly[t] = SOCmax_hourly[t-1] - SOCmax * hourly_aging
-    return SOCmax_hourly
\ No newline at end of file
+calendar_fade_models = {  # calendar fade after 'years' years [pu of the fade of the first year]
+    'linear': lambda years, exponent: years,
+    'sqrt': lambda years, exponent: numpy.sqrt(years),  # calendar fade proportional to the square root of time
+    'power': lambda years, exponent: years ** exponent,
+}
+
+
+def calendar_fade(years, model='linear', exponent=float('nan')):
+    '''
+    Calendar fade curve (normalised to 1 after one year)
+    :param years: time since the beginning of the horizon [years], number or numpy array
+    :param model: linear, sqrt or power
+    :param exponent: exponent of the power model
+    :return: fade at each time (same shape as years)
+    '''
+    if model not in calendar_fade_models:
+        print('BESS WARNING: calendar aging model ' + str(model) + ' not defined, linear aging is used. Options: ' + ', '.join(calendar_fade_models))
+        model = 'linear'
+    if model == 'power' and not exponent > 0:
+        print('BESS WARNING: the power calendar aging model needs a positive Calendar aging exponent, linear aging is used')
+        model = 'linear'
+    return calendar_fade_models[model](numpy.asarray(years, dtype=float), exponent)
+
+
+def SOCmax_aging(SOCmax, calendar_aging_anual, l_t, inc_t, model='linear', exponent=float('nan')):
+    '''
+    Maximum SOC at each time-step considering calendar aging, computed for all time-steps at once. The horizon can be
+    longer than one year (time-steps after 8760 h are in the following years of operation).
+    SOCmax and calendar_aging_anual can be arrays (one value per battery), then one row is returned per battery.
+    :param SOCmax: maximum state of charge at the beginning of the horizon [pu]
+    :param calendar_aging_anual: annual degradation due to calendar aging
+    :param l_t: ``list`` containing all time-steps
+    :param inc_t: time-step magnitude [h]
+    :param model: shape of the calendar fade: linear, sqrt or power (see calendar_fade_models)
+    :param exponent: exponent of the power model
+    :return: numpy array with the maximum SOC at each time-step [pu] (n_batteries, len(l_t)) if arrays are given
+    '''
+    years = numpy.asarray(l_t, dtype=float) * inc_t / (365 * 24)  # time since the beginning of the horizon [years]
+    SOCmax = numpy.asarray(SOCmax, dtype=float)[..., numpy.newaxis]
+    aging = numpy.asarray(calendar_aging_anual, dtype=float)[..., numpy.newaxis] / 100
+    return SOCmax - SOCmax * aging * calendar_fade(years, model, exponent)
@@ -292,7 +292,7 @@ def EV_immediate(l_t, inc_t, EV_inputs, nombre_dias):
     n_dias = (l_t[-1] + 1) * inc_t / 24
     D_EV = {}
     for dia in range(int(n_dias)):
-        t = dia * 24 / inc_t
+        t = int(round(dia * 24 / inc_t))  # primer time-step del dia
         # si el dia del instante t pertenece al conjunto de dias en los que hay EVs,
         # la demanda es la calculada anteriormente, sino es 0
         if dias_EV(EV_inputs.days_repeat, nombre_dias['dia'][t]):
@@ -353,24 +353,23 @@ def flexibilidad_EV(l_t, inc_t, client_EV2, nombre_dias):
         Cost_evMev = {}  # flexibility cost
         nn_Mev = {}
         n2_Mev = 0
+        steps_dia = int(round(24 / inc_t))  # time-steps in a day
+        t_array = numpy.asarray(l_t)
         for Mev in list(range(n_Mev)):
             nn_Mev[Mev] = 0
+            D_EV_dia = numpy.asarray(D_EV_dia_matrix[Mev+1])
             for dia in range(int(n_dias)):
-                if dias_EV(client_EV2.days_repeat, nombre_dias['dia'][dia * 24]):
-                    tt=0
+                if dias_EV(client_EV2.days_repeat, nombre_dias['dia'][dia * steps_dia]):
                     # cada vehiculo cada dia, representa una carga flexible independiente
-                    for t in l_t:
-                        # cada vehiculo electrico solo estará disponible entre la hora de llegada y de salida de cada dia
-                        if (t - 24*dia >= t_llegada[Mev]) and (t - 24*dia <= t_llegada[Mev] + t_aparcado[Mev]):
-                            K_evMev_t[n2_Mev, t] = 1
-                        else:
-                            K_evMev_t[n2_Mev, t] = 0
-                        # el dia que se debe aplicar el perfil baseline calculado
-                        if t >= dia*24 and t < (dia+1)*24:
-                            D_evMev_t[n2_Mev, t] = D_EV_dia_matrix[Mev+1][tt]
-                            tt = tt+1
-                        else:
-                            D_evMev_t[n2_Mev, t] = 0
+                    t_dia = t_array - steps_dia * dia  # time-step dentro del dia
+                    # cada vehiculo electrico solo estará disponible entre la hora de llegada y de salida de cada dia
+                    K = ((t_dia >= t_llegada[Mev]) & (t_dia <= t_llegada[Mev] + t_aparcado[Mev])).astype(int)
+                    # el dia que se debe aplicar el perfil baseline calculado
+                    D = numpy.zeros(t_array.size)
+                    en_dia = (t_dia >= 0) & (t_dia < steps_dia)
+                    D[en_dia] = D_EV_dia[t_dia[en_dia]]
+                    K_evMev_t.update({(n2_Mev, t): k for t, k in zip(l_t, K.tolist())})
+                    D_evMev_t.update({(n2_Mev, t): d for t, d in zip(l_t, D.tolist())})
                     Cost_evMev[n2_Mev] = client_EV2.flexibility_cost
                     nn_Mev[Mev] = nn_Mev[Mev] + 1
                     n2_Mev = n2_Mev + 1  # numero total de cargas flexibles EV independientes
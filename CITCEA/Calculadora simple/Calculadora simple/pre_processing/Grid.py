@@ -1,9 +1,108 @@
 '''
 Name of the territory, name of the month, day of the week, and holidays are in Spanish.
-The tariff periods for both energy and power are only defined for inc_t = 1 for now.
+The tariff periods for both energy and power are defined for any time-step inc_t that divides the day
+(name_days must have one row per time-step, see steps_calendar in System.py).
 '''
 
 import math
+import numpy
+import pandas
+from pre_processing.Time_series import TimeSeriesClass
+
+
+# Temporadas eléctricas (tarifas de 6 periodos) de cada territorio según el mes
+seasons_6P = {
+    'Canarias': {'Enero': 'media', 'Febrero': 'media', 'Marzo': 'media', 'Abril': 'baja', 'Mayo': 'baja', 'Junio': 'baja',
+                 'Julio': 'alta', 'Agosto': 'alta', 'Septiembre': 'alta', 'Octubre': 'alta', 'Noviembre': 'media-alta', 'Diciembre': 'media-alta'},
+    'Baleares': {'Enero': 'media', 'Febrero': 'media', 'Marzo': 'baja', 'Abril': 'baja', 'Mayo': 'media-alta', 'Junio': 'alta',
+                 'Julio': 'alta', 'Agosto': 'alta', 'Septiembre': 'alta', 'Octubre': 'media-alta', 'Noviembre': 'baja', 'Diciembre': 'media'},
+    'Ceuta': {'Enero': 'alta', 'Febrero': 'alta', 'Marzo': 'media', 'Abril': 'baja', 'Mayo': 'baja', 'Junio': 'baja',
+              'Julio': 'media-alta', 'Agosto': 'alta', 'Septiembre': 'alta', 'Octubre': 'media-alta', 'Noviembre': 'media', 'Diciembre': 'media'},
+    'Melilla': {'Enero': 'alta', 'Febrero': 'media-alta', 'Marzo': 'baja', 'Abril': 'baja', 'Mayo': 'baja', 'Junio': 'media',
+                'Julio': 'alta', 'Agosto': 'alta', 'Septiembre': 'alta', 'Octubre': 'media', 'Noviembre': 'media', 'Diciembre': 'media-alta'},
+    'Peninsula': {'Enero': 'alta', 'Febrero': 'alta', 'Marzo': 'media-alta', 'Abril': 'baja', 'Mayo': 'baja', 'Junio': 'media',
+                  'Julio': 'alta', 'Agosto': 'media', 'Septiembre': 'media', 'Octubre': 'baja', 'Noviembre': 'media-alta', 'Diciembre': 'alta'},
+}
+
+# Tabla de periodos: tariff_table[n_periods][territory] = (hours, periods_season, period_holiday)
+#   hours: hora final (no incluida) de cada tramo horario de un día laborable [h]
+#   periods_season: periodo (1 a 6) de cada tramo horario para cada temporada ('todas' si no depende de la temporada)
+#   period_holiday: periodo de los fines de semana y festivos (todo el día)
+# Los territorios que no aparecen usan 'Peninsula'. Para añadir una tarifa solo hay que añadir una entrada.
+tariff_table = {
+    2: {'Peninsula': ([8, 24], {'todas': [2, 1]}, 2)},
+    3: {'Peninsula': ([8, 10, 14, 18, 22, 24], {'todas': [3, 2, 1, 2, 1, 2]}, 3),
+        'Ceuta': ([8, 11, 15, 19, 23, 24], {'todas': [3, 2, 1, 2, 1, 2]}, 3),
+        'Melilla': ([8, 11, 15, 19, 23, 24], {'todas': [3, 2, 1, 2, 1, 2]}, 3)},
+    6: {'Peninsula': ([8, 9, 14, 18, 22, 24], {'baja': [6, 5, 4, 5, 4, 5], 'media': [6, 4, 3, 4, 3, 4],
+                                              'media-alta': [6, 3, 2, 3, 2, 3], 'alta': [6, 2, 1, 2, 1, 2]}, 6),
+        'Canarias': ([8, 10, 15, 18, 22, 24], {'baja': [6, 5, 4, 5, 4, 5], 'media': [6, 4, 2, 4, 2, 4],
+                                              'media-alta': [6, 3, 2, 3, 2, 3], 'alta': [6, 3, 1, 3, 1, 3]}, 6),
+        'Baleares': ([8, 10, 15, 18, 22, 24], {'baja': [6, 5, 4, 5, 4, 5], 'media': [6, 4, 3, 4, 3, 4],
+                                              'media-alta': [6, 3, 2, 3, 2, 3], 'alta': [6, 2, 1, 2, 1, 2]}, 6),
+        'Ceuta': ([8, 10, 15, 19, 23, 24], {'baja': [6, 5, 3, 5, 3, 5], 'media': [6, 4, 2, 4, 2, 4],
+                                           'media-alta': [6, 3, 2, 3, 2, 3], 'alta': [6, 4, 1, 4, 1, 4]}, 6),
+        'Melilla': ([8, 10, 15, 19, 23, 24], {'baja': [6, 5, 4, 5, 4, 5], 'media': [6, 4, 3, 4, 3, 4],
+                                             'media-alta': [6, 3, 2, 3, 2, 3], 'alta': [6, 2, 1, 2, 1, 2]}, 6)},
+}
+
+
+def array_periods(tariff_periods, territory, l_t, inc_t, name_days):
+    '''
+    This function translates the Spanish regulation of tariff periods to a dense array, using the table ``tariff_table``
+    applied at once to the whole calendar
+    :param tariff_periods: 2 or 3 or 6 // indicates the number of periors that the corresponding power or energy term considers
+    :param territory: 'Peninsula' or 'Canarias' or 'Baleares' or 'Ceuta' or 'Melilla'
+    :param l_t: ``list`` containing all time-steps
+    :param inc_t: time-step magnitude [h]
+    :param name_days: DataFrame with the month, day of the week and (national) holiday in each time-step
+        // filas = l_t
+        // column 'mes': 'Enero', 'Febrero', ...
+        // column 'dia': 'Lunes', 'Martes', ...
+        // column 'festivo': 'Sí', 'No'
+    :return: numpy array (6, len(l_t)) of int8 that indicates the tariff period N to be applied in each time-step of l_t. 1: yes, 0: no
+    '''
+    t = numpy.asarray(l_t, dtype=numpy.int64)
+    K = numpy.zeros((6, t.size), dtype=numpy.int8)
+    if tariff_periods not in tariff_table:  # other tariffs can be added
+        return K
+    table = tariff_table[tariff_periods]
+    hours, periods_season, period_holiday = table.get(territory, table['Peninsula'])
+
+    steps_day = int(round(24 / inc_t))
+    t_previous = t - t % steps_day  # t at which the previous day ends
+    hour = (t % steps_day) * inc_t  # hour of the day
+
+    # tipo de día y temporada: se toman del primer time-step de cada día
+    dia = name_days['dia'].to_numpy()[t_previous]
+    festivo = name_days['festivo'].to_numpy()[t_previous]
+    is_holiday = (dia == 'Sábado') | (dia == 'Domingo') | (festivo == 'Sí')
+    if 'todas' in periods_season:
+        season = numpy.full(t.size, 'todas', dtype=object)
+    else:
+        month_to_season = seasons_6P.get(territory, seasons_6P['Peninsula'])
+        season = pandas.Series(name_days['mes'].to_numpy()[t_previous]).map(month_to_season).to_numpy()
+
+    # periodo de cada time-step (1 a 6)
+    segment = numpy.searchsorted(numpy.asarray(hours), hour, side='right')  # tramo horario del día
+    period = numpy.full(t.size, period_holiday, dtype=numpy.int8)
+    for s, periods in periods_season.items():
+        working = (season == s) & ~is_holiday
+        period[working] = numpy.asarray(periods, dtype=numpy.int8)[segment[working]]
+
+    K[period - 1, numpy.arange(t.size)] = 1
+    return K
+
+
+def dict_from_array_periods(K, l_t):
+    '''
+    Dictionary view (Pyomo initializer) of the tariff periods array
+    :param K: numpy array (6, len(l_t)) returned by ``array_periods``
+    :param l_t: ``list`` containing all time-steps
+    :return: dictionary that indicates the tariff period N to be applied in the time-step t. dict_K[N,t]=value. 1: yes, 0: no
+    '''
+    K_list = K.tolist()
+    return {(N, t): K_list[N][j] for N in range(K.shape[0]) for j, t in enumerate(l_t)}
 
 
 def dict_periods(tariff_periods, territory, l_t, inc_t, name_days):
@@ -20,509 +119,7 @@ def dict_periods(tariff_periods, territory, l_t, inc_t, name_days):
         // column 'festivo': 'Sí', 'No'
     :return: dictionary that indicates the tariff period N to be applied in the time-step t. dict_K[N,t]=value. 1: yes, 0: no
     '''
-
-    # -------------------------------------------------------------------------------------------- #
-
-    if tariff_periods == 2:
-        dict_K_peak = {}  # punta
-        dict_K_offpeak = {}  # valle
-
-        n_days = (l_t[-1] + 1) * inc_t / 24
-        for dia in range(int(n_days)):  # day from 0 to 364
-            t_previous = dia * 24 / inc_t  # t at which the previous day ends
-            if name_days['dia'][t_previous] == 'Sábado' or name_days['dia'][t_previous] == 'Domingo':
-                # current day is weekend
-                for t in range(int(24 / inc_t)):
-                    dict_K_offpeak[t_previous + t] = 1
-                    dict_K_peak[t_previous + t] = 0
-            elif name_days['festivo'][t_previous] == 'Sí':  # the current day is holiday
-                for t in range(int(24 / inc_t)):
-                    dict_K_offpeak[t_previous + t] = 1
-                    dict_K_peak[t_previous + t] = 0
-            else:  # Monday to Friday and working days
-                for t in range(int(24/inc_t)):
-                    if t < 8/inc_t:  # for the current day, before 8 in the morning
-                        dict_K_offpeak[t_previous + t] = 1
-                        dict_K_peak[t_previous + t] = 0
-                    else:
-                        dict_K_offpeak[t_previous + t] = 0
-                        dict_K_peak[t_previous + t] = 1
-        dict_K_P1 = dict_K_peak
-        dict_K_P2 = dict_K_offpeak
-        dict_K_P3 = {t: 0 for t in l_t}
-        dict_K_P4 = {t: 0 for t in l_t}
-        dict_K_P5 = {t: 0 for t in l_t}
-        dict_K_P6 = {t: 0 for t in l_t}
-
-    # -------------------------------------------------------------------------------------------- #
-
-    elif tariff_periods == 3:
-        dict_K_peak = {}
-        dict_K_llano = {}
-        dict_K_offpeak = {}
-
-        n_days = (l_t[-1] + 1) * inc_t / 24
-        for dia in range(int(n_days)):  # day from 0 to 364
-            t_previous = dia * 24 / inc_t  # t at which the previous day ends
-            if name_days['dia'][t_previous] == 'Sábado' or name_days['dia'][t_previous] == 'Domingo':
-                # current day is weekend
-                for t in range(int(24/inc_t)):
-                    dict_K_peak[t_previous + t] = 0
-                    dict_K_llano[t_previous + t] = 0
-                    dict_K_offpeak[t_previous + t] = 1
-            elif name_days['festivo'][t_previous] == 'Sí':  # the current day is holiday
-                for t in range(int(24/inc_t)):
-                    dict_K_peak[t_previous + t] = 0
-                    dict_K_llano[t_previous + t] = 0
-                    dict_K_offpeak[t_previous + t] = 1
-            else:  # Monday to Friday and working days
-                if territory == 'Ceuta' or territory == 'Melilla':
-                    for t in range(int(24/inc_t)):
-                        if t < 8/inc_t:  # for the current day, before 8 in the morning
-                            dict_K_peak[t_previous + t] = 0
-                            dict_K_llano[t_previous + t] = 0
-                            dict_K_offpeak[t_previous + t] = 1
-                        elif t < 11/inc_t:
-                            dict_K_peak[t_previous + t] = 0
-                            dict_K_llano[t_previous + t] = 1
-                            dict_K_offpeak[t_previous + t] = 0
-                        elif t < 15/inc_t:
-                            dict_K_peak[t_previous + t] = 1
-                            dict_K_llano[t_previous + t] = 0
-                            dict_K_offpeak[t_previous + t] = 0
-                        elif t < 19/inc_t:
-                            dict_K_peak[t_previous + t] = 0
-                            dict_K_llano[t_previous + t] = 1
-                            dict_K_offpeak[t_previous + t] = 0
-                        elif t < 23/inc_t:
-                            dict_K_peak[t_previous + t] = 1
-                            dict_K_llano[t_previous + t] = 0
-                            dict_K_offpeak[t_previous + t] = 0
-                        else:
-                            dict_K_peak[t_previous + t] = 0
-                            dict_K_llano[t_previous + t] = 1
-                            dict_K_offpeak[t_previous + t] = 0
-                else:  # territory == 'Peninsula' or territorio == 'Baleares' or territorio == 'Canarias':
-                    for t in range(int(24 / inc_t)):
-                        if t < 8 / inc_t:  # for the current day, before 8 in the morning
-                            dict_K_peak[t_previous + t] = 0
-                            dict_K_llano[t_previous + t] = 0
-                            dict_K_offpeak[t_previous + t] = 1
-                        elif t < 10 / inc_t:
-                            dict_K_peak[t_previous + t] = 0
-                            dict_K_llano[t_previous + t] = 1
-                            dict_K_offpeak[t_previous + t] = 0
-                        elif t < 14 / inc_t:
-                            dict_K_peak[t_previous + t] = 1
-                            dict_K_llano[t_previous + t] = 0
-                            dict_K_offpeak[t_previous + t] = 0
-                        elif t < 18 / inc_t:
-                            dict_K_peak[t_previous + t] = 0
-                            dict_K_llano[t_previous + t] = 1
-                            dict_K_offpeak[t_previous + t] = 0
-                        elif t < 22 / inc_t:
-                            dict_K_peak[t_previous + t] = 1
-                            dict_K_llano[t_previous + t] = 0
-                            dict_K_offpeak[t_previous + t] = 0
-                        else:
-                            dict_K_peak[t_previous + t] = 0
-                            dict_K_llano[t_previous + t] = 1
-                            dict_K_offpeak[t_previous + t] = 0
-
-        dict_K_P1 = dict_K_peak
-        dict_K_P2 = dict_K_llano
-        dict_K_P3 = dict_K_offpeak
-        dict_K_P4 = {t: 0 for t in l_t}
-        dict_K_P5 = {t: 0 for t in l_t}
-        dict_K_P6 = {t: 0 for t in l_t}
-        ...
-
-    # -------------------------------------------------------------------------------------------- #
-
-    elif tariff_periods == 6:
-        dict_temporada = {}
-
-        if territory == 'Canarias':
-            for t in l_t:
-                mes_actual = name_days['mes'][t]
-                if mes_actual == 'Enero' or mes_actual == 'Febrero' or mes_actual == 'Marzo':
-                    dict_temporada[t] = 'media'
-                elif mes_actual == 'Abril' or mes_actual == 'Mayo' or mes_actual == 'Junio':
-                    dict_temporada[t] = 'baja'
-                elif mes_actual == 'Noviembre' or mes_actual == 'Diciembre':
-                    dict_temporada[t] = 'media-alta'
-                else:  # Julio, Agosto, Septiembre, Octubre
-                    dict_temporada[t] = 'alta'
-        elif territory == 'Baleares':
-            for t in l_t:
-                mes_actual = name_days['mes'][t]
-                if mes_actual == 'Marzo' or mes_actual == 'Abril' or mes_actual == 'Noviembre':
-                    dict_temporada[t] = 'baja'
-                elif mes_actual == 'Diciembre' or mes_actual == 'Enero' or mes_actual == 'Febrero':
-                    dict_temporada[t] = 'media'
-                elif mes_actual == 'Mayo' or mes_actual == 'Octubre':
-                    dict_temporada[t] = 'media-alta'
-                else:   # Junio, Julio, Agosto, Septiembre
-                    dict_temporada[t] = 'alta'
-        elif territory == 'Ceuta':
-            for t in l_t:
-                mes_actual = name_days['mes'][t]
-                if mes_actual == 'Abril' or mes_actual == 'Mayo' or mes_actual == 'Junio':
-                    dict_temporada[t] = 'baja'
-                elif mes_actual == 'Marzo' or mes_actual == 'Noviembre' or mes_actual == 'Diciembre':
-                    dict_temporada[t] = 'media'
-                elif mes_actual == 'Julio' or mes_actual == 'Octubre':
-                    dict_temporada[t] = 'media-alta'
-                else:  # Enero, Febrero, Agosto, Septiembre
-                    dict_temporada[t] = 'alta'
-        elif territory == 'Melilla':
-            for t in l_t:
-                mes_actual = name_days['mes'][t]
-                if mes_actual == 'Marzo' or mes_actual == 'Abril' or mes_actual == 'Mayo':
-                    dict_temporada[t] = 'baja'
-                elif mes_actual == 'Junio' or mes_actual == 'Octubre' or mes_actual == 'Noviembre':
-                    dict_temporada[t] = 'media'
-                elif mes_actual == 'Febrero' or mes_actual == 'Diciembre':
-                    dict_temporada[t] = 'media-alta'
-                else:  # Enero, Julio, Agosto, Septiembre
-                    dict_temporada[t] = 'alta'
-        else:  # territorio == 'Peninsula'
-            for t in l_t:
-                mes_actual = name_days['mes'][t]
-                if mes_actual == 'Abril' or mes_actual == 'Mayo' or mes_actual == 'Octubre':
-                    dict_temporada[t] = 'baja'
-                elif mes_actual == 'Junio' or mes_actual == 'Agosto' or mes_actual == 'Septiembre':
-                    dict_temporada[t] = 'media'
-                elif mes_actual == 'Marzo' or mes_actual == 'Noviembre':
-                    dict_temporada[t] = 'media-alta'
-                else:  # Enero, Febrero, Julio, Diciembre
-                    dict_temporada[t] = 'alta'
-
-        dict_K_P1 = {t: 0 for t in l_t}
-        dict_K_P2 = {t: 0 for t in l_t}
-        dict_K_P3 = {t: 0 for t in l_t}
-        dict_K_P4 = {t: 0 for t in l_t}
-        dict_K_P5 = {t: 0 for t in l_t}
-        dict_K_P6 = {t: 0 for t in l_t}
-
-        n_days = (l_t[-1] + 1) * inc_t / 24
-        for dia in range(int(n_days)):  # day from 0 to 364
-            t_previous = dia * 24 / inc_t
-            if name_days['dia'][t_previous] == 'Sábado' or name_days['dia'][t_previous] == 'Domingo':
-                for t in range(int(24 / inc_t)):
-                    dict_K_P6[t_previous + t] = 1
-            elif name_days['festivo'][t_previous] == 'Sí':  # holidays
-                for t in range(int(24 / inc_t)):
-                    dict_K_P6[t_previous + t] = 1
-            else:  # Monday to Friday and working days
-                if territory == 'Canarias':
-                    if dict_temporada[t_previous] == 'baja':
-                        for t in range(int(24 / inc_t)):
-                            if t < 8/inc_t:
-                                dict_K_P6[t_previous + t] = 1
-                            elif t < 10/inc_t:
-                                dict_K_P5[t_previous + t] = 1
-                            elif t < 15/inc_t:
-                                dict_K_P4[t_previous + t] = 1
-                            elif t < 18/inc_t:
-                                dict_K_P5[t_previous + t] = 1
-                            elif t < 22/inc_t:
-                                dict_K_P4[t_previous + t] = 1
-                            else:
-                                dict_K_P5[t_previous + t] = 1
-                    elif dict_temporada[t_previous] == 'media':
-                        for t in range(int(24 / inc_t)):
-                            if t < 8/inc_t:
-                                dict_K_P6[t_previous + t] = 1
-                            elif t < 10/inc_t:
-                                dict_K_P4[t_previous + t] = 1
-                            elif t < 15/inc_t:
-                                dict_K_P2[t_previous + t] = 1
-                            elif t < 18/inc_t:
-                                dict_K_P4[t_previous + t] = 1
-                            elif t < 22/inc_t:
-                                dict_K_P2[t_previous + t] = 1
-                            else:
-                                dict_K_P4[t_previous + t] = 1
-                    elif dict_temporada[t_previous] == 'media-alta':
-                        for t in range(int(24 / inc_t)):
-                            if t < 8/inc_t:
-                                dict_K_P6[t_previous + t] = 1
-                            elif t < 10/inc_t:
-                                dict_K_P3[t_previous + t] = 1
-                            elif t < 15/inc_t:
-                                dict_K_P2[t_previous + t] = 1
-                            elif t < 18/inc_t:
-                                dict_K_P3[t_previous + t] = 1
-                            elif t < 22/inc_t:
-                                dict_K_P2[t_previous + t] = 1
-                            else:
-                                dict_K_P3[t_previous + t] = 1
-                    else:  # alta
-                        for t in range(int(24 / inc_t)):
-                            if t < 8/inc_t:
-                                dict_K_P6[t_previous + t] = 1
-                            elif t < 10/inc_t:
-                                dict_K_P3[t_previous + t] = 1
-                            elif t < 15/inc_t:
-                                dict_K_P1[t_previous + t] = 1
-                            elif t < 18/inc_t:
-                                dict_K_P3[t_previous + t] = 1
-                            elif t < 22/inc_t:
-                                dict_K_P1[t_previous + t] = 1
-                            else:
-                                dict_K_P3[t_previous + t] = 1
-                elif territory == 'Baleares':
-                    if dict_temporada[t_previous] == 'baja':
-                        for t in range(int(24 / inc_t)):
-                            if t < 8/inc_t:
-                                dict_K_P6[t_previous + t] = 1
-                            elif t < 10/inc_t:
-                                dict_K_P5[t_previous + t] = 1
-                            elif t < 15/inc_t:
-                                dict_K_P4[t_previous + t] = 1
-                            elif t < 18/inc_t:
-                                dict_K_P5[t_previous + t] = 1
-                            elif t < 22/inc_t:
-                                dict_K_P4[t_previous + t] = 1
-                            else:
-                                dict_K_P5[t_previous + t] = 1
-                    elif dict_temporada[t_previous] == 'media':
-                        for t in range(int(24 / inc_t)):
-                            if t < 8/inc_t:
-                                dict_K_P6[t_previous + t] = 1
-                            elif t < 10/inc_t:
-                                dict_K_P4[t_previous + t] = 1
-                            elif t < 15/inc_t:
-                                dict_K_P3[t_previous + t] = 1
-                            elif t < 18/inc_t:
-                                dict_K_P4[t_previous + t] = 1
-                            elif t < 22/inc_t:
-                                dict_K_P3[t_previous + t] = 1
-                            else:
-                                dict_K_P4[t_previous + t] = 1
-                    elif dict_temporada[t_previous] == 'media-alta':
-                        for t in range(int(24 / inc_t)):
-                            if t < 8/inc_t:
-                                dict_K_P6[t_previous + t] = 1
-                            elif t < 10/inc_t:
-                                dict_K_P3[t_previous + t] = 1
-                            elif t < 15/inc_t:
-                                dict_K_P2[t_previous + t] = 1
-                            elif t < 18/inc_t:
-                                dict_K_P3[t_previous + t] = 1
-                            elif t < 22/inc_t:
-                                dict_K_P2[t_previous + t] = 1
-                            else:
-                                dict_K_P3[t_previous + t] = 1
-                    else:  # alta
-                        for t in range(int(24 / inc_t)):
-                            if t < 8/inc_t:
-                                dict_K_P6[t_previous + t] = 1
-                            elif t < 10/inc_t:
-                                dict_K_P2[t_previous + t] = 1
-                            elif t < 15/inc_t:
-                                dict_K_P1[t_previous + t] = 1
-                            elif t < 18/inc_t:
-                                dict_K_P2[t_previous + t] = 1
-                            elif t < 22/inc_t:
-                                dict_K_P1[t_previous + t] = 1
-                            else:
-                                dict_K_P2[t_previous + t] = 1
-                elif territory == 'Ceuta':
-                    if dict_temporada[t_previous] == 'baja':
-                        for t in range(int(24 / inc_t)):
-                            if t < 8/inc_t:
-                                dict_K_P6[t_previous + t] = 1
-                            elif t < 10/inc_t:
-                                dict_K_P5[t_previous + t] = 1
-                            elif t < 15/inc_t:
-                                dict_K_P3[t_previous + t] = 1
-                            elif t < 19/inc_t:
-                                dict_K_P5[t_previous + t] = 1
-                            elif t < 23/inc_t:
-                                dict_K_P3[t_previous + t] = 1
-                            else:
-                                dict_K_P5[t_previous + t] = 1
-                    elif dict_temporada[t_previous] == 'media':
-                        for t in range(int(24 / inc_t)):
-                            if t < 8/inc_t:
-                                dict_K_P6[t_previous + t] = 1
-                            elif t < 10/inc_t:
-                                dict_K_P4[t_previous + t] = 1
-                            elif t < 15/inc_t:
-                                dict_K_P2[t_previous + t] = 1
-                            elif t < 19/inc_t:
-                                dict_K_P4[t_previous + t] = 1
-                            elif t < 23/inc_t:
-                                dict_K_P2[t_previous + t] = 1
-                            else:
-                                dict_K_P4[t_previous + t] = 1
-                    elif dict_temporada[t_previous] == 'media-alta':
-                        for t in range(int(24 / inc_t)):
-                            if t < 8/inc_t:
-                                dict_K_P6[t_previous + t] = 1
-                            elif t < 10/inc_t:
-                                dict_K_P3[t_previous + t] = 1
-                            elif t < 15/inc_t:
-                                dict_K_P2[t_previous + t] = 1
-                            elif t < 19/inc_t:
-                                dict_K_P3[t_previous + t] = 1
-                            elif t < 23/inc_t:
-                                dict_K_P2[t_previous + t] = 1
-                            else:
-                                dict_K_P3[t_previous + t] = 1
-                    else:  # alta
-                        for t in range(int(24 / inc_t)):
-                            if t < 8/inc_t:
-                                dict_K_P6[t_previous + t] = 1
-                            elif t < 10/inc_t:
-                                dict_K_P4[t_previous + t] = 1
-                            elif t < 15/inc_t:
-                                dict_K_P1[t_previous + t] = 1
-                            elif t < 19/inc_t:
-                                dict_K_P4[t_previous + t] = 1
-                            elif t < 23/inc_t:
-                                dict_K_P1[t_previous + t] = 1
-                            else:
-                                dict_K_P4[t_previous + t] = 1
-                elif territory == 'Melilla':
-                    if dict_temporada[t_previous] == 'baja':
-                        for t in range(int(24 / inc_t)):
-                            if t < 8/inc_t:
-                                dict_K_P6[t_previous + t] = 1
-                            elif t < 10/inc_t:
-                                dict_K_P5[t_previous + t] = 1
-                            elif t < 15/inc_t:
-                                dict_K_P4[t_previous + t] = 1
-                            elif t < 19/inc_t:
-                                dict_K_P5[t_previous + t] = 1
-                            elif t < 23/inc_t:
-                                dict_K_P4[t_previous + t] = 1
-                            else:
-                                dict_K_P5[t_previous + t] = 1
-                    elif dict_temporada[t_previous] == 'media':
-                        for t in range(int(24 / inc_t)):
-                            if t < 8/inc_t:
-                                dict_K_P6[t_previous + t] = 1
-                            elif t < 10/inc_t:
-                                dict_K_P4[t_previous + t] = 1
-                            elif t < 15/inc_t:
-                                dict_K_P3[t_previous + t] = 1
-                            elif t < 19/inc_t:
-                                dict_K_P4[t_previous + t] = 1
-                            elif t < 23/inc_t:
-                                dict_K_P3[t_previous + t] = 1
-                            else:
-                                dict_K_P4[t_previous + t] = 1
-                    elif dict_temporada[t_previous] == 'media-alta':
-                        for t in range(int(24 / inc_t)):
-                            if t < 8/inc_t:
-                                dict_K_P6[t_previous + t] = 1
-                            elif t < 10/inc_t:
-                                dict_K_P3[t_previous + t] = 1
-                            elif t < 15/inc_t:
-                                dict_K_P2[t_previous + t] = 1
-                            elif t < 19/inc_t:
-                                dict_K_P3[t_previous + t] = 1
-                            elif t < 23/inc_t:
-                                dict_K_P2[t_previous + t] = 1
-                            else:
-                                dict_K_P3[t_previous + t] = 1
-                    else:  # alta
-                        for t in range(int(24 / inc_t)):
-                            if t < 8/inc_t:
-                                dict_K_P6[t_previous + t] = 1
-                            elif t < 10/inc_t:
-                                dict_K_P2[t_previous + t] = 1
-                            elif t < 15/inc_t:
-                                dict_K_P1[t_previous + t] = 1
-                            elif t < 19/inc_t:
-                                dict_K_P2[t_previous + t] = 1
-                            elif t < 23/inc_t:
-                                dict_K_P1[t_previous + t] = 1
-                            else:
-                                dict_K_P2[t_previous + t] = 1
-                else:  # Peninsula
-                    if dict_temporada[t_previous] == 'baja':
-                        for t in range(int(24 / inc_t)):
-                            if t < 8/inc_t:
-                                dict_K_P6[t_previous + t] = 1
-                            elif t < 9/inc_t:
-                                dict_K_P5[t_previous + t] = 1
-                            elif t < 14/inc_t:
-                                dict_K_P4[t_previous + t] = 1
-                            elif t < 18/inc_t:
-                                dict_K_P5[t_previous + t] = 1
-                            elif t < 22/inc_t:
-                                dict_K_P4[t_previous + t] = 1
-                            else:
-                                dict_K_P5[t_previous + t] = 1
-                    elif dict_temporada[t_previous] == 'media':
-                        for t in range(int(24 / inc_t)):
-                            if t < 8/inc_t:
-                                dict_K_P6[t_previous + t] = 1
-                            elif t < 9/inc_t:
-                                dict_K_P4[t_previous + t] = 1
-                            elif t < 14/inc_t:
-                                dict_K_P3[t_previous + t] = 1
-                            elif t < 18/inc_t:
-                                dict_K_P4[t_previous + t] = 1
-                            elif t < 22/inc_t:
-                                dict_K_P3[t_previous + t] = 1
-                            else:
-                                dict_K_P4[t_previous + t] = 1
-                    elif dict_temporada[t_previous] == 'media-alta':
-                        for t in range(int(24 / inc_t)):
-                            if t < 8/inc_t:
-                                dict_K_P6[t_previous + t] = 1
-                            elif t < 9/inc_t:
-                                dict_K_P3[t_previous + t] = 1
-                            elif t < 14/inc_t:
-                                dict_K_P2[t_previous + t] = 1
-                            elif t < 18/inc_t:
-                                dict_K_P3[t_previous + t] = 1
-                            elif t < 22/inc_t:
-                                dict_K_P2[t_previous + t] = 1
-                            else:
-                                dict_K_P3[t_previous + t] = 1
-                    else:  # alta
-                        for t in range(int(24 / inc_t)):
-                            if t < 8/inc_t:
-                                dict_K_P6[t_previous + t] = 1
-                            elif t < 9/inc_t:
-                                dict_K_P2[t_previous + t] = 1
-                            elif t < 14/inc_t:
-                                dict_K_P1[t_previous + t] = 1
-                            elif t < 18/inc_t:
-                                dict_K_P2[t_previous + t] = 1
-                            elif t < 22/inc_t:
-                                dict_K_P1[t_previous + t] = 1
-                            else:
-                                dict_K_P2[t_previous + t] = 1
-
-    # -------------------------------------------------------------------------------------------- #
-
-    else:  # other tariffs can be added
-        dict_K_P1 = {t: 0 for t in l_t}
-        dict_K_P2 = {t: 0 for t in l_t}
-        dict_K_P3 = {t: 0 for t in l_t}
-        dict_K_P4 = {t: 0 for t in l_t}
-        dict_K_P5 = {t: 0 for t in l_t}
-        dict_K_P6 = {t: 0 for t in l_t}
-
-    dict_K_P = {}
-    for t in l_t:
-        dict_K_P[(0, t)] = dict_K_P1[t]
-        dict_K_P[(1, t)] = dict_K_P2[t]
-        dict_K_P[(2, t)] = dict_K_P3[t]
-        dict_K_P[(3, t)] = dict_K_P4[t]
-        dict_K_P[(4, t)] = dict_K_P5[t]
-        dict_K_P[(5, t)] = dict_K_P6[t]
-
-    # -------------------------------------------------------------------------------------------- #
-
-    return dict_K_P
+    return dict_from_array_periods(array_periods(tariff_periods, territory, l_t, inc_t, name_days), l_t)
 
 
 ##################################################################################
@@ -676,7 +273,7 @@ class GridClass:
 
         # Hired power term cost (Spanish regulation, BOE)
         self.Cost_power = {}  # price of the hired power term [€/(kW*year)]
-        self.K_P = {}  # dictionary that indicates the tariff period N to be applied in the time-step t. dict_K_P[N,t]=value. 1: yes, 0: no
+        self.K_P = TimeSeriesClass()  # time series that indicates the tariff period N to be applied in the time-step t. K_P[id,N,t]=value. 1: yes, 0: no
 
         # Fix hired power
         self.fix = {}  # 0:no, 1:yes
@@ -684,17 +281,21 @@ class GridClass:
         self.Hired_power = {}  # hired power currently [kW]
 
         # Energy cost (defined by the client or market + BOE access term)
-        self.K_E = {}  # dictionary that indicates the tariff period N to be applied (energy access cost) in the time-step t. dict_K_E[N,t]=value. 1: yes, 0: no
-        self.Cost_P_buy_grid = {}  # dictionary with the total energy buy price for each time-step [€/kWh]
-        self.Cost_P_sell_grid = {}  # dictionary with the total energy sell price for each time-step [€/kWh]
+        self.K_E = TimeSeriesClass()  # time series that indicates the tariff period N to be applied (energy access cost) in the time-step t. K_E[id,N,t]=value. 1: yes, 0: no
+        self.Cost_P_buy_grid = TimeSeriesClass()  # total energy buy price for each time-step [€/kWh]. Cost_P_buy_grid[id, t]
+        self.Cost_P_sell_grid = TimeSeriesClass()  # total energy sell price for each time-step [€/kWh]. Cost_P_sell_grid[id, t]
 
         # Emissions and renewables
-        self.emissions = {}  # emission factor [tCO2/MWh=kgCO2/kWh]
-        self.renewable_factor = {}
+        self.emissions = TimeSeriesClass()  # emission factor [tCO2/MWh=kgCO2/kWh]. emissions[id, t]
+        self.renewable_factor = TimeSeriesClass()  # renewable share of the grid [pu]. renewable_factor[id, t]
 
         # Optional, grid hard power limit [kW]
         self.hard_Plim = {}
 
+        # State from previous time windows (rolling horizon). If empty: no lower limit
+        self.P_excessmax_ini = {}  # maximum power excess already registered at each tariff period and month [kW]. P_excessmax_ini[id,N,month]
+        self.P_hired_ini = {}  # hired power already required at each tariff period [kW]. P_hired_ini[id,N]
+
 
     def add(self, id, name, bus, l_bus,
             territory, tariff, meter_type,
@@ -787,7 +388,7 @@ class GridClass:
         self.Cost_power.update({(id, N): costPotencia_DataFrame.loc['Cost P1':'Cost P6'][tariff][N] for N in self.l_N})  # price of the hired power term [€/(kW*year)]
         self.Hired_power.update({(id, N): hired_power_DataFrame[N] for N in self.l_N})  # hired power currently [kW]
         K_P = dict_K_P_hired(tariff, territory, l_t, inc_t, name_days)  # dictionary that indicates the tariff period N to be applied in the time-step t. dict_K_P[N,t]=value. 1: yes, 0: no
-        self.K_P.update(add_dict_key(K_P, id))  # dict_K_P[id,N,t]
+        self.K_P.add_dict(id, K_P, l_t)  # K_P[id,N,t]
 
         # Fix hired power
         self.fix[id] = fix_hired_power  # 0:no, 1:yes
@@ -795,23 +396,24 @@ class GridClass:
 
         # Energy cost (defined by the client or market + BOE access term)
         K_E = dict_K_Energia(tariff, territory, l_t, inc_t, name_days)  # dictionary that indicates the tariff period N to be applied (energy access cost) in the time-step t. dict_K_E[N,t]=value. 1: yes, 0: no
-        self.K_E.update(add_dict_key(K_E, id))  # dict_K_E[id,N,t]
+        self.K_E.add_dict(id, K_E, l_t)  # K_E[id,N,t]
         Cost_P_buy_grid = Cost_buy_grid(tariff, buy_price_type, buy_price_fix, buy_price_periods_DataFrame,
                                         market_cost['value'], buy_price_fee, buy_price_DataFrame, BOE_cost_energy, l_t,
                                         K_E)  # dictionary with the total energy buy price for each time-step [€/kWh]
-        self.Cost_P_buy_grid.update(add_dict_key(Cost_P_buy_grid, id))
+        self.Cost_P_buy_grid.add_dict(id, Cost_P_buy_grid, l_t)
         Cost_P_sell_grid = Cost_venta_grid(sell_price_type, sell_price_fix, sell_price_periods_DataFrame,
                                            market_income['value'], sell_price_fee, sell_price_DataFrame, l_t,
                                            K_E)  # dictionary with the total energy sell price for each time-step [€/kWh]
-        self.Cost_P_sell_grid.update(add_dict_key(Cost_P_sell_grid, id))
+        self.Cost_P_sell_grid.add_dict(id, Cost_P_sell_grid, l_t)
 
         # Emissions and renewables
         if emissions_renewables_type == 1: # spanish national grid
-            self.emissions.update({(id,t): national_grid_emissions_DataFrame['value'][t] for t in l_t})  # emission factor [tCO2/MWh=kgCO2/kWh]
-            self.renewable_factor.update({(id,t): national_renewable_generation_DataFrame['value'][t] / national_demand_DataFrame['value'][t] for t in l_t})
+            self.emissions.add(id, national_grid_emissions_DataFrame['value'].loc[l_t].to_numpy(dtype=float), l_t)  # emission factor [tCO2/MWh=kgCO2/kWh]
+            self.renewable_factor.add(id, national_renewable_generation_DataFrame['value'].loc[l_t].to_numpy(dtype=float)
+                                      / national_demand_DataFrame['value'].loc[l_t].to_numpy(dtype=float), l_t)
         else: # from time-series
-            self.emissions.update({(id, t): grid_emissions_DataFrame[t] for t in l_t})
-            self.renewable_factor.update({(id, t): grid_renewables_DataFrame[t] for t in l_t})
+            self.emissions.add(id, [grid_emissions_DataFrame[t] for t in l_t], l_t)
+            self.renewable_factor.add(id, [grid_renewables_DataFrame[t] for t in l_t], l_t)
 
         # Optional, grid hard power limit [kW]
         if math.isnan(hard_power_limit):
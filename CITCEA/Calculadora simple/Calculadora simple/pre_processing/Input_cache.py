@@ -0,0 +1,120 @@
+import hashlib
+import json
+import os
+import pickle
+import pandas
+
+
+####################   Binary cache of the input files   ####################
+
+# Cada hoja de Excel (o CSV) leída se guarda como un pickle binario de pandas en la carpeta de caché.
+# La clave de cada entrada es: hash del contenido del fichero + nombre de la hoja + argumentos de lectura.
+# Si el libro de Excel cambia, su hash cambia y solo se vuelven a leer las hojas de ese libro.
+
+cache_folder_name = '.cache/'  # sub-folder of the data folder where the cache is stored
+cache_enabled = True  # global switch, if False all reads go directly to pandas
+_file_hash_memory = {}  # {path: (mtime, size, hash)} to avoid hashing the same file more than once per process
+
+
+def file_hash(path):
+    '''
+    Content hash of a file. The hash is only recalculated if the modification time or the size of the file change
+    :param path: path of the file
+    :return: ``str`` with the sha1 hash of the file content
+    '''
+    stat = os.stat(path)
+    key = os.path.abspath(path)
+    if key in _file_hash_memory:
+        mtime, size, digest = _file_hash_memory[key]
+        if mtime == stat.st_mtime_ns and size == stat.st_size:
+            return digest
+    h = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    digest = h.hexdigest()
+    _file_hash_memory[key] = (stat.st_mtime_ns, stat.st_size, digest)
+    return digest
+
+
+def cache_key(path, reader, read_kwargs):
+    '''
+    Key of a cache entry
+    :param path: path of the source file
+    :param reader: 'excel' or 'csv'
+    :param read_kwargs: ``dict`` with the arguments given to pandas (sheet_name, header, index_col, usecols...)
+    :return: ``str`` used as file name of the cache entry
+    '''
+    kwargs = json.dumps(read_kwargs, sort_keys=True, default=str)
+    h = hashlib.sha1((file_hash(path) + reader + kwargs + pandas.__version__).encode()).hexdigest()
+    name = os.path.splitext(os.path.basename(path))[0]
+    sheet = str(read_kwargs.get('sheet_name', ''))
+    return ''.join(c if c.isalnum() else '_' for c in name + '_' + sheet) + '_' + h[:16] + '.pkl'
+
+
+def _read_cached(path, reader, read_function, cache_folder, read_kwargs):
+    '''
+    Returns the DataFrame from the cache if the entry exists, otherwise reads it with pandas and saves it
+    :param path: path of the source file
+    :param reader: 'excel' or 'csv'
+    :param read_function: pandas function used to read the file
+    :param cache_folder: folder of the cache. If None, it is the sub-folder ``cache_folder_name`` of the file folder
+    :param read_kwargs: ``dict`` with the arguments given to pandas
+    :return: pandas DataFrame
+    '''
+    if not cache_enabled:
+        return read_function(path, **read_kwargs)
+    if cache_folder is None:
+        cache_folder = os.path.join(os.path.dirname(path), cache_folder_name)
+    entry = os.path.join(cache_folder, cache_key(path, reader, read_kwargs))
+    if os.path.isfile(entry):
+        try:
+            with open(entry, 'rb') as f:
+                return pickle.load(f)
+        except Exception:  # entrada corrupta o de otra versión --> se vuelve a leer
+            pass
+    data = read_function(path, **read_kwargs)
+    os.makedirs(cache_folder, exist_ok=True)
+    tmp = entry + '.' + str(os.getpid()) + '.tmp'  # escritura atómica, varios procesos pueden compartir la caché
+    with open(tmp, 'wb') as f:
+        pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp, entry)
+    return data
+
+
+def read_excel_cached(path, cache_folder=None, **read_kwargs):
+    '''
+    Same as ``pandas.read_excel`` but the parsed sheet is stored in a binary cache keyed by the content of the workbook
+    :param path: path of the Excel file
+    :param cache_folder: folder of the cache (optional)
+    :param read_kwargs: arguments of ``pandas.read_excel`` (sheet_name, header, index_col, usecols...)
+    :return: pandas DataFrame
+    '''
+    return _read_cached(path, 'excel', pandas.read_excel, cache_folder, read_kwargs)
+
+
+def read_csv_cached(path, cache_folder=None, **read_kwargs):
+    '''
+    Same as ``pandas.read_csv`` but the parsed file is stored in a binary cache keyed by its content
+    :param path: path of the CSV file
+    :param cache_folder: folder of the cache (optional)
+    :param read_kwargs: arguments of ``pandas.read_csv`` (delimiter, header, usecols...)
+    :return: pandas DataFrame
+    '''
+    return _read_cached(path, 'csv', pandas.read_csv, cache_folder, read_kwargs)
+
+
+def clear_cache(folder_data):
+    '''
+    Removes all the entries of the cache of a data folder
+    :param folder_data: folder with the input files
+    :return: number of removed entries
+    '''
+    cache_folder = os.path.join(folder_data, cache_folder_name)
+    n = 0
+    if os.path.isdir(cache_folder):
+        for name in os.listdir(cache_folder):
+            if name.endswith('.pkl'):
+                os.remove(os.path.join(cache_folder, name))
+                n = n + 1
+    return n
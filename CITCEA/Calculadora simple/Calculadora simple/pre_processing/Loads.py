@@ -1,42 +1,49 @@
+import numpy
+from pre_processing.Time_series import TimeSeriesClass
+
 
 class DemandClass:  # de moment només base i EV immediate charging
     def __init__(self):
         self.id = 0  # number of the load
         self.id_list = []  # list with all loads numbers
         self.name = {}  # name of the load
-        self.pos_bus = {}  # binary that indicates the bus to which the load is connected --> [id_load,id_bus]=1
+        self.bus = {}  # bus to which the load is connected
         self.type = {}  # type of load (AC, DC, EV)
-        self.Pd = {}  # Active power demand of the load [kW]
+        self.Pd = TimeSeriesClass()  # active power demand of each load [kW]. Pd[id, t]
 
     def add(self, id, name, type, bus, l_bus, l_t, P_installed, P_demand_DataFrame):
         self.id = id  # number of the load
         self.id_list.append(id)  # list with all loads numbers
         self.name[id] = name  # name of the load
-        pos = {(self.id, bus_aux): 0 for bus_aux in l_bus}
-        pos[self.id, bus] = 1
-        self.pos_bus.update(pos)
+        self.bus[id] = bus  # bus to which the load is connected
         self.type[id] = type  # type of load (AC, DC, EV)
-        new_Pd = {(self.id, t): P_demand_DataFrame[t] * P_installed for t in l_t}
-        self.Pd.update(new_Pd)
+        self.Pd.add(id, P_demand_DataFrame.loc[l_t].to_numpy(dtype=float) * P_installed, l_t)
 
+    def incidence(self, l_bus):
+        '''
+        Bus-load incidence matrix: incidence[bus, load] = 1 if the load is connected to the bus (one 1 per column)
+        :param l_bus: ``list`` containing all buses id
+        :return: numpy array (n_bus, n_loads)
+        '''
+        position = {bus: n for n, bus in enumerate(l_bus)}
+        incidence = numpy.zeros((len(l_bus), len(self.id_list)))
+        incidence[[position[self.bus[id_load]] for id_load in self.id_list], numpy.arange(len(self.id_list))] = 1
+        return incidence
 
     def total_buses(self, l_bus, l_t):
-        Pd_total = {(bus, t): 0 for t in l_t for bus in l_bus}
-        Pd_EV_total = {(bus, t): 0 for t in l_t for bus in l_bus}
-        Pd_total_inclEV = {(bus, t): 0 for t in l_t for bus in l_bus}
-        for id_load in self.id_list:
-            for bus in l_bus:
-                for t in l_t:
-                    Pd_total_inclEV[bus, t] = Pd_total_inclEV[bus, t] + self.Pd[id_load, t] * self.pos_bus[id_load, bus]
-            if self.type[id_load] == 'EV':
-                for bus in l_bus:
-                    for t in l_t:
-                        Pd_EV_total[bus,t] = Pd_EV_total[bus,t] + self.Pd[id_load, t] * self.pos_bus[id_load, bus]
-            else:
-                for bus in l_bus:
-                    for t in l_t:
-                        Pd_total[bus, t] = Pd_total[bus, t] + self.Pd[id_load, t] * self.pos_bus[id_load, bus]
-        self.Pd_total = Pd_total  # Active power demand of the bus [kW]
-        self.Pd_EV_total = Pd_EV_total  # Active power demand of EV of the bus [kW]
-        self.Pd_total_inclEV = Pd_total_inclEV  # Active power demand of the bus including EV [kW]
+        '''
+        Active power demand of each bus: total, EV and including EV
+        The profiles of the loads are a (n_loads, T) array, so the demand of the buses is the product of the incidence
+        matrix by the profiles
+        :param l_bus: ``list`` containing all buses id
+        :param l_t: ``list`` containing all time-steps
+        '''
+        Pd_array = self.Pd.values if self.id_list else numpy.zeros((0, len(l_t)))
+        incidence = self.incidence(l_bus)
+        is_EV = numpy.array([self.type[id_load] == 'EV' for id_load in self.id_list], dtype=bool)
 
+        Pd_EV = incidence[:, is_EV] @ Pd_array[is_EV]
+        Pd_total = incidence[:, ~is_EV] @ Pd_array[~is_EV]
+        self.Pd_total = TimeSeriesClass.from_array(l_bus, l_t, Pd_total)  # Active power demand of the bus [kW]
+        self.Pd_EV_total = TimeSeriesClass.from_array(l_bus, l_t, Pd_EV)  # Active power demand of EV of the bus [kW]
+        self.Pd_total_inclEV = TimeSeriesClass.from_array(l_bus, l_t, Pd_total + Pd_EV)  # Active power demand of the bus including EV [kW]
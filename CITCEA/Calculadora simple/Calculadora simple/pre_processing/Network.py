@@ -1,3 +1,6 @@
+import numpy
+from pre_processing.Time_series import TimeSeriesClass
+
 
 class BusClass:
     def __init__(self):
@@ -33,6 +36,7 @@ class LinesClass:  # -----------------------------------------------------------
         self.r_line = {}  # resistence [Ω]
         self.x_line = {}  # reactance [Ω]
         self.b_line = {}  # impedance [S]
+        self.B_line = {}  # susceptance of the line used in the DC power flow [pu], imaginary part of -1/z
 
         self.z_matrix = {(bus1, bus2): 0 for bus1 in l_bus for bus2 in l_bus}  # impedance [pu] --> Z[bus1,bus2] = R+Xj
         self.y_earth_matrix = {(bus1, bus2): 0 for bus1 in l_bus for bus2 in l_bus}  # earth admitance [pu] --> Y[bus1,bus2] = Bj
@@ -54,6 +58,7 @@ class LinesClass:  # -----------------------------------------------------------
         self.r_line[id] = R/Zb  # resistence [pu]
         self.x_line[id] = X/Zb  # reactance [pu]
         self.b_line[id] = B*Zb  # susceptance [pu]
+        self.B_line[id] = (-1 / (self.r_line[id] + 1j * self.x_line[id])).imag  # [pu]
 
         self.z_matrix[from_bus, to_bus] = self.r_line[id] + 1j * self.x_line[id]
         # z_mod[bus1, bus2] = m.sqrt(z[bus1, bus2].real ** 2 + z[bus1, bus2].imag ** 2)
@@ -76,10 +81,63 @@ class LinesClass:  # -----------------------------------------------------------
                 self.G_bus[bus1, bus2] = self.y_bus[bus1, bus2].real
                 self.B_bus[bus1, bus2] = self.y_bus[bus1, bus2].imag
 
+    def lines_of_bus(self, l_bus):
+        '''
+        Lines connected to each bus
+        :param l_bus: ``list`` containing all buses id
+        :return: two dictionaries {bus: [lines that start at the bus]}, {bus: [lines that end at the bus]}
+        '''
+        lines_from = {bus: [] for bus in l_bus}
+        lines_to = {bus: [] for bus in l_bus}
+        for line in self.id_list:
+            lines_from[self.from_bus[line]].append(line)
+            lines_to[self.to_bus[line]].append(line)
+        return lines_from, lines_to
+
+    def edges(self):
+        '''
+        Pairs of connected buses, each pair only once and with the orientation of its first line (from_bus, to_bus)
+        :return: ``list`` of tuples (bus1, bus2)
+        '''
+        edges = {}
+        for line in self.id_list:
+            bus1, bus2 = self.from_bus[line], self.to_bus[line]
+            if (bus1, bus2) not in edges and (bus2, bus1) not in edges:
+                edges[bus1, bus2] = line
+        return list(edges)
+
+    def branches(self):
+        '''
+        Pairs of connected buses in both directions, used to index the AC power flows (the flow from bus1 to bus2 is
+        not the opposite of the one from bus2 to bus1 because of the losses)
+        :return: ``list`` of tuples (bus1, bus2)
+        '''
+        branches = []
+        for bus1, bus2 in self.edges():
+            branches.append((bus1, bus2))
+            branches.append((bus2, bus1))
+        return branches
+
+    def Pline_bus_pairs(self, Pline, l_t):
+        '''
+        Converts the power flow of each line into the flow between each pair of connected buses
+        :param Pline: TimeSeriesClass with the power flow of each line {(line, t): value}, positive from from_bus to to_bus
+        :param l_t: ``list`` containing all time-steps
+        :return: TimeSeriesClass {(bus1, bus2, t): value}, with the power flowing from bus1 to bus2 (both directions)
+        '''
+        Pline_bus = {}
+        for line in self.id_list:
+            bus1, bus2 = self.from_bus[line], self.to_bus[line]
+            flow = Pline.array(line, l_t)
+            Pline_bus[bus1, bus2] = Pline_bus.get((bus1, bus2), 0) + flow
+            Pline_bus[bus2, bus1] = Pline_bus.get((bus2, bus1), 0) - flow
+        return TimeSeriesClass.from_array(list(Pline_bus), l_t, numpy.array(list(Pline_bus.values())))
+
 
 class NetworkClass:
-    def __init__(self, PF_type, Sb, Buses, Lines):
-        self.PF_type = PF_type  # economic_dispatch / DC-OPF
+    def __init__(self, PF_type, Sb, Buses, Lines, AC_formulation='SOCP'):
+        self.PF_type = PF_type  # economic_dispatch / DC-OPF / AC-OPF
+        self.AC_formulation = AC_formulation  # AC-OPF formulation: SOCP (convex relaxation, rotated cone) / SOCP_equality / exact
         self.Sb = Sb
         self.Buses = Buses
         self.Lines = Lines
\ No newline at end of file
@@ -1,11 +1,21 @@
+import concurrent.futures
 import csv
+import hashlib
+import json
 import math
+import threading
+import time
+import numpy
 import requests
 import os
 import pandas
+from pre_processing.Time_series import TimeSeriesClass
+from pre_processing.Input_cache import cache_folder_name
 '''
 Comentarios:
-    - si time-step diferente de 1h, el input de forecast de PVGIS debe modificarse
+    - PVGIS da datos horarios, si el time-step es diferente de 1h el forecast se adapta al time-step (step_average)
+    - las series de PVGIS se guardan en una caché (.npz con G y Ta, clave = hash de la consulta y de la URL)
+    - la URL de PVGIS se puede cambiar por la de un servidor local (variable de entorno PVGIS_URL, ver PVGIS_server.py)
     - podemos introducir tantos modelos de PV como queramos
     - podemos hacer sizing y/o existente para un mismo modelo
     - alternativamente a realizar el sizing se puede fijar la capacidad instalada a añadir. Si esto no se fija, debe de ser nan --> math.isnan(PV.fix_kW[id]) = True
@@ -33,7 +43,7 @@ class PVClass:
         self.existent_kW = {}  # PV installed capacity [kW] already in the system. This will have operation and replacement costs
         self.fix_kW = {}  # if the sizing is fixed, PV installed capacity [kW]. This will have investment, operation and replacement costs
         self.capex_incentives = {}  # economic incentives on the capex for PV [€/kW]
-        self.forecast = {}  # PV generation availability [kW/kWp = pu]
+        self.forecast = TimeSeriesClass()  # PV generation availability [kW/kWp = pu]. forecast[id, t]
 
         # Costs of the selected model
         self.capital = {}  # investment cost --> [€/kW] for PV and genset and converter, [€/u] for battery
@@ -48,7 +58,7 @@ class PVClass:
         self.nomTemp = {}  # ºC
         self.nomEff = {}  # %
 
-    def add(self, id, name, bus, l_bus, model, sizing, existent, fix, incentives, forecast_type, PVGIS_data, leap_year, forecast_DataFrame, database_DataFrame, cash_exchange, l_t):
+    def add(self, id, name, bus, l_bus, model, sizing, existent, fix, incentives, forecast_type, PVGIS_data, leap_year, forecast_DataFrame, database_DataFrame, cash_exchange, l_t, inc_t=1, data_dir='CSV/DATA/'):
         '''
         Add a PV set
         :param id: number of the PV system
@@ -66,7 +76,9 @@ class PVClass:
         :param forecast_DataFrame: excel with the PV forecast (DataFrame)
         :param database_DataFrame: excel with the parameters for all PV models (DataFrame)
         :param cash_exchange: €/$
-        :param l_t: list(range(24*365)), PVGIS only gives hourly data!!!
+        :param l_t: ``list`` containing all time-steps
+        :param inc_t: time-step magnitude [h]. PVGIS only gives hourly data, it is adapted to the time-step
+        :param data_dir: folder with the input files, the PVGIS series are cached in it (see PVGIS_cache_dir)
         :return: Class with all the inputs of the PV system updated
         '''
         self.id = id  # number of the PV system
@@ -104,12 +116,12 @@ class PVClass:
         # Forecast
         if forecast_type == 1:  # forecast comes from PVGIS, it is calculated with the global irradiance ant ambient temperature
             forecast = get_PV_forecast(l_t, leap_year, PVGIS_data, self.derating[id], self.tempEff[id], self.nomTemp[id],
-                                       self.nomEff[id])
-        elif forecast_type == 0:  # power forecast is directly introduced by excel, and a dictionary is created from this data
-            forecast = {t: forecast_DataFrame[t] for t in l_t}
+                                       self.nomEff[id], inc_t, PVGIS_cache_dir(data_dir))
+        elif forecast_type == 0:  # power forecast is directly introduced by excel
+            forecast = forecast_DataFrame.loc[l_t].to_numpy(dtype=float)
         else:
             print('Error on PV forecast input')
-        self.forecast.update({(id, t): forecast[t] for t in l_t})
+        self.forecast.add(id, forecast, l_t)
 
     def empty(self):
         '''
@@ -123,8 +135,52 @@ class PVClass:
 
 ####################   PVGIS API   ####################
 
-def PVGIS_API(save_location, lat, lon, raddatabase=None, startyear=None, endyear=None, pvtechchoice=None, trackingtype=None,
-              angle=None, aspect=None, optimalinclination=None, optimalangles=None, outputformat=None):
+PVGIS_url = 'https://re.jrc.ec.europa.eu/api/seriescalc'  # hourly series of the PVGIS API
+
+
+def PVGIS_resolve_url(url=None):
+    '''
+    :param url: url of the API (None: the environment variable PVGIS_URL or PVGIS_url)
+    :return: url to which the queries are sent
+    '''
+    return url if url is not None else os.environ.get('PVGIS_URL', PVGIS_url)
+
+
+def PVGIS_cache_dir(data_dir):
+    '''
+    :param data_dir: folder with the input files
+    :return: folder of the cached PVGIS series, inside the cache of the data folder (see Input_cache)
+    '''
+    return os.path.join(data_dir, cache_folder_name, 'PVGIS', '')
+
+
+PVGIS_cache_folder = PVGIS_cache_dir('CSV/DATA/')  # default folder of the cached PVGIS series (None: no cache)
+PVGIS_rate = 25  # maximum PVGIS requests per second (the API allows 30)
+PVGIS_retries = 3  # new attempts after a failed request (connection error, time-out, 429 or 5xx)
+
+
+class RateLimiterClass:
+    '''Limits the number of requests per second, shared by all the threads'''
+
+    def __init__(self, rate):
+        '''
+        :param rate: maximum number of requests per second
+        '''
+        self.interval = 1 / rate  # minimum time between two requests [s]
+        self.next_time = 0  # time at which the next request can start
+        self.lock = threading.Lock()
+
+    def wait(self):
+        with self.lock:
+            now = time.monotonic()
+            delay = self.next_time - now
+            self.next_time = max(now, self.next_time) + self.interval
+        if delay > 0:
+            time.sleep(delay)
+
+
+def PVGIS_query(lat, lon, raddatabase=None, startyear=None, endyear=None, pvtechchoice=None, trackingtype=None,
+                angle=None, aspect=None, optimalinclination=None, optimalangles=None, outputformat=None):
     '''
     More information in https://joint-research-centre.ec.europa.eu/photovoltaic-geographical-information-system-pvgis/getting-started-pvgis/api-non-interactive-service_en
     :param lat: Latitude, in decimal degrees, south is negative. Type = float
@@ -152,47 +208,129 @@ def PVGIS_API(save_location, lat, lon, raddatabase=None, startyear=None, endyear
             All other values (or no value) mean "no". Not relevant for tracking planes. Type = int
     :param outputformat: Type of output. Choices are: "csv" for the normal csv output with text explanations,
             "basic" to get only the data output with no text, and "json". Default = "csv"
-    :return:
-    '''
-    csv_url = 'https://re.jrc.ec.europa.eu/api/seriescalc?'+'lat='+str(lat)+'&'+'lon='+str(lon)
-    if raddatabase != None:
-        csv_url += '&' + 'raddatabase=' + str(raddatabase)
-    if startyear != None:
-        csv_url += '&' + 'startyear=' + str(startyear)
-    if endyear != None:
-        csv_url += '&' + 'endyear=' + str(endyear)
-    if pvtechchoice != None:
-        csv_url += '&' + 'pvtechchoice=' + str(pvtechchoice)
-    if trackingtype != None:
-        csv_url += '&' + 'trackingtype=' + str(trackingtype)
-    if angle != None:
-        csv_url += '&' + 'angle=' + str(angle)
-    if aspect != None:
-        csv_url += '&' + 'aspect=' + str(aspect)
-    if optimalinclination != None:
-        csv_url += '&' + 'optimalinclination=' + str(optimalinclination)
-    if optimalangles != None:
-        csv_url += '&' + 'aspect=' + str(optimalangles)
-    if outputformat != None:
-        csv_url += '&' + 'aspect=' + str(outputformat)
-
-    with requests.Session() as s:
-        download = s.get(csv_url)
-        decoded_content = download.content.decode('utf-8')
-
-        cr = csv.reader(decoded_content.splitlines(), delimiter=',')
-        my_list = list(cr)
-
-        # for row in my_list:
-        #     print(row)
-
-    # dir_path = 'CSV/DATA/'  #os.path.dirname(os.path.realpath(__file__))
-    # save_location = dir_path + '/PV_Wm2.xlsx'
-    df = pandas.DataFrame(my_list)  # seems to work!
-    df.to_excel(save_location)
-    # print(df)
-
-    return
+    :return: ``dict`` with the parameters of the query (only the given ones, as ``str``)
+    '''
+    query = {'lat': lat, 'lon': lon, 'raddatabase': raddatabase, 'startyear': startyear, 'endyear': endyear,
+             'pvtechchoice': pvtechchoice, 'trackingtype': trackingtype, 'angle': angle, 'aspect': aspect,
+             'optimalinclination': optimalinclination, 'optimalangles': optimalangles, 'outputformat': outputformat}
+    return {name: str(value) for name, value in query.items() if value is not None}
+
+
+def PVGIS_request(query, url=None, session=None, retries=PVGIS_retries, limiter=None):
+    '''
+    Downloads the hourly series of PVGIS
+    :param query: ``dict`` returned by PVGIS_query
+    :param url: url of the API. By default, the environment variable PVGIS_URL or PVGIS_url
+    :param session: requests Session (shared connection pool). None: a new session is used
+    :param retries: new attempts after a connection error, a time-out or a 429/5xx answer (waiting 1, 2, 4... s)
+    :param limiter: RateLimiterClass shared by the concurrent requests (None: no limit)
+    :return: pandas DataFrame with the rows of the csv returned by PVGIS
+    '''
+    url = PVGIS_resolve_url(url)
+    if session is None:
+        with requests.Session() as s:
+            return PVGIS_request(query, url, s, retries, limiter)
+    for attempt in range(retries + 1):
+        if limiter is not None:
+            limiter.wait()
+        try:
+            download = session.get(url, params=query, timeout=120)
+            download.raise_for_status()
+            break
+        except requests.RequestException as error:
+            status = error.response.status_code if error.response is not None else None
+            if attempt == retries or (status is not None and status != 429 and status < 500):  # wrong query: no retry
+                raise
+            time.sleep(2 ** attempt)
+    decoded_content = download.content.decode('utf-8')
+    return pandas.DataFrame(list(csv.reader(decoded_content.splitlines(), delimiter=',')))
+
+
+def PVGIS_cache_entry(query, cache_folder=PVGIS_cache_folder, url=None):
+    '''
+    File of the cache of a PVGIS query
+    :param query: ``dict`` returned by PVGIS_query
+    :param cache_folder: folder of the cache
+    :param url: url of the API (see PVGIS_resolve_url). The answers of other servers (e.g. PVGIS_server.py) have
+        their own entries, only the ones of PVGIS_url are identified by the query alone
+    :return: path of the .npz file
+    '''
+    url = PVGIS_resolve_url(url)
+    content = dict(query) if url == PVGIS_url else dict(query, url=url)
+    key = hashlib.sha1(json.dumps(content, sort_keys=True).encode()).hexdigest()
+    return os.path.join(cache_folder, 'PVGIS_' + key[:16] + '.npz')
+
+
+def PVGIS_series(query, cache_folder=PVGIS_cache_folder, url=None, session=None, retries=PVGIS_retries, limiter=None):
+    '''
+    Hourly global irradiance and air temperature of a PVGIS query, from the cache if it was already downloaded
+    :param query: ``dict`` returned by PVGIS_query
+    :param cache_folder: folder of the cache (None: the series is always downloaded and not saved)
+    :param url, session, retries, limiter: see PVGIS_request
+    :return: two numpy arrays, G [W/m2] and Ta [ºC]. Position h = hour h of the year
+    '''
+    if cache_folder is not None:
+        entry = PVGIS_cache_entry(query, cache_folder, url)
+        if os.path.isfile(entry):
+            try:
+                with numpy.load(entry) as data:
+                    return data['G'], data['Ta']
+            except Exception:  # corrupt entry: downloaded again
+                pass
+    G, Ta = PVGIS_columns(PVGIS_request(query, url, session, retries, limiter))
+    if cache_folder is not None:
+        os.makedirs(cache_folder, exist_ok=True)
+        tmp = entry + '.' + str(os.getpid()) + '.' + str(threading.get_ident()) + '.tmp'  # atomic write, several processes or threads may share the cache
+        with open(tmp, 'wb') as f:
+            numpy.savez_compressed(f, G=G, Ta=Ta)
+        os.replace(tmp, entry)
+    return G, Ta
+
+
+def PVGIS_fetch_all(queries, cache_folder=PVGIS_cache_folder, url=None, max_workers=8, retries=PVGIS_retries, rate=PVGIS_rate):
+    '''
+    Downloads the series of several PVGIS queries at the same time (thread pool with a shared connection pool and a
+    common rate limit). Each series is saved in its own cache entry, the ones already in the cache are not downloaded.
+    :param queries: ``list`` of ``dict`` returned by PVGIS_query
+    :param cache_folder: folder of the cache (None: the series are not saved)
+    :param url: url of the API (see PVGIS_request)
+    :param max_workers: maximum number of simultaneous requests
+    :param retries: new attempts of each request (see PVGIS_request)
+    :param rate: maximum requests per second
+    :return: ``list`` with (G, Ta) for each query, None if the series could not be obtained
+    '''
+    keys = [json.dumps(query, sort_keys=True) for query in queries]
+    unique = dict(zip(keys, queries))  # the same query is downloaded once
+    series = {}
+    limiter = RateLimiterClass(rate)
+    with requests.Session() as session:
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=max_workers)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(unique)))) as executor:
+            futures = {executor.submit(PVGIS_series, query, cache_folder, url, session, retries, limiter): key
+                       for key, query in unique.items()}
+            for future in concurrent.futures.as_completed(futures):
+                try:
+                    series[futures[future]] = future.result()
+                except Exception as error:
+                    print('PVGIS ERROR: ' + str(unique[futures[future]]) + ' could not be downloaded. ' + type(error).__name__ + ': ' + str(error))
+                    series[futures[future]] = None
+    return [series[key] for key in keys]
+
+
+def PVGIS_API(save_location, lat, lon, raddatabase=None, startyear=None, endyear=None, pvtechchoice=None, trackingtype=None,
+              angle=None, aspect=None, optimalinclination=None, optimalangles=None, outputformat=None):
+    '''
+    Downloads the PVGIS series and saves the rows of the csv in an excel (the parameters are the ones of PVGIS_query)
+    :param save_location: path of the excel (None: not saved)
+    :return: pandas DataFrame with the rows of the csv returned by PVGIS
+    '''
+    df = PVGIS_request(PVGIS_query(lat, lon, raddatabase, startyear, endyear, pvtechchoice, trackingtype, angle, aspect,
+                                   optimalinclination, optimalangles, outputformat))
+    if save_location is not None:
+        df.to_excel(save_location)
+    return df
 
 
 
@@ -216,9 +354,15 @@ suppositions based on HOMER:
 '''
 
 
+PVGIS_first_row = 9  # first row of the PVGIS csv with hourly data (the previous ones are the header). Row 9 + h = hour h
+PVGIS_G_column = 1  # column of the global irradiance G(i) [W/m2]
+PVGIS_Ta_column = 3  # column of the air temperature T2m [ºC]
+
+
 def calc_PV_temp(Ta, G, Tn, Ta_noct, G_noct, eff_n, tau_alfa):
     '''
-    Calculates the PV cell temperature, according to HOMER formulation
+    Calculates the PV cell temperature, according to HOMER formulation.
+    All the arguments can be numbers or numpy arrays (the result is broadcast)
     :param Ta: air temperature, expressed in ºC
     :param G: global irradiance, expressed in W/m2
     :param Tn: nominal temperature, expressed in ºC
@@ -234,7 +378,8 @@ def calc_PV_temp(Ta, G, Tn, Ta_noct, G_noct, eff_n, tau_alfa):
 
 def calc_PV_forecast(D, G, G_stc, eff_T, T_stc, Ta, Tn, Ta_noct, G_noct, eff_n, tau_alfa):
     '''
-    Calculates the PV forecast, according to homer formulation
+    Calculates the PV forecast, according to homer formulation.
+    All the arguments can be numbers or numpy arrays (the result is broadcast)
     :param D: derating, expressed in %
     :param G: global irradiance (time series), expressed in W/m2
     :param G_stc: global irradiance in standard conditions = 1 kW/m2 (HOMER)
@@ -255,27 +400,89 @@ def calc_PV_forecast(D, G, G_stc, eff_T, T_stc, Ta, Tn, Ta_noct, G_noct, eff_n,
     return f
 
 
-def PVGIS_forecast_dict(PVGIS_excel_location, derating, tempEff, nomTemp, nomEff, l_t):
+def step_average(hourly, l_t, inc_t=1):
+    '''
+    Values at each time-step from hourly data (e.g. PVGIS), for all time-steps at once. The hours of a time-step
+    are the ones from the hour in which it begins to the hour in which it ends
+    :param hourly: numpy array, the last axis is the hour of the year (other axes, e.g. orientations, are kept)
+    :param l_t: ``list`` containing all time-steps
+    :param inc_t: time-step magnitude [h]. For inc_t < 1 the hourly value is kept in all the time-steps of the hour,
+        for inc_t > 1 the hours of the time-step are averaged
+    :return: numpy array with the same axes, the last one is l_t
+    '''
+    t = numpy.asarray(l_t, dtype=float)
+    first = (t * inc_t + 1e-9).astype(int)
+    last = numpy.maximum(first + 1, ((t + 1) * inc_t + 1e-9).astype(int))
+    if numpy.all(last - first == 1):
+        return hourly[..., first]
+    cumulative = numpy.concatenate([numpy.zeros(hourly.shape[:-1] + (1,)), numpy.cumsum(hourly, axis=-1)], axis=-1)
+    return (cumulative[..., last] - cumulative[..., first]) / (last - first)
+
+
+def PVGIS_columns(PVGIS_table):
+    '''
+    Hourly global irradiance and air temperature from the rows of the PVGIS csv
+    :param PVGIS_table: pandas DataFrame returned by PVGIS_API (or read from the saved excel)
+    :return: two numpy arrays, G [W/m2] and Ta [ºC]. Position h = hour h of the year
+    '''
+    data = PVGIS_table.loc[PVGIS_first_row:]
+    G = pandas.to_numeric(data[PVGIS_G_column], errors='coerce').to_numpy(dtype=float)
+    Ta = pandas.to_numeric(data[PVGIS_Ta_column], errors='coerce').to_numpy(dtype=float)
+    return PVGIS_hours(G, Ta)
+
+
+def PVGIS_hours(G, Ta):
+    '''
+    Removes the rows after the hourly data (legend of the PVGIS csv, nan when converted to numbers)
+    :param G: numpy array with the global irradiance [W/m2]
+    :param Ta: numpy array with the air temperature [ºC]
+    :return: G and Ta up to the first nan
+    '''
+    missing = numpy.isnan(G) | numpy.isnan(Ta)
+    n = int(numpy.argmax(missing)) if missing.any() else len(G)
+    return G[:n], Ta[:n]
+
+
+def PVGIS_forecast(G, Ta, derating, tempEff, nomTemp, nomEff, l_t, inc_t=1):
+    '''
+    PV forecast at each time-step from the hourly PVGIS data.
+    Several PV orientations can be computed at once: G and Ta with one row per orientation and/or the module data as
+    arrays (one value per row)
+    :param G: global irradiance [W/m2], numpy array (hours) or (n, hours)
+    :param Ta: air temperature [ºC], numpy array (hours) or (n, hours)
+    :param derating: derating of the PV module, expressed in %
+    :param tempEff: temperature coefficient of the PV module, expressed in %/ºC
+    :param nomTemp: nominal temperature of the PV module, expressed in ºC
+    :param nomEff: nominal efficiency of the PV module, expressed in %
+    :param l_t: ``list`` containing all time-steps
+    :param inc_t: time-step magnitude [h]
+    :return: PV forecast [kW/kW installed], numpy array (len(l_t)) or (n, len(l_t))
+    '''
+    def column(x):  # one value per row --> column vector
+        x = numpy.asarray(x, dtype=float)
+        return x[..., numpy.newaxis] if x.ndim > 0 else x
+    forecast_hourly = calc_PV_forecast(column(derating), numpy.asarray(G, dtype=float), 1, column(tempEff), 25,
+                                       numpy.asarray(Ta, dtype=float), column(nomTemp), 20, 0.8, column(nomEff), 0.9)
+    return step_average(forecast_hourly, l_t, inc_t)
+
+
+def PVGIS_forecast_dict(PVGIS_excel_location, derating, tempEff, nomTemp, nomEff, l_t, inc_t=1):
     '''
     Obtains the PV forecast from the PVGIS excel and component data
     :param PVGIS_excel_location: directory and name of the data file obtained from PVGIS
-    :param PV_data: object which contains the data of the PV component, based on PVDataClass()
     :param derating: derating of the PV module, expressed in %
     :param tempEff: temperature coefficient of the PV module, expressed in %/ºC
     :param nomTemp: nominal temperature of the PV module, expressed in ºC
     :param nomEff: nominal efficiency of the PV module, expressed in %
-    :param l_t: --> list(range(24*365))
-    :return: PV forecast [kW/kW installed]
+    :param l_t: ``list`` containing all time-steps
+    :param inc_t: time-step magnitude [h]. PVGIS data is hourly: for inc_t < 1 the hourly value is kept in all the
+        time-steps of the hour, for inc_t > 1 the hours of the time-step are averaged
+    :return: PV forecast [kW/kW installed], dictionary {t: value}
     '''
     PVGIS_excel = pandas.read_excel(PVGIS_excel_location, sheet_name='Sheet1', header=0, index_col=0)  # importa excel PVGIS
-    G = {t: float(PVGIS_excel[1][9 + t]) for t in l_t}
-    Ta = {t: float(PVGIS_excel[3][9 + t]) for t in l_t}
-
-    forecast = {}
-    for t in l_t:
-        f = calc_PV_forecast(derating, G[t], 1, tempEff, 25, Ta[t], nomTemp, 20, 0.8, nomEff, 0.9)
-        forecast[t] = f
-    return forecast
+    G, Ta = PVGIS_columns(PVGIS_excel)
+    forecast = PVGIS_forecast(G, Ta, derating, tempEff, nomTemp, nomEff, l_t, inc_t)
+    return dict(zip(l_t, forecast.tolist()))
 
 
 class ClientPVGISClass:
@@ -324,28 +531,39 @@ class ClientPVGISClass:
             self.optimal_slope_azimuth = int(PVGIS_DataFrame['Optimal slope and azimuth'])  # 1=yes, 0=no
 
 
-def get_PV_forecast(l_t, leap_year, PVGIS_data, derating, tempEff, nomTemp, nomEff):
+def client_PVGIS_query(PVGIS_data, leap_year):
+    '''
+    PVGIS query of a PV given by the client
+    :param PVGIS_data: excel filled by the client (DataFrame)
+    :param leap_year: binary that indicates if it's a leap year (1) or not (0)
+    :return: ``dict`` returned by PVGIS_query, it is necessary to indicate the year
+    '''
+    PVGIS_input = ClientPVGISClass(PVGIS_data, leap_year)
+    return PVGIS_query(PVGIS_input.latitude, PVGIS_input.longitude,
+                       raddatabase=PVGIS_input.radiation_database, startyear=PVGIS_input.start_year,
+                       endyear=PVGIS_input.end_year, pvtechchoice=PVGIS_input.PV_tech,
+                       trackingtype=PVGIS_input.suntracking, angle=PVGIS_input.slope, aspect=PVGIS_input.azimuth,
+                       optimalinclination=PVGIS_input.optimal_slope, optimalangles=PVGIS_input.optimal_slope_azimuth)
+
+
+def get_PV_forecast(l_t, leap_year, PVGIS_data, derating, tempEff, nomTemp, nomEff, inc_t=1, cache_folder=PVGIS_cache_folder):
     '''
     Full procedure to get the PVGIS forecast from the input of the client
-    :param l_t: --> list(range(24*365)), PVGIS only gives hourly data!!!
+    :param l_t: ``list`` containing all time-steps
     :param leap_year: binary that indicates if it's a leap year (1) or not (0)
     :param PVGIS_data: excel filled by the client (DataFrame)
     :param derating: derating of the PV module, expressed in %
     :param tempEff: temperature coefficient of the PV module, expressed in %/ºC
     :param nomTemp: nominal temperature of the PV module, expressed in ºC
     :param nomEff: nominal efficiency of the PV module, expressed in %
-    :return: PV forecast (dict) [kW/kW installed]
+    :param inc_t: time-step magnitude [h]
+    :param cache_folder: folder of the PVGIS cache (see PVGIS_cache_dir). None: no cache
+    :return: PV forecast [kW/kW installed], numpy array with the value at each t of l_t
     '''
-    PVGIS_excel_location = 'CSV/DATA/PV_Wm2.xlsx'
     # 1) Input: latitude and longitude (in degrees), and year
-    PVGIS_input = ClientPVGISClass(PVGIS_data, leap_year)
-    # 2) Obtain data from PVGIS --> script Josep, it is necessary to indicate the year
-    PVGIS_API(PVGIS_excel_location, PVGIS_input.latitude, PVGIS_input.longitude,
-              raddatabase=PVGIS_input.radiation_database, startyear=PVGIS_input.start_year,
-              endyear=PVGIS_input.end_year, pvtechchoice=PVGIS_input.PV_tech,
-              trackingtype=PVGIS_input.suntracking, angle=PVGIS_input.slope, aspect=PVGIS_input.azimuth,
-              optimalinclination=PVGIS_input.optimal_slope, optimalangles=PVGIS_input.optimal_slope_azimuth)  #, outputformat=None)
-    # 3) Calculate forecast dictionary
-    forecast = PVGIS_forecast_dict(PVGIS_excel_location, derating, tempEff, nomTemp, nomEff, l_t)
-    return forecast
+    query = client_PVGIS_query(PVGIS_data, leap_year)
+    # 2) Obtain data from PVGIS (or from the cache, if this query was already downloaded, e.g. by PVGIS_fetch_all)
+    G, Ta = PVGIS_series(query, cache_folder)
+    # 3) Calculate forecast
+    return PVGIS_forecast(G, Ta, derating, tempEff, nomTemp, nomEff, l_t, inc_t)
 
@@ -0,0 +1,274 @@
+import numpy
+import pandas
+from pre_processing.System import restrict_inputs
+from pre_processing.Time_series import TimeSeriesClass
+
+
+####################   Representative days (time-series aggregation)   ####################
+
+# El año se agrupa en k días representativos (k-medoids sobre los perfiles diarios de demanda, PV, precios,
+# emisiones y periodos tarifarios). Cada día representativo es un día real del año y tiene un peso (número de días
+# que representa). El modelo se construye solo con los time-steps de los días representativos y los costes anuales
+# se escalan con los pesos. La batería se enlaza entre días con el SOC al inicio de cada día del año.
+
+
+class RepresentativeDaysClass:
+    def __init__(self, steps_day, l_days, day_map, n_series):
+        '''
+        Class that stores the result of the aggregation of the year in representative days
+        :param steps_day: number of time-steps in a day
+        :param l_days: ``list`` with all days of the horizon (in chronological order)
+        :param day_map: ``dict`` that relates each day with its representative day. day_map[day]=representative day
+        :param n_series: number of time series used in the clustering
+        '''
+        self.steps_day = steps_day  # time-steps in a day
+        self.l_days = l_days  # all days of the horizon
+        self.day_map = day_map  # day_map[day] = representative day
+        self.l_rep_days = sorted(set(day_map.values()))  # representative days (real days of the year)
+        self.k = len(self.l_rep_days)  # number of representative days
+        self.weight_day = {r: 0 for r in self.l_rep_days}  # number of days represented by each representative day
+        for day in l_days:
+            self.weight_day[day_map[day]] = self.weight_day[day_map[day]] + 1
+        self.l_t = [r * steps_day + h for r in self.l_rep_days for h in range(steps_day)]  # time-steps of the aggregated model
+        self.weight_t = {t: self.weight_day[t // steps_day] for t in self.l_t}  # weight of each time-step [days]
+        self.first_t = {r: r * steps_day for r in self.l_rep_days}  # first time-step of each representative day
+        self.last_t = {r: r * steps_day + steps_day - 1 for r in self.l_rep_days}  # last time-step of each representative day
+        self.n_series = n_series
+        self.SOCmax_day = {}  # maximum SOC of each BESS at each day of the horizon [pu]. SOCmax_day[i_BESS, day]
+        self.weight_Mev = {}  # weight of each EV load (the weight of the day in which it charges)
+        self.error = None  # pandas DataFrame with the aggregation error of each time series
+
+
+def array_from_dict(dict_i_t, i, l_t):
+    '''
+    Time series of an element as a numpy array
+    :param dict_i_t: dictionary {(i, t): value} or {(i, N, t): value} when i is a tuple, or TimeSeriesClass
+    :param i: index of the element (int or tuple)
+    :param l_t: ``list`` containing all time-steps
+    :return: numpy array with the values at each t of l_t
+    '''
+    if isinstance(dict_i_t, TimeSeriesClass):
+        return dict_i_t.array(i, l_t)
+    if type(i) is tuple:
+        return numpy.array([dict_i_t[i + (t,)] for t in l_t], dtype=float)
+    return numpy.array([dict_i_t[i, t] for t in l_t], dtype=float)
+
+
+def daily_series(AllInputs, l_t):
+    '''
+    Time series used to select the representative days: total load, PV forecast, buy and sell prices, grid emissions
+    and renewable factor, and power tariff periods of each grid connection
+    :param AllInputs: data class
+    :param l_t: ``list`` containing all time-steps
+    :return: ``dict`` {name: numpy array with the value at each time-step}
+    '''
+    series = {}
+    l_bus = AllInputs.Network.Buses.id_list
+    series['Load'] = sum(array_from_dict(AllInputs.Load.Pd_total_inclEV, bus, l_t) for bus in l_bus)
+    for i_PV in AllInputs.PV.id_list:
+        series['PV ' + str(AllInputs.PV.name[i_PV])] = array_from_dict(AllInputs.PV.forecast, i_PV, l_t)
+    if AllInputs.Grid.conected1_islanded0 == 1:
+        for i_Grid in AllInputs.Grid.id_list:
+            name = str(AllInputs.Grid.name[i_Grid])
+            series['Buy price ' + name] = array_from_dict(AllInputs.Grid.Cost_P_buy_grid, i_Grid, l_t)
+            series['Sell price ' + name] = array_from_dict(AllInputs.Grid.Cost_P_sell_grid, i_Grid, l_t)
+            series['Emissions ' + name] = array_from_dict(AllInputs.Grid.emissions, i_Grid, l_t)
+            series['Renewable factor ' + name] = array_from_dict(AllInputs.Grid.renewable_factor, i_Grid, l_t)
+            series['Periods ' + name] = sum(N * array_from_dict(AllInputs.Grid.K_P, (i_Grid, N), l_t) for N in AllInputs.Grid.l_N)
+    return series
+
+
+def kmedoids(distance, k, n_init=10, max_iter=100, seed=0):
+    '''
+    k-medoids clustering (alternating algorithm with k-means++ initialization) from a distance matrix
+    :param distance: numpy array (n, n) with the distance between elements
+    :param k: number of clusters
+    :param n_init: number of initializations, the best solution is kept
+    :param max_iter: maximum number of iterations of each initialization
+    :param seed: seed of the random generator (the aggregation is reproducible)
+    :return: (medoids, labels) numpy arrays. labels[j] is the position in medoids of the medoid of the element j
+    '''
+    n = distance.shape[0]
+    rng = numpy.random.RandomState(seed)
+    best_cost, best_medoids, best_labels = numpy.inf, None, None
+    for _ in range(n_init):
+        medoids = [rng.randint(n)]
+        for _ in range(1, k):  # k-means++: new medoids far from the selected ones
+            d_min = distance[:, medoids].min(axis=1) ** 2
+            if d_min.sum() == 0:
+                medoids.append(rng.choice(numpy.setdiff1d(numpy.arange(n), medoids)))
+            else:
+                medoids.append(rng.choice(n, p=d_min / d_min.sum()))
+        medoids = numpy.array(medoids)
+        for _ in range(max_iter):
+            labels = distance[:, medoids].argmin(axis=1)
+            new_medoids = medoids.copy()
+            for c in range(k):
+                members = numpy.flatnonzero(labels == c)
+                if members.size > 0:
+                    new_medoids[c] = members[distance[numpy.ix_(members, members)].sum(axis=0).argmin()]
+            if numpy.array_equal(new_medoids, medoids):
+                break
+            medoids = new_medoids
+        labels = distance[:, medoids].argmin(axis=1)
+        cost = distance[numpy.arange(n), medoids[labels]].sum()
+        if cost < best_cost:
+            best_cost, best_medoids, best_labels = cost, medoids, labels
+    return best_medoids, best_labels
+
+
+def cluster_days(AllInputs, k, peak_day=True, seed=0):
+    '''
+    Selects k representative days of the horizon
+    :param AllInputs: data class (full horizon)
+    :param k: number of representative days
+    :param peak_day: if True, the day with the maximum load is always a representative day of itself (hired power and
+        maximeter sizing depend on it)
+    :param seed: seed of the clustering
+    :return: RepresentativeDaysClass
+    '''
+    l_t = AllInputs.System.l_t
+    steps_day = int(round(24 / AllInputs.System.inc_t))
+    day_t = numpy.asarray(l_t) // steps_day
+    l_days, n_steps = numpy.unique(day_t, return_counts=True)
+    l_days = l_days[n_steps == steps_day].tolist()  # only complete days can be aggregated
+    if len(l_days) < len(n_steps):
+        print('Representative days: incomplete days of the horizon are not considered')
+    l_t_days = [day * steps_day + h for day in l_days for h in range(steps_day)]
+
+    series = daily_series(AllInputs, l_t_days)
+    features = []
+    for values in series.values():
+        span = values.max() - values.min()
+        scaled = (values - values.min()) / span if span > 0 else numpy.zeros(values.size)
+        features.append(scaled.reshape(len(l_days), steps_day))
+    features = numpy.hstack(features)  # one row per day
+
+    days = numpy.asarray(l_days)
+    fixed = []
+    if peak_day and k > 1:
+        fixed = [int(days[series['Load'].reshape(len(l_days), steps_day).max(axis=1).argmax()])]
+    free = numpy.flatnonzero(~numpy.isin(days, fixed))
+    k_free = min(k - len(fixed), free.size)
+
+    day_map = {day: day for day in fixed}
+    if k_free >= free.size:
+        day_map.update({int(days[j]): int(days[j]) for j in free})
+    else:
+        X = features[free]
+        sq = (X ** 2).sum(axis=1)
+        distance = numpy.sqrt(numpy.maximum(sq[:, None] + sq[None, :] - 2 * X @ X.T, 0))
+        medoids, labels = kmedoids(distance, k_free, seed=seed)
+        day_map.update({int(days[free[j]]): int(days[free[medoids[labels[j]]]]) for j in range(free.size)})
+
+    aggregation = RepresentativeDaysClass(steps_day, l_days, day_map, len(series))
+    aggregation.error = aggregation_error(series, aggregation)
+    return aggregation
+
+
+def aggregation_error(series, aggregation):
+    '''
+    Error of the aggregation of each time series: the year built repeating the representative days is compared with
+    the original one
+    :param series: ``dict`` {name: numpy array} with the time series of all days of the horizon
+    :param aggregation: RepresentativeDaysClass
+    :return: pandas DataFrame with the normalized RMSE [%], the error in the annual sum [%] and the error in the
+        maximum value [%] of each time series
+    '''
+    n_days = len(aggregation.l_days)
+    position = {day: j for j, day in enumerate(aggregation.l_days)}
+    rows = numpy.array([position[aggregation.day_map[day]] for day in aggregation.l_days])
+    error = {}
+    for name, values in series.items():
+        daily = values.reshape(n_days, aggregation.steps_day)
+        rebuilt = daily[rows]
+        span = values.max() - values.min()
+        rmse = numpy.sqrt(((rebuilt - daily) ** 2).mean())
+        total = daily.sum()
+        error[name] = {'NRMSE [%]': rmse / span * 100 if span > 0 else 0.0,
+                       'Annual sum error [%]': (rebuilt.sum() - total) / abs(total) * 100 if total != 0 else 0.0,
+                       'Maximum error [%]': (rebuilt.max() - daily.max()) / abs(daily.max()) * 100 if daily.max() != 0 else 0.0}
+    return pandas.DataFrame(error).T
+
+
+def aggregate_inputs(AllInputs, k, peak_day=True, seed=0):
+    '''
+    Builds the inputs of the optimization over k representative days.
+    All time-step dictionaries are restricted to the time-steps of the representative days, and the weight of each
+    time-step (number of days it represents) is stored in System.weight_t, so that the annual costs are rescaled.
+    :param AllInputs: data class (full horizon)
+    :param k: number of representative days
+    :param peak_day: if True, the day with the maximum load is always a representative day
+    :param seed: seed of the clustering
+    :return: new data class. The original one is not modified
+    '''
+    aggregation = cluster_days(AllInputs, k, peak_day, seed)
+    l_t = aggregation.l_t
+    steps_day = aggregation.steps_day
+
+    new = restrict_inputs(AllInputs, l_t)
+
+    # System: weights and months represented by each representative day
+    new.System.weight_t = aggregation.weight_t
+    new.System.aggregation = aggregation
+    mes = AllInputs.System.name_days['mes'].to_numpy()
+    month_key = {name: key for key, name in AllInputs.System.dict_month.items()}
+    months_rep = {r: set() for r in aggregation.l_rep_days}
+    for day in aggregation.l_days:
+        months_rep[aggregation.day_map[day]].add(month_key[mes[day * steps_day]])
+    new.System.dict_K_month = {(month, t): int(month in months_rep[t // steps_day]) for month in AllInputs.System.l_month for t in l_t}
+
+    for i_BESS in AllInputs.BESS.id_list:  # the most restrictive value of each day, for the inter-day SOC
+        for day in aggregation.l_days:
+            aggregation.SOCmax_day[i_BESS, day] = min(AllInputs.BESS.SOCmax_hourly[i_BESS, t] for t in range(day * steps_day, (day + 1) * steps_day))
+
+    # EV: each EV load has the weight of the first time-step in which it can charge
+    if AllInputs.EV.hay == 1 and AllInputs.EV.immediate0_smart1 == 1:
+        for Mev in new.EV.smart.l_Mev:
+            t_first = min(t for t in l_t if new.EV.smart.K_evMev_t[Mev, t] == 1)
+            aggregation.weight_Mev[Mev] = aggregation.weight_t[t_first]
+    return new
+
+
+def representative_days_error(AllInputs, l_k, peak_day=True, seed=0):
+    '''
+    Aggregation error of the input time series for different number of representative days, to choose k before solving
+    :param AllInputs: data class (full horizon)
+    :param l_k: ``list`` with the number of representative days to evaluate
+    :param peak_day: if True, the day with the maximum load is always a representative day
+    :param seed: seed of the clustering
+    :return: pandas DataFrame, one row per k, with the mean and maximum NRMSE [%] and the maximum absolute error of the
+        annual sums [%] of all time series
+    '''
+    table = {}
+    for k in l_k:
+        error = cluster_days(AllInputs, k, peak_day, seed).error
+        table[k] = {'Mean NRMSE [%]': error['NRMSE [%]'].mean(),
+                    'Max NRMSE [%]': error['NRMSE [%]'].max(),
+                    'Max annual sum error [%]': error['Annual sum error [%]'].abs().max()}
+    return pandas.DataFrame(table).T
+
+
+def compare_with_full_year(instance_aggregated, instance_full):
+    '''
+    Aggregation error of the optimization results: compares the sizing and the annual costs obtained with
+    representative days with the ones of the full-year model
+    :param instance_aggregated: solved pyomo instance built with aggregate_inputs(...)
+    :param instance_full: solved pyomo instance of the full year
+    :return: pandas DataFrame with the values of both runs and the relative error [%]
+    '''
+    import pyomo.environ as pyo
+    results = {}
+    def add(name, component):
+        for index in component:
+            key = name if index is None else name + '[' + str(index) + ']'
+            results[key] = (pyo.value(getattr(instance_full, component.local_name)[index]), pyo.value(component[index]))
+    add('Objective', instance_aggregated.goal)
+    for name in ['total_investment', 'total_annual_costs', 'total_flexibility_cost', 'PV_G', 'BESS_k', 'BESS_C', 'Grid_C_buy',
+                 'Grid_R_sell', 'Grid_C_power', 'Grid_C_penalisation', 'Grid_C_emission', 'Grid_P_hired_N', 'BESS_C_degradation']:
+        if hasattr(instance_aggregated, name) and hasattr(instance_full, name):
+            add(name, getattr(instance_aggregated, name))
+    table = pandas.DataFrame(results, index=['Full year', 'Representative days']).T
+    full = table['Full year']
+    table['Error [%]'] = numpy.where(full.abs() > 1e-9, (table['Representative days'] - full) / full.abs().where(full.abs() > 1e-9, 1) * 100, 0.0)
+    return table
@@ -1,4 +1,8 @@
+import copy
 import math
+import numpy
+import pandas
+from pre_processing.Time_series import TimeSeriesClass
 
 class SystemClass:
     def __init__(self):
@@ -19,6 +23,9 @@ class SystemClass:
 
         self.l_t = l_t
         self.inc_t = inc_t
+        self.weight_t = {t: 1 for t in l_t}  # number of days represented by each time-step (1 if the year is not aggregated)
+        self.aggregation = None  # RepresentativeDaysClass if the optimization is done with representative days
+        self.mutable = False  # if True, the parameters that can be swept are declared mutable (see sweep.py)
         self.name_days = name_days  # DataFrame for a year with all time steps, columns = ['id', 'datetime', 'mes', 'dia', 'festivo']
         self.dict_month = {0: 'Enero', 1: 'Febrero', 2: 'Marzo', 3: 'Abril', 4: 'Mayo', 5: 'Junio', 6: 'Julio',
                            7: 'Agosto', 8: 'Septiembre', 9: 'Octubre', 10: 'Noviembre', 11: 'Diciembre'}  # dictionary that relates the name of a month with a key. dict_month[key]=month_name
@@ -52,13 +59,11 @@ def count_days_in_month(name_days, dict_month, inc_t, l_t, l_month):
     :param l_month: ``list`` containing all month keys in a year
     :return: dictionary that indicates the number of days in each month
     '''
+    mes_t = name_days['mes'].to_numpy()[numpy.asarray(l_t)]
     dict_days_month = {}
     for mes in l_month:
-        dias = 0
-        for t in l_t:
-            if name_days['mes'][t] == dict_month[mes]:
-                dias = dias + 1 * inc_t / 24
-        dict_days_month[mes] = int(dias)
+        steps = numpy.count_nonzero(mes_t == dict_month[mes])
+        dict_days_month[mes] = int(steps * inc_t / 24 + 1e-9)  # only complete days
     return dict_days_month
 
 
@@ -75,16 +80,63 @@ def t_in_month(name_days, dict_month, l_t, l_month):
     :param l_month: ``list`` containing all month keys in a year
     :return: dictionary that indicates the month of each time-step. dict_K_month[month,t]=value. 1: yes, 0: no
     '''
+    mes_t = name_days['mes'].to_numpy()[numpy.asarray(l_t)]
     dict_K_month = {}
     for mes in l_month:
-        for t in l_t:
-            if name_days['mes'][t] == dict_month[mes]:
-                dict_K_month[(mes, t)] = 1
-            else:
-                dict_K_month[(mes, t)] = 0
+        K = (mes_t == dict_month[mes]).astype(int).tolist()
+        dict_K_month.update({(mes, t): K[j] for j, t in enumerate(l_t)})
     return dict_K_month
 
 
+def steps_calendar(name_days, n_steps, inc_t):
+    '''
+    Adapts the hourly calendar (Time_data.xlsx) to the time-step of the optimization, so that it can be indexed by t
+    :param name_days: hourly DataFrame with columns ['id', 'datetime', 'mes', 'dia', 'festivo']
+    :param n_steps: number of time-steps of the calendar (the highest t + 1)
+    :param inc_t: time-step magnitude [h]
+    :return: DataFrame with one row per time-step (the calendar data of the hour in which each time-step begins)
+    '''
+    if inc_t == 1 and len(name_days) >= n_steps:
+        return name_days
+    hour = numpy.minimum(numpy.floor(numpy.arange(n_steps) * inc_t + 1e-9).astype(int), len(name_days) - 1)
+    calendar = name_days.iloc[hour].reset_index(drop=True)
+    if 'datetime' in calendar.columns:
+        calendar['datetime'] = name_days['datetime'].iloc[0] + pandas.to_timedelta(numpy.arange(n_steps) * inc_t, unit='h')
+    if 'id' in calendar.columns:
+        calendar['id'] = numpy.arange(n_steps)
+    return calendar
+
+
+def hourly_to_steps(data, inc_t, n_steps_year):
+    '''
+    Converts an hourly time series (one row per hour) to the time-step of the optimization.
+    If inc_t < 1 every hour is repeated (powers and prices are kept constant inside the hour),
+    if inc_t > 1 the hours inside each time-step are averaged.
+    Series that are already given per time-step (n_steps_year rows) are not modified.
+    :param data: pandas DataFrame or Series, one row per hour
+    :param inc_t: time-step magnitude [h]
+    :param n_steps_year: number of time-steps of the whole year
+    :return: pandas DataFrame or Series with one row per time-step
+    '''
+    if inc_t == 1 or len(data) == n_steps_year or len(data) == 0:
+        return data
+    if inc_t < 1:
+        rep = int(round(1 / inc_t))
+        new = data.iloc[numpy.repeat(numpy.arange(len(data)), rep)]
+        new.index = pandas.RangeIndex(len(new))
+        return new
+    k = int(round(inc_t))
+    group = numpy.arange(len(data)) // k
+    if isinstance(data, pandas.Series):
+        if pandas.api.types.is_numeric_dtype(data):
+            return data.groupby(group).mean()
+        return data.groupby(group).first()
+    numeric = data.select_dtypes('number').columns
+    new = data.groupby(group).first()
+    new[numeric] = data[numeric].groupby(group).mean()
+    return new
+
+
 ####################   ...   ####################
 
 
@@ -103,3 +155,72 @@ class AllInputsClass:
         self.Load = Loads
         self.EV_Stations = EV_Stations
 
+
+def restrict_dict(dict_t, l_t):
+    '''
+    Keeps only the entries of a dictionary whose time-step (last element of the key) is in l_t
+    :param dict_t: dictionary indexed by t, (i, t) or (i, N, t), or TimeSeriesClass
+    :param l_t: ``list`` containing the time-steps to keep
+    :return: new dictionary (new TimeSeriesClass if dict_t is a TimeSeriesClass)
+    '''
+    if isinstance(dict_t, TimeSeriesClass):
+        return dict_t.restrict(l_t)
+    set_t = set(l_t)
+    return {key: value for key, value in dict_t.items() if (key[-1] if type(key) is tuple else key) in set_t}
+
+
+def restrict_inputs(AllInputs, l_t):
+    '''
+    Copy of the inputs restricted to a subset of the time-steps (a window of the year or some representative days).
+    All the time-step dictionaries used by the optimization model are restricted to l_t. The number of days of each
+    month (dict_days_month) is the one of the original horizon, since monthly penalisations are applied to the whole month.
+    EV loads with smart charging are kept if they can charge in any time-step of l_t. If part of their availability is
+    out of l_t, the energy to charge is limited to the one that can be charged inside l_t.
+    :param AllInputs: data class
+    :param l_t: ``list`` containing the time-steps to keep
+    :return: new data class. The original one is not modified
+    '''
+    new = copy.copy(AllInputs)
+    new.System = copy.copy(AllInputs.System)
+    new.Load = copy.copy(AllInputs.Load)
+    new.PV = copy.copy(AllInputs.PV)
+    new.BESS = copy.copy(AllInputs.BESS)
+    new.Grid = copy.copy(AllInputs.Grid)
+    new.EV = copy.copy(AllInputs.EV)
+    new.EV.smart = copy.copy(AllInputs.EV.smart)
+
+    new.System.l_t = l_t
+    new.System.weight_t = restrict_dict(AllInputs.System.weight_t, l_t)
+    new.System.dict_K_month = restrict_dict(AllInputs.System.dict_K_month, l_t)
+    for name in ['Pd', 'Pd_total', 'Pd_EV_total', 'Pd_total_inclEV']:
+        setattr(new.Load, name, restrict_dict(getattr(AllInputs.Load, name), l_t))
+    new.PV.forecast = restrict_dict(AllInputs.PV.forecast, l_t)
+    new.BESS.SOCmax_hourly = restrict_dict(AllInputs.BESS.SOCmax_hourly, l_t)
+    for name in ['Cost_P_buy_grid', 'Cost_P_sell_grid', 'K_P', 'K_E', 'emissions', 'renewable_factor']:
+        setattr(new.Grid, name, restrict_dict(getattr(AllInputs.Grid, name), l_t))
+    new.EV.immediate = restrict_dict(AllInputs.EV.immediate, l_t)
+
+    smart = AllInputs.EV.smart
+    if AllInputs.EV.hay == 1 and AllInputs.EV.immediate0_smart1 == 1:
+        set_t = set(l_t)
+        n_K = {Mev: 0 for Mev in smart.l_Mev}  # time-steps in which each EV can charge
+        n_K_in = {Mev: 0 for Mev in smart.l_Mev}  # time-steps in which each EV can charge inside l_t
+        for (Mev, t), K in smart.K_evMev_t.items():
+            if K == 1:
+                n_K[Mev] = n_K[Mev] + 1
+                if t in set_t:
+                    n_K_in[Mev] = n_K_in[Mev] + 1
+        l_Mev = [Mev for Mev in smart.l_Mev if n_K_in[Mev] > 0]
+        new.EV.smart.l_Mev = l_Mev
+        new.EV.smart.n_Mev = len(l_Mev)
+        new.EV.smart.K_evMev_t = {(Mev, t): smart.K_evMev_t[Mev, t] for Mev in l_Mev for t in l_t}
+        new.EV.smart.Pbaseline_evMev_t = {(Mev, t): smart.Pbaseline_evMev_t[Mev, t] for Mev in l_Mev for t in l_t}
+        new.EV.smart.Pmax_evMev = {Mev: smart.Pmax_evMev[Mev] for Mev in l_Mev}
+        new.EV.smart.Cost_evMev = {Mev: smart.Cost_evMev[Mev] for Mev in l_Mev}
+        new.EV.smart.E_evMev = {}
+        for Mev in l_Mev:
+            if n_K_in[Mev] < n_K[Mev]:  # la ventana de carga sale de l_t, solo se carga lo que cabe dentro
+                new.EV.smart.E_evMev[Mev] = min(smart.E_evMev[Mev], smart.Pmax_evMev[Mev] * AllInputs.System.inc_t * n_K_in[Mev])
+            else:
+                new.EV.smart.E_evMev[Mev] = smart.E_evMev[Mev]
+    return new
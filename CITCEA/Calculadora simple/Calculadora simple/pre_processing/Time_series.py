@@ -0,0 +1,158 @@
+import numpy
+import operator
+from collections.abc import Mapping
+'''
+Comentarios:
+    - las series temporales se guardan en un array (una fila por elemento, una columna por time-step)
+    - se indexan como un diccionario de solo lectura [id, t], también como initialize de los parámetros de Pyomo
+    - las series sin id (p.ej. la demanda D[t]) tienen una única fila con clave ()
+'''
+
+
+####################   Time series stored in arrays   ####################
+
+
+class TimeSeriesClass(Mapping):
+    __slots__ = ('l_t', 'rows', 'values', '_row', '_t0', '_col')
+
+    def __init__(self, l_t=()):
+        '''
+        Time series of several elements with the same time-steps
+        :param l_t: ``list`` containing all time-steps (it can be given later, when the first element is added)
+        '''
+        self.rows = []  # first part of the keys (tuple without t) of each row. E.g. (i_Grid,) or (i_Grid, N)
+        self._row = {}  # row of each element. _row[(i_Grid,)] = row
+        self.set_time(l_t)
+
+    def set_time(self, l_t):
+        '''
+        Time-steps of the series (columns of values). Only possible while there are no elements
+        :param l_t: ``list`` containing all time-steps
+        '''
+        if self.rows:
+            raise ValueError('the time-steps of a TimeSeriesClass with elements can not be modified, use restrict')
+        self.l_t = list(l_t)
+        self.values = numpy.zeros((0, len(self.l_t)))  # values[row, position of t in l_t]
+        contiguous = all(type(t) is int for t in self.l_t) and self.l_t == list(range(self.l_t[0], self.l_t[0] + len(self.l_t))) if self.l_t else True
+        self._t0 = self.l_t[0] if self.l_t and contiguous else 0  # column of t = t - t0 (if l_t are consecutive integers)
+        self._col = None if contiguous else {t: n for n, t in enumerate(self.l_t)}  # column of each t otherwise
+
+    @classmethod
+    def from_array(cls, keys, l_t, values):
+        '''
+        Creates the time series from an array
+        :param keys: ``list`` with the id of each row (int or tuple)
+        :param l_t: ``list`` containing all time-steps
+        :param values: array (len(keys), len(l_t))
+        :return: TimeSeriesClass
+        '''
+        series = cls(l_t)
+        series.rows = [key if type(key) is tuple else (key,) for key in keys]
+        series._row = {row: n for n, row in enumerate(series.rows)}
+        series.values = numpy.array(values, dtype=float).reshape(len(series.rows), len(series.l_t))
+        return series
+
+    def add(self, key, values, l_t=None):
+        '''
+        Adds (or replaces) the time series of an element
+        :param key: id of the element (int or tuple)
+        :param values: array-like with the value at each time-step of l_t
+        :param l_t: ``list`` containing all time-steps, needed for the first element if not given when created
+        '''
+        if not self.rows and l_t is not None:
+            self.set_time(l_t)
+        elif l_t is not None and list(l_t) != self.l_t:
+            raise ValueError('all the elements of a TimeSeriesClass must have the same time-steps')
+        row = key if type(key) is tuple else (key,)
+        values = numpy.asarray(values, dtype=float)
+        if row in self._row:
+            self.values[self._row[row]] = values
+        else:
+            self._row[row] = len(self.rows)
+            self.rows.append(row)
+            self.values = numpy.vstack([self.values, values[numpy.newaxis, :]])
+
+    def add_dict(self, key, dict_t, l_t=None):
+        '''
+        Adds the time series of an element given as a dictionary
+        :param key: id of the element
+        :param dict_t: dictionary {t: value} or {(N, t): value} (one row is added for each N)
+        :param l_t: ``list`` containing all time-steps, needed for the first element if not given when created
+        '''
+        if not self.rows and l_t is not None:
+            self.set_time(l_t)
+        prefix = key if type(key) is tuple else (key,)
+        series = {}
+        for k, value in dict_t.items():
+            if type(k) is tuple:
+                series.setdefault(prefix + k[:-1], {})[k[-1]] = value
+            else:
+                series.setdefault(prefix, {})[k] = value
+        for row, values in series.items():
+            self.add(row, [values[t] for t in self.l_t], l_t)
+
+    def column(self, t):
+        '''
+        :return: column of the time-step t in values
+        '''
+        if self._col is not None:
+            return self._col[t]
+        try:
+            col = operator.index(t) - self._t0  # any integer (also numpy), not floats, as the keys of a dict
+        except TypeError:
+            raise KeyError(t)
+        if col < 0 or col >= len(self.l_t):
+            raise KeyError(t)
+        return col
+
+    def array(self, key, l_t=None):
+        '''
+        Time series of an element
+        :param key: id of the element (int or tuple)
+        :param l_t: ``list`` with the time-steps (all by default)
+        :return: numpy array (view of the stored values if l_t is None)
+        '''
+        row = self._row[key if type(key) is tuple else (key,)]
+        if l_t is None:
+            return self.values[row]
+        return self.values[row, [self.column(t) for t in l_t]]
+
+    def restrict(self, l_t):
+        '''
+        Copy with only some time-steps
+        :param l_t: ``list`` containing the time-steps to keep
+        :return: TimeSeriesClass
+        '''
+        if not self.rows:
+            return TimeSeriesClass(l_t)
+        return TimeSeriesClass.from_array(self.rows, l_t, self.values[:, [self.column(t) for t in l_t]])
+
+    def __getitem__(self, key):
+        if type(key) is not tuple:  # series without id, indexed [t]
+            key = (key,)
+        try:
+            return self.values.item(self._row[key[:-1]], self.column(key[-1]))
+        except (TypeError, IndexError):  # key that is not (id, ..., t)
+            raise KeyError(key)
+
+    def __iter__(self):
+        for row in self.rows:
+            for t in self.l_t:
+                yield row + (t,)
+
+    def __len__(self):
+        return len(self.rows) * len(self.l_t)
+
+    def items(self):
+        for row, values in zip(self.rows, self.values.tolist()):
+            for t, value in zip(self.l_t, values):
+                yield row + (t,), value
+
+    def to_dict(self):
+        '''
+        :return: dictionary {(id, ..., t): value}
+        '''
+        return dict(self.items())
+
+    def __repr__(self):
+        return 'TimeSeriesClass(' + str(len(self.rows)) + ' elements x ' + str(len(self.l_t)) + ' time-steps)'
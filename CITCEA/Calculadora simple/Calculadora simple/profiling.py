@@ -0,0 +1,172 @@
+'''
+Instrumentation of the stages of the pipeline (pre-process, blocks of the model, create_instance, solver, save_*).
+When it is enabled, each stage writes a JSON record (one line per stage) with its time, CPU time and, optionally,
+its memory peak, and can save a cProfile dump. When it is disabled the stages run without any measurement.
+    - from python: profiling.enable('CSV/Results/Profile.jsonl', memory=True, cprofile_folder='CSV/Results/cProfile/')
+    - without modifying the scripts: environment variables OPTUGRID_PROFILE=<log file>, OPTUGRID_PROFILE_MEMORY=1 and
+      OPTUGRID_CPROFILE=<folder>. E.g. OPTUGRID_PROFILE=CSV/Results/Profile.jsonl python main.py
+The stages are nested (e.g. optimization/build_model/PV_block), the record of each stage includes the time of the
+stages inside it. With an AbstractModel the blocks only declare the components, which are built in create_instance.
+'''
+
+import contextlib
+import cProfile
+import datetime
+import functools
+import json
+import os
+import threading
+import time
+import tracemalloc
+import pandas
+
+
+_config = {'enabled': False, 'log_file': None, 'memory': False, 'cprofile_folder': None}
+_state = threading.local()  # stack of the stages running in each thread
+_lock = threading.Lock()  # the records of all the threads are written in the same file
+
+
+def enable(log_file='CSV/Results/Profile.jsonl', memory=False, cprofile_folder=None):
+    '''
+    Enables the measurement of the stages
+    :param log_file: path of the JSON lines file where the records are appended (None: not written, only kept in memory)
+    :param memory: if True, the memory peak of each stage is measured with tracemalloc (slower)
+    :param cprofile_folder: folder where a cProfile dump (.prof) of each stage is saved (None: no cProfile). Only the
+        outermost stage that is running is profiled (cProfile can not be nested)
+    '''
+    _config.update({'enabled': True, 'log_file': log_file, 'memory': memory, 'cprofile_folder': cprofile_folder})
+    _config['records'] = []
+    if log_file is not None:
+        os.makedirs(os.path.dirname(log_file) or '.', exist_ok=True)
+    if cprofile_folder is not None:
+        os.makedirs(cprofile_folder, exist_ok=True)
+    if memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+
+def disable():
+    '''
+    Disables the measurement of the stages
+    '''
+    _config['enabled'] = False
+    if _config['memory'] and tracemalloc.is_tracing():
+        tracemalloc.stop()
+
+
+def records():
+    '''
+    :return: ``list`` with the records written since enable() was called in this process
+    '''
+    return list(_config.get('records', []))
+
+
+def _write(record):
+    with _lock:
+        _config['records'].append(record)
+        if _config['log_file'] is not None:
+            with open(_config['log_file'], 'a', encoding='utf-8') as f:
+                f.write(json.dumps(record, default=str) + '\n')
+
+
+@contextlib.contextmanager
+def profile_stage(name, **info):
+    '''
+    Measures the code inside the with statement as a stage: with profile_stage('create_instance'): ...
+    :param name: name of the stage
+    :param info: additional fields of the record (e.g. number of time-steps)
+    '''
+    if not _config['enabled']:
+        yield
+        return
+    stack = getattr(_state, 'stack', None)
+    if stack is None:
+        stack = _state.stack = []
+    frame = {'name': name, 'peak': 0}
+    memory = _config['memory'] and tracemalloc.is_tracing()
+    if memory:
+        current, peak = tracemalloc.get_traced_memory()
+        if stack:
+            stack[-1]['peak'] = max(stack[-1]['peak'], peak)
+        tracemalloc.reset_peak()
+        frame['before'] = current
+    profiler = None
+    if _config['cprofile_folder'] is not None and not any('profiler' in f for f in stack):
+        profiler = frame['profiler'] = cProfile.Profile()
+    stack.append(frame)
+    start = datetime.datetime.now().isoformat(timespec='milliseconds')
+    begin, begin_cpu = time.perf_counter(), time.process_time()
+    if profiler is not None:
+        profiler.enable()
+    error = None
+    try:
+        yield
+    except BaseException as e:
+        error = type(e).__name__
+        raise
+    finally:
+        if profiler is not None:
+            profiler.disable()
+        record = {'stage': '/'.join(f['name'] for f in stack), 'name': name, 'depth': len(stack) - 1,
+                  'start': start, 'time [s]': time.perf_counter() - begin, 'cpu [s]': time.process_time() - begin_cpu,
+                  'pid': os.getpid()}
+        stack.pop()
+        if memory:
+            current, peak = tracemalloc.get_traced_memory()
+            frame['peak'] = max(frame['peak'], peak)
+            record['memory peak [MB]'] = (frame['peak'] - frame['before']) / 1e6
+            record['memory retained [MB]'] = (current - frame['before']) / 1e6
+            if stack:
+                stack[-1]['peak'] = max(stack[-1]['peak'], frame['peak'])
+            tracemalloc.reset_peak()
+        if profiler is not None:
+            dump = os.path.join(_config['cprofile_folder'], record['stage'].replace('/', '.') + '_' + str(os.getpid()) + '_'
+                                + str(len(_config['records'])) + '.prof')
+            profiler.dump_stats(dump)
+            record['cprofile'] = dump
+        if error is not None:
+            record['error'] = error
+        record.update(info)
+        _write(record)
+
+
+def stage(name=None):
+    '''
+    Decorator that measures each call of a function as a stage (see profile_stage)
+    :param name: name of the stage (default: name of the function)
+    '''
+    def decorator(function):
+        stage_name = function.__name__ if name is None else name
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not _config['enabled']:
+                return function(*args, **kwargs)
+            with profile_stage(stage_name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def summary(log_file='CSV/Results/Profile.jsonl'):
+    '''
+    Time of each stage from a log file, to see which stages dominate
+    :param log_file: path of the JSON lines file (or ``list`` of records)
+    :return: pandas DataFrame, one row per stage with the number of calls and the total, mean and maximum time,
+        sorted by total time
+    '''
+    if isinstance(log_file, str):
+        with open(log_file, 'r', encoding='utf-8') as f:
+            log_file = [json.loads(line) for line in f if line.strip()]
+    table = pandas.DataFrame(log_file)
+    if table.empty:
+        return table
+    aggregation = {'calls': ('time [s]', 'size'), 'total time [s]': ('time [s]', 'sum'),
+                   'mean time [s]': ('time [s]', 'mean'), 'max time [s]': ('time [s]', 'max')}
+    if 'memory peak [MB]' in table:
+        aggregation['max memory peak [MB]'] = ('memory peak [MB]', 'max')
+    return table.groupby('stage').agg(**aggregation).sort_values('total time [s]', ascending=False)
+
+
+if os.environ.get('OPTUGRID_PROFILE'):  # enabled from the environment, without modifying the scripts
+    enable(os.environ['OPTUGRID_PROFILE'], memory=os.environ.get('OPTUGRID_PROFILE_MEMORY', '0') == '1',
+           cprofile_folder=os.environ.get('OPTUGRID_CPROFILE') or None)
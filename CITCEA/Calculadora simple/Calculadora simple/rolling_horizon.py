@@ -0,0 +1,227 @@
+'''
+Rolling-horizon operation of a microgrid with fixed sizing
+'''
+
+import time
+import pandas
+import pyomo.environ as pyo
+from optimization_model import optimization, solver_factory, solve_model
+from blocks.Grid import Grid_buy_cost, Grid_sell_revenue, Grid_emission_cost, Grid_excess_penalisation
+from pre_processing.System import restrict_inputs
+
+
+# time series stored from each window (only the time-steps that are committed)
+rolling_series = ['PV_P', 'BESS_P_char', 'BESS_P_disch', 'BESS_SOC', 'Grid_P_buy', 'Grid_P_sell', 'Grid_P_excess',
+                  'Grid_P_hired_t', 'EV_P', 'noSupply_P', 'D_bus', 'D']
+
+
+class RollingHorizonResultsClass:
+    def __init__(self):
+        '''
+        Class that stores the results of a rolling-horizon run
+        '''
+        self.series = {name: {} for name in rolling_series}  # committed values of each time series. series[name][(i, t)]
+        self.windows = []  # ``list`` of ``dict`` with the time-steps, status and times of each window
+        self.costs = {}  # annual costs of the whole horizon [€]
+        self.grid_costs = {'Grid_C_buy': 0, 'Grid_R_sell': 0, 'Grid_C_emission': 0, 'Grid_C_penalisation': 0}  # energy costs of the committed time-steps [€]
+        self.P_hired_N = {}  # hired power at each tariff period at the end of the horizon [kW]
+        self.P_excessmax = {}  # maximum power excess at each tariff period and month [kW]
+        self.status = 'optimal'  # 'optimal' if all windows have been solved
+
+    def table(self, name):
+        '''
+        Time series as a DataFrame
+        :param name: name of the time series (one of ``rolling_series``)
+        :return: pandas DataFrame, rows = time-steps, columns = elements
+        '''
+        data = {}
+        for key, value in self.series[name].items():
+            if type(key) is tuple:
+                data.setdefault(key[:-1] if len(key) > 2 else key[0], {})[key[-1]] = value
+            else:
+                data.setdefault(name, {})[key] = value
+        return pandas.DataFrame(data).sort_index()
+
+
+def check_fixed_sizing(AllInputs):
+    '''
+    Checks that PV and BESS are not sized (pure operation problem)
+    :param AllInputs: data class
+    :return: True if PV and BESS sizing are fixed
+    '''
+    sizing = [AllInputs.PV.sizing[i_PV] for i_PV in AllInputs.PV.id_list] + [AllInputs.BESS.sizing[i_BESS] for i_BESS in AllInputs.BESS.id_list]
+    return all(s == 0 for s in sizing)
+
+
+def window_inputs(AllInputs, l_t_window, state):
+    '''
+    Inputs of one window: time-steps of the window and state carried from the previous windows
+    :param AllInputs: data class of the whole horizon
+    :param l_t_window: ``list`` with the time-steps of the window
+    :param state: ``dict`` with 'SOC', 'P_excessmax', 'P_hired' and 'E_charged' of the previous windows
+    :return: data class of the window
+    '''
+    inputs = restrict_inputs(AllInputs, l_t_window)
+    inputs.BESS.SOC_start = state['SOC']  # empty in the first window: cyclic operation
+    inputs.Grid.P_excessmax_ini = state['P_excessmax']
+    inputs.Grid.P_hired_ini = state['P_hired']
+    if AllInputs.EV.hay == 1 and AllInputs.EV.immediate0_smart1 == 1:  # energy already charged by the EV in previous windows
+        inputs.EV.smart.E_evMev = {Mev: max(min(E, AllInputs.EV.smart.E_evMev[Mev] - state['E_charged'].get(Mev, 0)), 0)
+                                   for Mev, E in inputs.EV.smart.E_evMev.items()}
+    return inputs
+
+
+def rolling_horizon(AllInputs, solver='gurobi', window_days=7, overlap_days=1, solver_options=None, callback=None):
+    '''
+    Operation optimization of the whole horizon solving consecutive windows.
+    Each window has window_days + overlap_days days, but only the first window_days are committed: the overlap is
+    re-optimized by the next window. The state of charge of the BESS, the monthly maximum power excess
+    (Grid_P_excessmax), the hired power and the energy already charged by the EVs are carried between windows.
+    It is thought for fixed sizing (PV.sizing = BESS.sizing = 0).
+    :param AllInputs: data class of the whole horizon
+    :param solver: solver to use: gurobi, highs, scip, ...
+    :param window_days: days committed in each window
+    :param overlap_days: days of look-ahead of each window
+    :param solver_options: ``dict`` with the options of the solver
+    :param callback: function called after each window as callback(window, committed), where window is the ``dict``
+        with the window information and committed a ``dict`` {name: {key: value}} with the committed time series
+    :return: RollingHorizonResultsClass
+    '''
+    if not check_fixed_sizing(AllInputs):
+        print('Rolling horizon WARNING: PV or BESS sizing is not fixed, each window is sized independently')
+
+    l_t = AllInputs.System.l_t
+    steps_day = int(round(24 / AllInputs.System.inc_t))
+    step = window_days * steps_day
+    length = (window_days + overlap_days) * steps_day
+
+    opt = solver_factory(solver, solver_options)
+
+    results = RollingHorizonResultsClass()
+    state = {'SOC': {}, 'P_excessmax': {}, 'P_hired': {}, 'E_charged': {}}
+    flexibility_cost = {}
+    instance = None
+    for start in range(0, len(l_t), step):
+        l_t_window = l_t[start:start + length]
+        l_t_commit = l_t[start:start + step]
+        window = {'first t': l_t_window[0], 'last t': l_t_window[-1], 'last committed t': l_t_commit[-1]}
+
+        begin = time.time()
+        inputs = window_inputs(AllInputs, l_t_window, state)
+        instance = optimization(inputs)
+        window['build time [s]'] = time.time() - begin
+        report = solve_model(instance, opt)
+        window['solve time [s]'] = report.solve_time
+        window['status'] = report.termination_condition
+        window['gap'] = report.gap
+        results.windows.append(window)
+        if not report.is_optimal():
+            print('Rolling horizon ERROR: window starting at t=' + str(l_t_window[0]) + ' is ' + window['status'])
+            results.status = window['status']
+            break
+
+        # committed time-steps
+        set_commit = set(l_t_commit)
+        committed = {}
+        for name in rolling_series:
+            if hasattr(instance, name):
+                component = getattr(instance, name)
+                committed[name] = {key: pyo.value(component[key]) for key in component
+                                   if (key[-1] if type(key) is tuple else key) in set_commit}
+                results.series[name].update(committed[name])
+
+        # state for the next window
+        t_last = l_t_commit[-1]
+        state['SOC'] = {i_BESS: pyo.value(instance.BESS_SOC[i_BESS, t_last]) for i_BESS in AllInputs.BESS.id_list}
+        if AllInputs.Grid.conected1_islanded0 == 1:
+            state['P_excessmax'] = {key: pyo.value(instance.Grid_P_excessmax[key]) for key in instance.Grid_P_excessmax}
+            state['P_hired'] = {key: pyo.value(instance.Grid_P_hired_N[key]) for key in instance.Grid_P_hired_N}
+        if AllInputs.EV.hay == 1 and AllInputs.EV.immediate0_smart1 == 1:
+            for (Mev, t), P in committed['EV_P'].items():
+                state['E_charged'][Mev] = state['E_charged'].get(Mev, 0) + P * AllInputs.System.inc_t
+            for Mev in inputs.EV.smart.l_Mev:  # the flexibility cost is taken from the window in which the EV starts charging
+                if Mev not in flexibility_cost and min(t for t in l_t_window if inputs.EV.smart.K_evMev_t[Mev, t] == 1) in set_commit:
+                    flexibility_cost[Mev] = pyo.value(instance.EV_flexibility_cost[Mev])
+
+        for name, cost in window_grid_costs(instance, AllInputs, l_t_commit).items():
+            results.grid_costs[name] = results.grid_costs[name] + cost
+
+        if callback is not None:
+            callback(window, committed)
+
+    if instance is not None and results.status == 'optimal':
+        results.P_hired_N = state['P_hired']
+        results.P_excessmax = state['P_excessmax']
+        results.costs = horizon_costs(results, AllInputs, instance, flexibility_cost)
+    return results
+
+
+def window_grid_costs(instance, AllInputs, l_t_commit):
+    '''
+    Grid costs that depend on each time-step (energy bought and sold, emissions and penalisation of the meters type 1,
+    2 and 3), evaluated with the cost expressions of blocks/Grid.py over the committed time-steps of a window
+    :param instance: pyomo solved instance of the window
+    :param AllInputs: data class of the whole horizon
+    :param l_t_commit: ``list`` with the committed time-steps of the window
+    :return: ``dict`` with the costs [€]
+    '''
+    Grid = AllInputs.Grid
+    costs = {'Grid_C_buy': 0, 'Grid_R_sell': 0, 'Grid_C_emission': 0, 'Grid_C_penalisation': 0}
+    if Grid.conected1_islanded0 == 1:
+        for i_Grid in Grid.id_list:
+            costs['Grid_C_buy'] = costs['Grid_C_buy'] + pyo.value(Grid_buy_cost(instance, i_Grid, l_t_commit))
+            costs['Grid_R_sell'] = costs['Grid_R_sell'] + pyo.value(Grid_sell_revenue(instance, i_Grid, l_t_commit))
+            costs['Grid_C_emission'] = costs['Grid_C_emission'] + pyo.value(Grid_emission_cost(instance, i_Grid, l_t_commit))
+            if not (Grid.meter_type[i_Grid] == 4 or Grid.meter_type[i_Grid] == 5):
+                costs['Grid_C_penalisation'] = costs['Grid_C_penalisation'] + pyo.value(Grid_excess_penalisation(instance, i_Grid, l_t_commit, Grid.l_N))
+    return costs
+
+
+def horizon_costs(results, AllInputs, instance, flexibility_cost):
+    '''
+    Annual costs of the whole horizon from the committed time series.
+    The costs that depend on each time-step are the sum of the ones of the windows (results.grid_costs). The hired
+    power, the monthly maximum power excess, investment and O&M costs are taken from the last window (they are
+    carried between windows and the sizing is fixed).
+    :param results: RollingHorizonResultsClass
+    :param AllInputs: data class of the whole horizon
+    :param instance: pyomo solved instance of the last window
+    :param flexibility_cost: ``dict`` with the flexibility cost of each EV [€]
+    :return: ``dict`` with the annual costs [€]
+    '''
+    inc_t = AllInputs.System.inc_t
+    Grid = AllInputs.Grid
+    series = results.series
+    costs = dict(results.grid_costs, Grid_C_power=0)
+    if Grid.conected1_islanded0 == 1:
+        for i_Grid in Grid.id_list:
+            costs['Grid_C_power'] = costs['Grid_C_power'] + pyo.value(instance.Grid_C_power[i_Grid])
+            if Grid.meter_type[i_Grid] == 4 or Grid.meter_type[i_Grid] == 5:
+                costs['Grid_C_penalisation'] = costs['Grid_C_penalisation'] + pyo.value(instance.Grid_C_penalisation[i_Grid])
+    costs['BESS_C_degradation'] = sum((series['BESS_P_char'][i_BESS, t] + series['BESS_P_disch'][i_BESS, t]) * inc_t * AllInputs.BESS.degradation_cost[i_BESS]
+                                      for (i_BESS, t) in series['BESS_P_char'])
+    costs['Com'] = sum(pyo.value(instance.PV_C_opex[i_PV]) for i_PV in AllInputs.PV.id_list) \
+        + sum(pyo.value(instance.BESS_C_opex[i_BESS]) for i_BESS in AllInputs.BESS.id_list)
+    costs['total_flexibility_cost'] = sum(flexibility_cost.values())
+    costs['noSupply_C'] = AllInputs.System.noSupply_cost * sum(P * inc_t for P in series['noSupply_P'].values())
+    costs['total_annual_costs'] = costs['Com'] + costs['BESS_C_degradation'] + costs['Grid_C_buy'] - costs['Grid_R_sell'] \
+        + costs['Grid_C_power'] + costs['Grid_C_penalisation'] + costs['Grid_C_emission'] + costs['total_flexibility_cost'] + costs['noSupply_C']
+    costs['total_investment'] = pyo.value(instance.total_investment)
+    costs['goal'] = costs['total_investment'] + sum(costs['total_annual_costs'] / (1 + AllInputs.System.discount_rate_optimization) ** y
+                                                    for y in range(1, AllInputs.System.lifetime, 1))
+    return costs
+
+
+if __name__ == '__main__':
+    # example: python rolling_horizon.py [days] [window_days] [overlap_days] [solver]
+    # by default 14 days in windows of 3 + 1 days: the last window (t = 288-335) has no smart charging EV load
+    import sys
+    from pre_process import build_all_inputs
+    arguments = sys.argv[1:]
+    days = int(arguments[0]) if len(arguments) > 0 else 14
+    AllInputs = build_all_inputs('CSV/DATA/', overrides={'l_t': list(range(24 * days))})
+    results = rolling_horizon(AllInputs, solver=arguments[3] if len(arguments) > 3 else 'gurobi',
+                              window_days=int(arguments[1]) if len(arguments) > 1 else 3,
+                              overlap_days=int(arguments[2]) if len(arguments) > 2 else 1)
+    print(pandas.DataFrame(results.windows).to_string())
+    print(results.status, results.costs.get('goal'))
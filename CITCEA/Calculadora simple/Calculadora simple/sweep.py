@@ -0,0 +1,255 @@
+'''
+Parameter sweeps: the optimization model is built once and re-solved for each scenario with a persistent solver
+'''
+
+import copy
+import math
+import time
+import pandas
+import pyomo.environ as pyo
+from pyomo.contrib.appsi.base import TerminationCondition
+from optimization_model import optimization, RunReportClass, emissions_limited, solver_factory, solve_model
+
+
+# quantities that can be swept: name of the input --> mutable Param of the model
+sweep_parameters = {
+    'Cost_P_buy_grid': 'Grid_c_buy',  # price of the energy bought to the grid [€/kWh], {(i_Grid, t): value}
+    'Cost_P_sell_grid': 'Grid_c_sell',  # price of the energy sold to the grid [€/kWh], {(i_Grid, t): value}
+    'min_renew': 'min_ren',  # minimum renewable energy contribution [pu]
+    'max_emissions': 'max_emissions',  # maximum emissions [kgCO2/year]
+    'discount_rate': 'discount_rate',  # discount rate of the optimization [pu]
+    'fix_kW': 'PV_fix_G',  # PV installed capacity if it is fixed [kW], {i_PV: value}
+    'fix_u': 'BESS_fix_k',  # number of batteries if it is fixed, {i_BESS: value}
+}
+
+# results stored for each scenario (variables of the model, indexed ones are stored element by element)
+sweep_outputs = ['total_investment', 'total_annual_costs', 'PV_G', 'BESS_C', 'Grid_C_buy', 'Grid_R_sell', 'Grid_C_emission']
+
+
+def persistent_solver(solver='highs', solver_options=None):
+    '''
+    Creates a persistent solver (APPSI interface): the model is sent to the solver once and only the modified
+    coefficients are updated before each solve
+    :param solver: highs or gurobi
+    :param solver_options: ``dict`` with the options of the solver
+    :return: APPSI solver
+    '''
+    if solver == 'highs':
+        from pyomo.contrib.appsi.solvers import Highs
+        opt = Highs()
+        options = opt.highs_options
+    elif solver == 'gurobi':
+        from pyomo.contrib.appsi.solvers import Gurobi
+        opt = Gurobi()
+        options = opt.gurobi_options
+        options['NonConvex'] = 2  # to solve Quadratic equality constraints
+    else:
+        print('Sweep ERROR: there is no persistent interface for the solver ' + str(solver) + ' (use highs or gurobi)')
+        return None
+    if solver_options is not None:
+        options.update(solver_options)
+    opt.config.load_solution = False  # the solution is loaded only if there is one
+    opt.config.warmstart = True  # the solution of the previous scenario is used as initial solution
+    return opt
+
+
+def set_parameter(instance, name, value):
+    '''
+    Modifies a mutable parameter of the model
+    :param instance: pyomo instance built with AllInputs.System.mutable = True
+    :param name: name of the swept quantity (key of ``sweep_parameters``)
+    :param value: new value. For indexed parameters, a ``dict`` {index: value} (only the given indexes are modified)
+        or a number (all indexes get the same value). For max_emissions, a negative or infinite value removes the limit
+    '''
+    param = getattr(instance, sweep_parameters[name])
+    if name == 'max_emissions':  # the persistent solver does not see infinite bounds: the constraint is switched on/off
+        value = value[None] if isinstance(value, dict) else value
+        if emissions_limited(value):
+            param.set_value(value)
+            instance.Constr_emissions_reduction.activate()
+        else:
+            instance.Constr_emissions_reduction.deactivate()
+    elif isinstance(value, dict):
+        param.store_values({key: v for key, v in value.items() if key in param})
+    else:
+        param.store_values(value)
+
+
+def check_scenarios(instance, scenarios, AllInputs):
+    '''
+    Checks that the swept quantities can be modified in the model
+    :return: True if all scenarios can be solved with the model
+    '''
+    correct = True
+    for name, scenario in scenarios.items():
+        for key in scenario:
+            if key not in sweep_parameters:
+                print('Sweep ERROR: ' + str(key) + ' (scenario ' + str(name) + ') can not be swept. Options: ' + ', '.join(sweep_parameters))
+                correct = False
+            elif not hasattr(instance, sweep_parameters[key]):
+                print('Sweep ERROR: ' + str(key) + ' (scenario ' + str(name) + ') is not in the model (e.g. prices of an islanded grid)')
+                correct = False
+    swept = {key for scenario in scenarios.values() for key in scenario}
+    if 'fix_kW' in swept and any(AllInputs.PV.sizing[i_PV] == 1 for i_PV in AllInputs.PV.id_list):
+        print('Sweep WARNING: fix_kW only has effect on the PV that are not sized (PV.sizing = 0)')
+    if 'fix_u' in swept and any(AllInputs.BESS.sizing[i_BESS] == 1 for i_BESS in AllInputs.BESS.id_list):
+        print('Sweep WARNING: fix_u only has effect on the BESS that are not sized (BESS.sizing = 0)')
+    return correct
+
+
+def scenario_outputs(instance, outputs):
+    '''
+    Values of the output variables after a solve
+    :return: ``dict`` {column name: value}
+    '''
+    row = {}
+    for name in outputs:
+        if not hasattr(instance, name):
+            continue
+        component = getattr(instance, name)
+        if component.is_indexed():
+            for key in component:
+                row[name + '[' + str(key) + ']'] = pyo.value(component[key], exception=False)
+        else:
+            row[name] = pyo.value(component, exception=False)
+    return row
+
+
+def run_sweep(AllInputs, scenarios, solver='highs', solver_options=None, outputs=None):
+    '''
+    Solves the same model for several scenarios. The model is built once with mutable parameters and sent once to a
+    persistent solver; for each scenario only the swept parameters are modified and the problem is re-solved starting
+    from the previous solution. Each scenario is applied over the values of the inputs (the modifications of one
+    scenario are undone before the next one).
+    :param AllInputs: data class which contains all inputs
+    :param scenarios: ``dict`` {scenario name: {swept quantity: value}}, the swept quantities are the keys of
+        ``sweep_parameters``. E.g. {'ren 50%': {'min_renew': 0.5}, 'no PV': {'fix_kW': 0, 'min_renew': 0}}
+    :param solver: highs or gurobi
+    :param solver_options: ``dict`` with the options of the solver
+    :param outputs: ``list`` with the variables stored for each scenario (``sweep_outputs`` by default)
+    :return: pandas DataFrame, one row per scenario with the swept values, the run report and the outputs
+    '''
+    if outputs is None:
+        outputs = sweep_outputs
+    opt = persistent_solver(solver, solver_options)
+    if opt is None:
+        return None
+    if not opt.available():
+        print('Sweep ERROR: the solver ' + str(solver) + ' is not available')
+        return None
+
+    inputs = copy.copy(AllInputs)
+    inputs.System = copy.copy(AllInputs.System)
+    inputs.System.mutable = True
+    begin = time.time()
+    instance = optimization(inputs)
+    build_time = time.time() - begin
+    if not check_scenarios(instance, scenarios, AllInputs):
+        return None
+
+    swept = list(dict.fromkeys(key for scenario in scenarios.values() for key in scenario))
+    base = {key: getattr(instance, sweep_parameters[key]).extract_values() for key in swept}
+    if 'max_emissions' in base:  # the parameter is finite even without limit (see optimization_model)
+        base['max_emissions'] = {None: AllInputs.System.max_emissions}
+
+    table = {}
+    for name, scenario in scenarios.items():
+        for key in swept:
+            set_parameter(instance, key, scenario.get(key, base[key]))
+
+        report = RunReportClass()
+        report.build_time = build_time if not table else 0  # the model is only built for the first scenario
+        begin = time.time()
+        results = opt.solve(instance)
+        report.solve_time = time.time() - begin
+        report.termination_condition = results.termination_condition.name
+        report.status = 'ok' if results.termination_condition == TerminationCondition.optimal else 'warning'
+        report.lower_bound = results.best_objective_bound
+        report.upper_bound = results.best_feasible_objective
+        if results.best_feasible_objective is not None:
+            results.solution_loader.load_vars()
+            report.solution = True
+            report.objective = pyo.value(instance.goal)
+            if results.best_objective_bound is not None and report.upper_bound != 0:
+                report.gap = abs(report.upper_bound - report.lower_bound) / abs(report.upper_bound)
+        if not report.is_optimal():
+            print('Sweep WARNING: scenario ' + str(name) + ' is ' + report.termination_condition)
+
+        row = {}  # swept values: number, 'custom' (dict given) or 'base' (indexed parameter not modified)
+        for key in swept:
+            if key in scenario:
+                row[key] = scenario[key] if not isinstance(scenario[key], dict) else 'custom'
+            else:
+                row[key] = base[key][None] if None in base[key] else 'base'
+        row.update(report.table().drop(['message', 'solver_time', 'nodes']).to_dict())
+        if report.solution:
+            row.update(scenario_outputs(instance, outputs))
+        table[name] = row
+    return pandas.DataFrame(table).T
+
+
+def rebuilt_model(AllInputs, max_emissions, solver):
+    '''
+    Builds and solves the model (not mutable) with another max_emissions
+    :param solver: highs or gurobi
+    :return: solved instance and RunReportClass
+    '''
+    inputs = copy.copy(AllInputs)
+    inputs.System = copy.copy(AllInputs.System)
+    inputs.System.mutable = False
+    inputs.System.max_emissions = max_emissions
+    instance = optimization(inputs)
+    return instance, solve_model(instance, solver_factory('appsi_' + solver))  # same solver as persistent_solver
+
+
+def check_emissions_sweep(AllInputs, solver='highs', reduction=0.5, tol=1e-6):
+    '''
+    Checks the sweep of max_emissions against rebuilt models: without limit (-1), with a binding limit (reduction of
+    the emissions of the solution without limit) and without limit again (inf)
+    :param AllInputs: data class which contains all inputs
+    :param solver: highs or gurobi
+    :param reduction: reduction of the emissions of the solution without limit [pu]
+    :param tol: relative tolerance of the objective
+    :return: True if the objectives of the sweep are the ones of the rebuilt models
+    '''
+    instance, free = rebuilt_model(AllInputs, -1, solver)
+    if not free.solution:
+        print('Sweep ERROR: the rebuilt model without emissions limit is ' + str(free.termination_condition))
+        return False
+    emissions = sum(pyo.value(instance.Grid_C_emission[key]) for key in instance.Grid_C_emission) / AllInputs.System.emissions_cost
+    limit = (1 - reduction) * emissions
+    _, capped = rebuilt_model(AllInputs, limit, solver)
+    if not capped.solution:
+        print('Sweep ERROR: the rebuilt model with max_emissions = ' + str(limit) + ' is ' + str(capped.termination_condition))
+        return False
+    if capped.objective <= free.objective * (1 + tol):
+        print('Sweep WARNING: max_emissions = ' + str(limit) + ' is not binding, the check is not conclusive')
+
+    scenarios = {'no limit': {'max_emissions': -1}, 'limit': {'max_emissions': limit}, 'no limit (inf)': {'max_emissions': math.inf}}
+    references = {'no limit': free.objective, 'limit': capped.objective, 'no limit (inf)': free.objective}
+    table = run_sweep(AllInputs, scenarios, solver)
+    if table is None:
+        return False
+    correct = True
+    for name, reference in references.items():
+        objective = table.loc[name, 'objective']
+        if pandas.isna(objective) or abs(objective - reference) > tol * max(1, abs(reference)):
+            print('Sweep ERROR: objective of the scenario ' + name + ' = ' + str(objective) + ', rebuilt model = ' + str(reference))
+            correct = False
+    return correct
+
+
+if __name__ == '__main__':
+    # example: minimum renewable share from 0 to 100 % (python sweep.py [days]); python sweep.py [days] check runs
+    # check_emissions_sweep instead
+    import sys
+    from pre_process import build_all_inputs
+    overrides = {}
+    if len(sys.argv) > 1:
+        overrides['l_t'] = list(range(24 * int(sys.argv[1])))
+    AllInputs = build_all_inputs('CSV/DATA/', overrides=overrides)
+    if len(sys.argv) > 2 and sys.argv[2] == 'check':
+        print('max_emissions sweep correct:', check_emissions_sweep(AllInputs))
+        sys.exit()
+    scenarios = {'min_renew ' + str(r) + '%': {'min_renew': r / 100} for r in range(0, 101, 25)}
+    print(run_sweep(AllInputs, scenarios).to_string())